@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session
+
+from .db import bet_engines, init_db
+from .models import Bet, BetArchive, BetOutcome, ParlayLeg, ParlayLegArchive
+from .settings import get_settings
+
+SETTLED_OUTCOMES = (BetOutcome.WIN, BetOutcome.LOSS)
+
+# Ids per ``IN`` list when restoring many bets at once.
+_IN_BATCH = 500
+
+_BET_COLUMNS = list(Bet.__table__.columns.keys())
+_LEG_COLUMNS = list(ParlayLeg.__table__.columns.keys())
+
+
+@dataclass
+class ArchiveReport:
+    before: date
+    archived: int
+    hot_rows_before: int
+    hot_rows_after: int
+    hot_bytes_before: Optional[int]
+    hot_bytes_after: Optional[int]
+    latency_before_ms: Optional[float]
+    latency_after_ms: Optional[float]
+
+
+def _move(connection: Connection, ids: List[UUID], source, target, legs_source, legs_target) -> None:
+    """Copy bets and their legs from one tier to the other, then delete the originals."""
+    connection.execute(
+        insert(target.__table__).from_select(
+            _BET_COLUMNS,
+            select(*[source.__table__.c[name] for name in _BET_COLUMNS]).where(source.id.in_(ids)),
+        )
+    )
+    connection.execute(
+        insert(legs_target.__table__).from_select(
+            _LEG_COLUMNS,
+            select(*[legs_source.__table__.c[name] for name in _LEG_COLUMNS]).where(legs_source.bet_id.in_(ids)),
+        )
+    )
+    connection.execute(delete(legs_source).where(legs_source.bet_id.in_(ids)))
+    connection.execute(delete(source).where(source.id.in_(ids)))
+
+
+def restore_bet(session: Session, bet_id: UUID, user_id: UUID) -> bool:
+    """Move an archived bet back to the hot table so it can be edited."""
+    found = session.exec(
+        select(BetArchive.id).where(BetArchive.id == bet_id, BetArchive.user_id == user_id)
+    ).first()
+    if found is None:
+        return False
+    _move(session.connection(), [bet_id], BetArchive, Bet, ParlayLegArchive, ParlayLeg)
+    return True
+
+
+def restore_bets(session: Session, bet_ids: List[UUID]) -> None:
+    """Move many archived bets back to the hot table; callers check ownership."""
+    connection = session.connection()
+    for offset in range(0, len(bet_ids), _IN_BATCH):
+        _move(connection, bet_ids[offset : offset + _IN_BATCH], BetArchive, Bet, ParlayLegArchive, ParlayLeg)
+
+
+def _hot_stats(connection: Connection) -> tuple[int, Optional[int]]:
+    rows = connection.execute(select(func.count()).select_from(Bet)).scalar_one()
+    try:
+        size = connection.execute(
+            text(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                "(SELECT name FROM sqlite_master WHERE tbl_name IN ('bet', 'parlayleg'))"
+            )
+        ).scalar()
+    except OperationalError:
+        size = None
+    return rows, size
+
+
+def _probe_latency(connection: Connection) -> Optional[float]:
+    """Time a warm, full date-ordered listing for the user with most hot bets."""
+    user_id = connection.execute(
+        select(Bet.user_id).group_by(Bet.user_id).order_by(func.count().desc()).limit(1)
+    ).scalar()
+    if user_id is None:
+        return None
+    statement = select(Bet).where(Bet.user_id == user_id).order_by(Bet.event_date.desc(), Bet.created_at.desc())
+    connection.execute(statement).fetchall()
+    started = time.perf_counter()
+    connection.execute(statement).fetchall()
+    return (time.perf_counter() - started) * 1000
+
+
+def _tier_stats(target: Engine) -> Tuple[int, Optional[int], Optional[float]]:
+    with target.connect() as connection:
+        rows, size = _hot_stats(connection)
+        return rows, size, _probe_latency(connection)
+
+
+def _combine(stats: List[Tuple[int, Optional[int], Optional[float]]]) -> Tuple[int, Optional[int], Optional[float]]:
+    """Sum rows and sizes across shards; latency is the slowest shard's."""
+    rows = sum(item[0] for item in stats)
+    sizes = [item[1] for item in stats]
+    size = None if not sizes or None in sizes else sum(sizes)
+    latencies = [item[2] for item in stats if item[2] is not None]
+    return rows, size, max(latencies) if latencies else None
+
+
+def _archive_engine(target: Engine, before: date, batch_size: int) -> int:
+    archived = 0
+    candidates = (
+        select(Bet.id)
+        .where(Bet.outcome.in_(SETTLED_OUTCOMES), Bet.event_date < before)
+        .limit(batch_size)
+    )
+    while True:
+        with target.begin() as connection:
+            ids = list(connection.execute(candidates).scalars())
+            if not ids:
+                break
+            _move(connection, ids, Bet, BetArchive, ParlayLeg, ParlayLegArchive)
+            archived += len(ids)
+
+    if archived and target.dialect.name == "sqlite":
+        with target.connect() as connection:
+            connection.exec_driver_sql("ANALYZE")
+    return archived
+
+
+def archive_settled_bets(before: Optional[date] = None, batch_size: int = 2000) -> ArchiveReport:
+    """Move won/lost bets with ``event_date < before`` into the archive tables.
+
+    Works in batches, one short transaction each, so the API keeps serving
+    writes while a large backlog is archived. With sharding enabled every
+    shard is archived in turn and the report covers all of them.
+    """
+    init_db()
+    if before is None:
+        before = date.today() - timedelta(days=get_settings().archive_after_days)
+
+    targets = list(bet_engines())
+    rows_before, bytes_before, latency_before = _combine([_tier_stats(target) for target in targets])
+    archived = sum(_archive_engine(target, before, batch_size) for target in targets)
+    rows_after, bytes_after, latency_after = _combine([_tier_stats(target) for target in targets])
+
+    return ArchiveReport(
+        before=before,
+        archived=archived,
+        hot_rows_before=rows_before,
+        hot_rows_after=rows_after,
+        hot_bytes_before=bytes_before,
+        hot_bytes_after=bytes_after,
+        latency_before_ms=latency_before,
+        latency_after_ms=latency_after,
+    )
+
+
+__all__ = ["ArchiveReport", "SETTLED_OUTCOMES", "archive_settled_bets", "restore_bet", "restore_bets"]
@@ -1,14 +1,19 @@
 ﻿from __future__ import annotations
 
-from fastapi import Depends, HTTPException, status
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+from uuid import UUID, uuid4
+
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session
-from uuid import UUID
 
 from . import crud
-from .db import get_session
-from .models import User
-from .security import decode_access_token, verify_password
+from .db import engine_for_user, get_session, sharding_enabled
+from .models import User, utcnow
+from .security import decode_access_token, hash_refresh_token, new_refresh_token, verify_password
+from .settings import get_settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -22,6 +27,47 @@ def authenticate_user(session: Session, email: str, password: str) -> User | Non
     return user
 
 
+def issue_refresh_token(session: Session, user_id: UUID, family_id: Optional[UUID] = None) -> str:
+    """Create a refresh token, starting a new family unless one is given."""
+    token = new_refresh_token()
+    expires_at = utcnow() + timedelta(days=get_settings().refresh_exp_days)
+    crud.create_refresh_token(session, user_id, hash_refresh_token(token), family_id or uuid4(), expires_at)
+    return token
+
+
+def rotate_refresh_token(session: Session, token: str) -> Tuple[User, str]:
+    """Exchange a refresh token for a new one in the same family.
+
+    Presenting a token that was already rotated means it leaked (or two
+    devices share it), so the whole family is revoked.
+    """
+    stored = crud.get_refresh_token(session, hash_refresh_token(token))
+    if stored is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de refresco inválido")
+    now = utcnow()
+    if not crud.claim_refresh_token(session, stored.id, now):
+        if stored.revoked_at is None and _as_utc(stored.expires_at) <= now:
+            session.rollback()
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de refresco expirado")
+        crud.revoke_refresh_family(session, stored.family_id, now)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de refresco reutilizado")
+    user = crud.get_user(session, stored.user_id)
+    if not user:
+        session.rollback()
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no encontrado")
+    return user, issue_refresh_token(session, user.id, stored.family_id)
+
+
+def revoke_refresh_token(session: Session, token: str) -> None:
+    stored = crud.get_refresh_token(session, hash_refresh_token(token))
+    if stored is not None:
+        crud.revoke_refresh_family(session, stored.family_id, utcnow())
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     session: Session = Depends(get_session),
@@ -44,9 +90,38 @@ async def get_current_user_id(current_user: User = Depends(get_current_user)) ->
     return current_user.id
 
 
+def get_bet_session(
+    user_id: UUID = Depends(get_current_user_id),
+    session: Session = Depends(get_session),
+):
+    """Session over the database holding the current user's bets.
+
+    Unsharded, that is the request's central session itself.
+    """
+    if not sharding_enabled():
+        yield session
+        return
+    with Session(engine_for_user(user_id)) as bet_session:
+        yield bet_session
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Guard for operator endpoints; disabled unless ``INVICTOS_ADMIN_TOKEN`` is set."""
+    expected = get_settings().admin_token
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Administración deshabilitada")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token de administración inválido")
+
+
 __all__ = [
     "oauth2_scheme",
     "authenticate_user",
     "get_current_user",
     "get_current_user_id",
+    "get_bet_session",
+    "require_admin",
+    "issue_refresh_token",
+    "rotate_refresh_token",
+    "revoke_refresh_token",
 ]
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .db import bet_engines, engine, sharding_enabled
+from .settings import get_settings
+
+
+class BackupError(RuntimeError):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+@dataclass
+class BackupReport:
+    source: str
+    target: str
+    pages: int
+    steps: int
+    restarts: int
+    seconds: float
+    step_ms_p50: float
+    step_ms_p99: float
+    step_ms_max: float
+    bytes: int
+    compressed: bool
+    step_pages: int = 0
+    escalations: int = 0
+    final_single_step: bool = False
+    verified: Optional[bool] = None
+    integrity: Optional[str] = None
+    table_rows: Dict[str, int] = field(default_factory=dict)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def verify_backup(path: Path) -> tuple[str, Dict[str, int]]:
+    """Restore ``path`` (decompressing it if needed) into a scratch file and check it."""
+    with tempfile.TemporaryDirectory(prefix="invictos-restore-") as scratch:
+        restored = Path(scratch) / "restored.db"
+        if path.suffix == ".gz":
+            with gzip.open(path, "rb") as source, open(restored, "wb") as target:
+                shutil.copyfileobj(source, target)
+        else:
+            shutil.copyfile(path, restored)
+        connection = sqlite3.connect(restored)
+        try:
+            integrity = connection.execute("PRAGMA integrity_check").fetchone()[0]
+            tables = [
+                row[0]
+                for row in connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+                    "AND sql NOT LIKE 'CREATE VIRTUAL TABLE%'"
+                )
+            ]
+            rows = {table: connection.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+        finally:
+            connection.close()
+    return integrity, rows
+
+
+def backup_database(
+    source: Path,
+    target: Path,
+    pages_per_step: Optional[int] = None,
+    pause_ms: Optional[float] = None,
+    max_restarts: int = 3,
+    compress: bool = False,
+    verify: bool = True,
+    max_step_pages: Optional[int] = None,
+) -> BackupReport:
+    """Copy a live SQLite database with the online backup API.
+
+    The copy runs ``pages_per_step`` pages at a time and sleeps ``pause_ms``
+    between steps, holding no lock while it sleeps, so writers only ever wait
+    for a single step. A write from another connection restarts the copy;
+    after ``max_restarts`` in a row the copy starts over with steps four times
+    larger, which leaves fewer gaps for writes to land in, up to
+    ``max_step_pages``. If even that keeps restarting, a WAL database gets
+    the rest in one step (a WAL reader does not block writers) and any other
+    raises ``BackupError`` so the caller can try again later: under a
+    rollback journal one step would hold the read lock for the whole copy.
+    """
+    settings = get_settings()
+    pages_per_step = pages_per_step or settings.backup_pages_per_step
+    max_step_pages = max(pages_per_step, max_step_pages or settings.backup_max_step_pages)
+    pause = (settings.backup_pause_ms if pause_ms is None else pause_ms) / 1000
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(target.name + ".partial")
+    if not source.exists():
+        raise BackupError(f"No existe la base {source}")
+
+    step_seconds: List[float] = []
+    state = {"last": 0.0, "remaining": None, "restarts": 0, "in_a_row": 0, "pages": 0}
+
+    def _progress(status: int, remaining: int, total: int) -> None:
+        step_seconds.append(time.perf_counter() - state["last"])
+        # A step that went through but made no headway was restarted by a
+        # write; a busy step just retries.
+        if status == sqlite3.SQLITE_OK and state["remaining"] is not None and remaining >= state["remaining"]:
+            state["restarts"] += 1
+            state["in_a_row"] += 1
+            if state["in_a_row"] > max_restarts:
+                raise _TooManyRestarts()
+        state["remaining"] = remaining
+        state["pages"] = total
+        time.sleep(pause)
+        state["last"] = time.perf_counter()
+
+    started = time.perf_counter()
+    step_pages = pages_per_step
+    escalations = 0
+    final_single_step = False
+    source_connection = sqlite3.connect(source, timeout=settings.sqlite_busy_timeout_ms / 1000)
+    target_connection = sqlite3.connect(partial)
+    try:
+        wal = source_connection.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+        while True:
+            state["remaining"] = None
+            state["in_a_row"] = 0
+            state["last"] = time.perf_counter()
+            try:
+                source_connection.backup(target_connection, pages=step_pages, progress=_progress)
+                break
+            except _TooManyRestarts:
+                if step_pages < max_step_pages:
+                    step_pages = min(step_pages * 4, max_step_pages)
+                    escalations += 1
+                    continue
+                if not wal:
+                    raise BackupError(
+                        f"{source} cambia demasiado para copiarla por pasos ({state['restarts']} reinicios); "
+                        "reintentar mas tarde"
+                    ) from None
+                final_single_step = True
+                step_started = time.perf_counter()
+                source_connection.backup(target_connection, pages=-1)
+                step_seconds.append(time.perf_counter() - step_started)
+                break
+    except BackupError:
+        target_connection.close()
+        partial.unlink(missing_ok=True)
+        raise
+    finally:
+        target_connection.close()
+        source_connection.close()
+
+    if compress:
+        target = target.with_name(target.name + ".gz")
+        with open(partial, "rb") as raw, gzip.open(target, "wb", compresslevel=6) as packed:
+            shutil.copyfileobj(raw, packed)
+        partial.unlink()
+    else:
+        os.replace(partial, target)
+    seconds = time.perf_counter() - started
+
+    report = BackupReport(
+        source=str(source),
+        target=str(target),
+        pages=state["pages"],
+        steps=len(step_seconds),
+        restarts=state["restarts"],
+        seconds=seconds,
+        step_ms_p50=_percentile(step_seconds, 50) * 1000,
+        step_ms_p99=_percentile(step_seconds, 99) * 1000,
+        step_ms_max=max(step_seconds, default=0.0) * 1000,
+        bytes=target.stat().st_size,
+        compressed=compress,
+        step_pages=step_pages,
+        escalations=escalations,
+        final_single_step=final_single_step,
+    )
+    if verify:
+        report.integrity, report.table_rows = verify_backup(target)
+        report.verified = report.integrity == "ok"
+    return report
+
+
+def _database_path(target_engine) -> Path:
+    if target_engine.dialect.name != "sqlite" or target_engine.url.database in (None, "", ":memory:"):
+        raise BackupError("Solo se pueden respaldar bases SQLite en archivo")
+    return Path(target_engine.url.database)
+
+
+def run_backup(
+    destination: Optional[Path] = None,
+    compress: bool = False,
+    verify: bool = True,
+    pages_per_step: Optional[int] = None,
+    pause_ms: Optional[float] = None,
+) -> List[BackupReport]:
+    """Back up the central database and, when sharded, every shard.
+
+    Files share one UTC timestamp; shards go in a sibling directory.
+    """
+    destination = Path(destination or get_settings().backup_dir)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    options = {"pages_per_step": pages_per_step, "pause_ms": pause_ms, "compress": compress, "verify": verify}
+    central = _database_path(engine)
+    reports = [backup_database(central, destination / f"{central.stem}-{stamp}.db", **options)]
+    if sharding_enabled():
+        shard_dir = destination / f"{central.stem}-{stamp}-shards"
+        for shard in bet_engines():
+            path = _database_path(shard)
+            reports.append(backup_database(path, shard_dir / path.name, **options))
+    return reports
+
+
+__all__ = ["BackupError", "BackupReport", "backup_database", "run_backup", "verify_backup"]
@@ -1,12 +1,61 @@
 from __future__ import annotations
 
-from datetime import date, datetime
-from typing import List, Optional
+import heapq
+from itertools import islice
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 from uuid import UUID
 
-from sqlmodel import Session, select
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import and_, or_
+from sqlmodel import Session, delete, select, update
 
-from .models import Bet, BetCreate, BetType, BetUpdate, ParlayLeg, User, UserCreate, utcnow
+from .archive import restore_bet, restore_bets
+from .models import (
+    Bet,
+    BetArchive,
+    BetBulkFilter,
+    BetCreate,
+    BetFilter,
+    BetOutcome,
+    BetSortKey,
+    BetType,
+    BetUpdate,
+    ParlayLeg,
+    ParlayLegArchive,
+    ParlayLegUpdate,
+    RefreshToken,
+    User,
+    UserCreate,
+    utcnow,
+)
+from .response_cache import response_cache
+from .search import build_match_query, search_bet_ids
+
+# Fields a PATCH can change with a single UPDATE statement. ``type`` is left
+# out because switching between single and parlay affects the legs.
+SCALAR_UPDATE_FIELDS = frozenset({"event_date", "detail", "stake", "odds", "cashout", "outcome"})
+
+# Bets live in the hot ``bet`` table or, once settled and old, in
+# ``bet_archive``. Read paths query both tiers; write paths restore first.
+AnyBet = Union[Bet, BetArchive]
+_LEG_MODELS = {Bet: ParlayLeg, BetArchive: ParlayLegArchive}
+
+# Columns a sparse fieldset may ask for, in response order.
+BET_FIELDS = (
+    "id",
+    "user_id",
+    "event_date",
+    "type",
+    "detail",
+    "stake",
+    "odds",
+    "cashout",
+    "outcome",
+    "created_at",
+    "updated_at",
+)
+_IN_BATCH = 500
 
 
 def _dump(model, **kwargs):
@@ -15,26 +64,196 @@ def _dump(model, **kwargs):
     return model.dict(**kwargs)  # type: ignore[attr-defined]
 
 
-def list_bets(
+def _apply_filter(statement, filters: BetFilter, model=Bet):
+    if filters.start:
+        statement = statement.where(model.event_date >= filters.start)
+    if filters.end:
+        statement = statement.where(model.event_date <= filters.end)
+    if filters.outcome is not None:
+        statement = statement.where(model.outcome == filters.outcome)
+    if filters.type is not None:
+        statement = statement.where(model.type == filters.type)
+    if filters.min_odds is not None:
+        statement = statement.where(model.odds >= filters.min_odds)
+    if filters.max_odds is not None:
+        statement = statement.where(model.odds <= filters.max_odds)
+    if filters.min_stake is not None:
+        statement = statement.where(model.stake >= filters.min_stake)
+    if filters.max_stake is not None:
+        statement = statement.where(model.stake <= filters.max_stake)
+    if filters.has_cashout is not None:
+        statement = statement.where(model.cashout.is_not(None) if filters.has_cashout else model.cashout.is_(None))
+    return statement
+
+
+def sort_columns(filters: BetFilter) -> Tuple[str, ...]:
+    """The sort column followed by its tie-breakers, matching the ``ix_*_user_*`` indexes of both tiers.
+
+    Bets of the same day keep their creation order; other sorts only need
+    ``id`` to be total.
+    """
+    if filters.sort == BetSortKey.EVENT_DATE:
+        return ("event_date", "created_at", "id")
+    return (filters.sort.value, "id")
+
+
+def _apply_sort(statement, filters: BetFilter, model=Bet):
+    columns = [getattr(model, name) for name in sort_columns(filters)]
+    if filters.desc:
+        return statement.order_by(*(column.desc() for column in columns))
+    return statement.order_by(*columns)
+
+
+def _merge_tiers(hot: List[Bet], archived: List[BetArchive], filters: BetFilter) -> List[AnyBet]:
+    if not archived:
+        return hot
+    names = sort_columns(filters)
+    key = lambda bet: tuple(getattr(bet, name) for name in names)  # noqa: E731
+    return list(heapq.merge(hot, archived, key=key, reverse=filters.desc))
+
+
+def _tier_models(filters: BetFilter) -> Tuple[type, ...]:
+    # The archive only holds settled bets.
+    if filters.outcome == BetOutcome.PENDING:
+        return (Bet,)
+    return (Bet, BetArchive)
+
+
+def list_bets(session: Session, user_id: UUID, filters: Optional[BetFilter] = None) -> List[AnyBet]:
+    filters = filters or BetFilter()
+    tiers = []
+    for model in _tier_models(filters):
+        statement = _apply_filter(select(model).where(model.user_id == user_id), filters, model)
+        tiers.append(session.exec(_apply_sort(statement, filters, model)).unique().all())
+    if len(tiers) == 1:
+        return tiers[0]
+    return _merge_tiers(tiers[0], tiers[1], filters)
+
+
+def _columns(model, fields: Iterable[str], keys: Iterable[str]) -> list:
+    names = list(dict.fromkeys([*fields, *keys]))
+    return [getattr(model, name) for name in names]
+
+
+def _attach_legs(session: Session, model, rows: List[Dict[str, Any]]) -> None:
+    """Load legs for ``rows`` with batched ``IN`` queries instead of a join."""
+    leg_model = _LEG_MODELS[model]
+    by_bet: Dict[UUID, List[Dict[str, Any]]] = {}
+    ids = [row["id"] for row in rows]
+    for offset in range(0, len(ids), _IN_BATCH):
+        statement = select(leg_model.bet_id, leg_model.id, leg_model.detail, leg_model.odds).where(
+            leg_model.bet_id.in_(ids[offset : offset + _IN_BATCH])
+        )
+        for leg in session.execute(statement).mappings():
+            by_bet.setdefault(leg["bet_id"], []).append({"id": leg["id"], "detail": leg["detail"], "odds": leg["odds"]})
+    for row in rows:
+        row["legs"] = by_bet.get(row["id"], [])
+
+
+def _select_fields(
+    session: Session,
+    statements: List[Tuple[type, Any]],
+    fields: Sequence[str],
+    keys: Sequence[str],
+    include_legs: bool,
+    desc: bool = False,
+) -> List[Dict[str, Any]]:
+    tiers = []
+    for model, statement in statements:
+        rows = [dict(row) for row in session.execute(statement).mappings()]
+        if include_legs:
+            _attach_legs(session, model, rows)
+        tiers.append(rows)
+    merged = heapq.merge(*tiers, key=lambda row: tuple(row[name] for name in keys), reverse=desc)
+    output = [name for name in BET_FIELDS if name in fields or name == "id"]
+    if include_legs:
+        output.append("legs")
+    return [{name: row[name] for name in output} for row in merged]
+
+
+def list_bet_fields(
     session: Session,
     user_id: UUID,
-    start: Optional[date] = None,
-    end: Optional[date] = None,
-) -> List[Bet]:
-    statement = select(Bet).where(Bet.user_id == user_id)
-    if start:
-        statement = statement.where(Bet.event_date >= start)
-    if end:
-        statement = statement.where(Bet.event_date <= end)
-    statement = statement.order_by(Bet.event_date.desc(), Bet.created_at.desc())
-    return session.exec(statement).unique().all()
+    fields: Sequence[str],
+    filters: Optional[BetFilter] = None,
+    include_legs: bool = False,
+) -> List[Dict[str, Any]]:
+    """Like :func:`list_bets` but selects only ``fields`` and never joins legs."""
+    filters = filters or BetFilter()
+    keys = sort_columns(filters)
+    statements = []
+    for model in _tier_models(filters):
+        statement = select(*_columns(model, ("id", *fields), keys)).where(model.user_id == user_id)
+        statements.append((model, _apply_sort(_apply_filter(statement, filters, model), filters, model)))
+    return _select_fields(session, statements, fields, keys, include_legs, desc=filters.desc)
+
+
+def search_bets(session: Session, user_id: UUID, query: str, limit: int, offset: int = 0) -> List[Bet]:
+    """Full-text search over bet and leg details, best matches first."""
+    if session.get_bind().dialect.name != "sqlite":
+        statement = (
+            select(Bet)
+            .where(Bet.user_id == user_id, Bet.detail.ilike(f"%{query.strip()}%"))
+            .order_by(Bet.event_date.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        return session.exec(statement).unique().all()
+    match = build_match_query(user_id, query)
+    if match is None:
+        return []
+    ids = search_bet_ids(session.connection(), match, limit, offset)
+    if not ids:
+        return []
+    found = {}
+    for model in (Bet, BetArchive):
+        statement = select(model).where(model.user_id == user_id, model.id.in_(ids))
+        found.update((bet.id, bet) for bet in session.exec(statement).unique().all())
+    return [found[bet_id] for bet_id in ids if bet_id in found]
+
+
+def get_bet(
+    session: Session,
+    bet_id: UUID,
+    user_id: Optional[UUID] = None,
+    *,
+    restore: bool = False,
+) -> Optional[AnyBet]:
+    """Look a bet up in the hot table, then the archive.
+
+    With ``restore=True`` an archived bet is moved back to the hot table
+    first, which is what every edit path wants.
+    """
+    for model in (Bet, BetArchive):
+        statement = select(model).where(model.id == bet_id)
+        if user_id is not None:
+            statement = statement.where(model.user_id == user_id)
+        bet = session.exec(statement).unique().first()
+        if bet is None:
+            continue
+        if model is BetArchive and restore:
+            session.expunge(bet)
+            restore_bet(session, bet_id, bet.user_id)
+            return get_bet(session, bet_id, user_id)
+        return bet
+    return None
+
 
+def get_bets(session: Session, bet_ids: Sequence[UUID], user_id: UUID) -> List[AnyBet]:
+    """Fetch many bets by id with one ``IN`` query per tier, in request order.
 
-def get_bet(session: Session, bet_id: UUID, user_id: Optional[UUID] = None) -> Optional[Bet]:
-    statement = select(Bet).where(Bet.id == bet_id)
-    if user_id is not None:
-        statement = statement.where(Bet.user_id == user_id)
-    return session.exec(statement).unique().first()
+    Ids that do not exist (or belong to someone else) are simply left out.
+    """
+    remaining = list(dict.fromkeys(bet_ids))
+    found: Dict[UUID, AnyBet] = {}
+    for model in (Bet, BetArchive):
+        if not remaining:
+            break
+        statement = select(model).where(model.user_id == user_id, model.id.in_(remaining))
+        for bet in session.exec(statement).unique().all():
+            found[bet.id] = bet
+        remaining = [bet_id for bet_id in remaining if bet_id not in found]
+    return [found[bet_id] for bet_id in dict.fromkeys(bet_ids) if bet_id in found]
 
 
 def create_bet(session: Session, payload: BetCreate, user_id: UUID) -> Bet:
@@ -45,37 +264,210 @@ def create_bet(session: Session, payload: BetCreate, user_id: UUID) -> Bet:
         bet.legs = [ParlayLeg(**_dump(leg)) for leg in payload.legs]
     session.add(bet)
     session.commit()
+    response_cache.invalidate_user(user_id)
     session.refresh(bet)
     return bet
 
 
+def is_scalar_update(payload: BetUpdate) -> bool:
+    fields = _dump(payload, exclude_unset=True).keys()
+    return fields <= SCALAR_UPDATE_FIELDS
+
+
+def update_bet_scalars(session: Session, bet_id: UUID, user_id: UUID, payload: BetUpdate) -> Optional[Bet]:
+    """Apply a scalar-only patch as one ``UPDATE ... RETURNING`` statement.
+
+    Legs are only queried for parlays. The returned bet is detached so the
+    commit does not expire it and serializing it issues no extra queries.
+    """
+    data = _dump(payload, exclude_unset=True, exclude_none=True)
+    data["updated_at"] = utcnow()
+    statement = (
+        update(Bet)
+        .where(Bet.id == bet_id, Bet.user_id == user_id)
+        .values(**data)
+        .returning(Bet)
+        .execution_options(synchronize_session=False)
+    )
+    bet = session.exec(statement).scalars().first()
+    if bet is None:
+        if not restore_bet(session, bet_id, user_id):
+            session.rollback()
+            return None
+        bet = session.exec(statement).scalars().first()
+    legs: List[ParlayLeg] = []
+    if bet.type == BetType.PARLAY:
+        legs = list(session.exec(select(ParlayLeg).where(ParlayLeg.bet_id == bet.id)).all())
+    set_committed_value(bet, "legs", legs)
+    session.expunge(bet)
+    session.commit()
+    response_cache.invalidate_user(user_id)
+    return bet
+
+
+def _apply_leg_diff(bet: Bet, legs: List[ParlayLegUpdate]) -> None:
+    """Update legs in place by id; unknown ids are inserted, missing ones deleted."""
+    current = {leg.id: leg for leg in bet.legs}
+    for item in legs:
+        existing = current.pop(item.id, None) if item.id else None
+        if existing is None:
+            bet.legs.append(ParlayLeg(**_dump(item, exclude={"id"})))
+            continue
+        if existing.detail != item.detail:
+            existing.detail = item.detail
+        if existing.odds != item.odds:
+            existing.odds = item.odds
+    for leg in current.values():
+        bet.legs.remove(leg)
+
+
 def update_bet(session: Session, bet: Bet, payload: BetUpdate) -> Bet:
     data = _dump(payload, exclude_unset=True, exclude_none=True, exclude={"legs"})
     for key, value in data.items():
         setattr(bet, key, value)
     if payload.legs is not None:
-        bet.legs.clear()
-        if bet.type == BetType.PARLAY:
-            for leg in payload.legs:
-                bet.legs.append(ParlayLeg(**_dump(leg)))
+        _apply_leg_diff(bet, payload.legs if bet.type == BetType.PARLAY else [])
     bet.updated_at = utcnow()
     session.add(bet)
     session.commit()
+    response_cache.invalidate_user(bet.user_id)
     session.refresh(bet)
     return bet
 
 
-def delete_bet(session: Session, bet: Bet) -> None:
+def delete_bet(session: Session, bet: AnyBet) -> None:
+    user_id = bet.user_id
     session.delete(bet)
     session.commit()
+    response_cache.invalidate_user(user_id)
 
 
-def sync_since(session: Session, user_id: UUID, since: Optional[datetime]) -> List[Bet]:
-    statement = select(Bet).where(Bet.user_id == user_id)
+def _apply_bulk_filter(statement, where: BetBulkFilter, user_id: UUID, model=Bet):
+    statement = statement.where(model.user_id == user_id)
+    if where.ids:
+        statement = statement.where(model.id.in_(where.ids))
+    return _apply_filter(statement, where.as_filter(), model)
+
+
+def bulk_update_bets(
+    session: Session,
+    user_id: UUID,
+    where: BetBulkFilter,
+    outcome: Optional[BetOutcome] = None,
+    cashout: Optional[float] = None,
+) -> List[UUID]:
+    """Set ``outcome``/``cashout`` on every matching bet with one ``UPDATE``.
+
+    Matching archived bets are restored first (one set-based move), so the
+    archive keeps holding settled bets only and the update stamps every row's
+    ``updated_at`` for sync. Returns the ids that changed.
+    """
+    if BetArchive in _tier_models(where.as_filter()):
+        archived = list(session.exec(_apply_bulk_filter(select(BetArchive.id), where, user_id, BetArchive)).all())
+        if archived:
+            restore_bets(session, archived)
+    values: Dict[str, Any] = {"updated_at": utcnow()}
+    if outcome is not None:
+        values["outcome"] = outcome
+    if cashout is not None:
+        values["cashout"] = cashout
+    statement = (
+        _apply_bulk_filter(update(Bet), where, user_id)
+        .values(**values)
+        .returning(Bet.id)
+        .execution_options(synchronize_session=False)
+    )
+    ids = list(session.exec(statement).scalars())
+    session.commit()
+    response_cache.invalidate_user(user_id)
+    return ids
+
+
+def bulk_delete_bets(session: Session, user_id: UUID, where: BetBulkFilter) -> List[UUID]:
+    """Delete every matching bet, in both tiers, with set-based statements."""
+    ids: List[UUID] = []
+    for model in _tier_models(where.as_filter()):
+        leg_model = _LEG_MODELS[model]
+        matching = _apply_bulk_filter(select(model.id), where, user_id, model)
+        session.exec(delete(leg_model).where(leg_model.bet_id.in_(matching)))
+        statement = (
+            _apply_bulk_filter(delete(model), where, user_id, model)
+            .returning(model.id)
+            .execution_options(synchronize_session=False)
+        )
+        ids.extend(session.exec(statement).scalars())
+    session.commit()
+    response_cache.invalidate_user(user_id)
+    return ids
+
+
+# A sync position: the ``(updated_at, id)`` of the last change a client saw.
+SyncCursor = Tuple[datetime, UUID]
+
+
+def _sync_statement(statement, model, since: Optional[datetime], after: Optional[SyncCursor], limit: Optional[int]):
+    """Restrict to changes past ``since``/``after`` in stable ``(updated_at, id)`` order."""
     if since:
-        statement = statement.where(Bet.updated_at >= since)
-    statement = statement.order_by(Bet.updated_at)
-    return session.exec(statement).unique().all()
+        statement = statement.where(model.updated_at >= since)
+    if after:
+        updated_at, bet_id = after
+        statement = statement.where(
+            or_(model.updated_at > updated_at, and_(model.updated_at == updated_at, model.id > bet_id))
+        )
+    statement = statement.order_by(model.updated_at, model.id)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
+
+
+def sync_since(
+    session: Session,
+    user_id: UUID,
+    since: Optional[datetime],
+    after: Optional[SyncCursor] = None,
+    limit: Optional[int] = None,
+) -> List[AnyBet]:
+    """Bets changed since ``since`` (and past ``after``), at most ``limit`` of them.
+
+    Each tier is limited on its own before the merge, so a page never loads
+    more than ``2 * limit`` rows whatever the account size.
+    """
+    tiers = []
+    for model in (Bet, BetArchive):
+        statement = _sync_statement(select(model).where(model.user_id == user_id), model, since, after, limit)
+        tiers.append(session.exec(statement).unique().all())
+    merged = heapq.merge(*tiers, key=lambda bet: (bet.updated_at, bet.id))
+    return list(merged if limit is None else islice(merged, limit))
+
+
+def sync_fields(
+    session: Session,
+    user_id: UUID,
+    since: Optional[datetime],
+    fields: Sequence[str],
+    include_legs: bool = False,
+    after: Optional[SyncCursor] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Sparse-fieldset variant of :func:`sync_since`."""
+    keys = ("updated_at", "id")
+    statements = []
+    for model in (Bet, BetArchive):
+        statement = select(*_columns(model, ("id", *fields), keys)).where(model.user_id == user_id)
+        statements.append((model, _sync_statement(statement, model, since, after, limit)))
+    rows = _select_fields(session, statements, fields, keys, include_legs)
+    return rows if limit is None else rows[:limit]
+
+
+def settled_history(session: Session, user_id: UUID) -> List[Tuple[float, float, bool]]:
+    """``(stake, odds, won)`` for every settled bet in both tiers, for the simulator."""
+    rows: List[Tuple[float, float, bool]] = []
+    for model in (Bet, BetArchive):
+        statement = select(model.stake, model.odds, model.outcome).where(
+            model.user_id == user_id, model.outcome.in_((BetOutcome.WIN, BetOutcome.LOSS))
+        )
+        rows.extend((stake, odds, outcome == BetOutcome.WIN) for stake, odds, outcome in session.exec(statement))
+    return rows
 
 
 def get_user_by_email(session: Session, email: str) -> Optional[User]:
@@ -99,14 +491,65 @@ def get_user(session: Session, user_id: UUID) -> Optional[User]:
     return session.get(User, user_id)
 
 
+def create_refresh_token(
+    session: Session,
+    user_id: UUID,
+    token_hash: str,
+    family_id: UUID,
+    expires_at: datetime,
+) -> RefreshToken:
+    token = RefreshToken(user_id=user_id, token_hash=token_hash, family_id=family_id, expires_at=expires_at)
+    session.add(token)
+    session.commit()
+    return token
+
+
+def get_refresh_token(session: Session, token_hash: str) -> Optional[RefreshToken]:
+    return session.exec(select(RefreshToken).where(RefreshToken.token_hash == token_hash)).first()
+
+
+def claim_refresh_token(session: Session, token_id: UUID, now: datetime) -> bool:
+    """Mark a live token as used; ``False`` if it was already used or expired."""
+    statement = (
+        update(RefreshToken)
+        .where(RefreshToken.id == token_id, RefreshToken.revoked_at.is_(None), RefreshToken.expires_at > now)
+        .values(revoked_at=now)
+    )
+    return session.exec(statement).rowcount == 1
+
+
+def revoke_refresh_family(session: Session, family_id: UUID, now: datetime) -> None:
+    statement = (
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+    session.exec(statement)
+    session.commit()
+
+
 __all__ = [
     "list_bets",
+    "list_bet_fields",
+    "search_bets",
     "get_bet",
+    "get_bets",
     "create_bet",
+    "is_scalar_update",
+    "update_bet_scalars",
     "update_bet",
     "delete_bet",
+    "bulk_update_bets",
+    "bulk_delete_bets",
+    "SyncCursor",
     "sync_since",
+    "sync_fields",
+    "settled_history",
     "get_user_by_email",
     "create_user",
     "get_user",
+    "create_refresh_token",
+    "get_refresh_token",
+    "claim_refresh_token",
+    "revoke_refresh_family",
 ]
@@ -1,23 +1,174 @@
 ﻿from __future__ import annotations
 
+from collections import OrderedDict
 from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Iterator, List, Optional
+from uuid import UUID
 
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
 from sqlmodel import Session, SQLModel, create_engine
 
+from .response_cache import ensure_version_table
+from .search import ensure_search_index
 from .settings import get_settings
 
+_JOURNAL_MODES = {"delete", "truncate", "persist", "memory", "wal", "off"}
+_SYNCHRONOUS = {"off", "normal", "full", "extra"}
+
+# Tables that live in the per-user shards when sharding is enabled; users and
+# refresh tokens always stay in the central database.
+BET_TABLES = ("bet", "parlayleg", "bet_archive", "parlayleg_archive")
+
 settings = get_settings()
-engine = create_engine(settings.database_url, echo=False, connect_args={"check_same_thread": False})
+
+
+def _configure_sqlite(dbapi_connection, _record) -> None:
+    cursor = dbapi_connection.cursor()
+    journal_mode = (settings.sqlite_journal_mode or "").lower()
+    if journal_mode in _JOURNAL_MODES:
+        cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+    synchronous = (settings.sqlite_synchronous or "").lower()
+    if synchronous in _SYNCHRONOUS:
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+    cursor.close()
+
+
+def _new_engine(url: str) -> Engine:
+    new_engine = create_engine(
+        url,
+        echo=False,
+        connect_args={"check_same_thread": False, "timeout": settings.sqlite_busy_timeout_ms / 1000},
+    )
+    if new_engine.dialect.name == "sqlite":
+        event.listen(new_engine, "connect", _configure_sqlite)
+    return new_engine
+
+
+engine = _new_engine(settings.database_url)
+
+_shard_engines: "OrderedDict[Path, Engine]" = OrderedDict()
+_shard_lock = Lock()
+
+
+def sharding_enabled() -> bool:
+    return bool(settings.shard_dir)
+
+
+def shard_path(user_id: UUID) -> Path:
+    """File holding ``user_id``'s bets: its own file, or a hash bucket shared with others."""
+    if not isinstance(user_id, UUID):
+        user_id = UUID(str(user_id))
+    root = Path(settings.shard_dir or ".")
+    if settings.shard_buckets > 0:
+        return root / f"bucket-{user_id.int % settings.shard_buckets:04d}.db"
+    return root / f"user-{user_id.hex}.db"
+
+
+def _tables(names) -> List:
+    return [table for table in SQLModel.metadata.sorted_tables if table.name in names]
+
+
+def _ensure_index(target: Engine, index) -> None:
+    """Create ``index``, rebuilding it when an older version has different columns."""
+    if target.dialect.name == "sqlite":
+        with target.connect() as connection:
+            rows = connection.exec_driver_sql(f'PRAGMA index_info("{index.name}")').all()
+        existing = [row[2] for row in sorted(rows)]
+        if existing and existing != [column.name for column in index.columns]:
+            index.drop(target)
+    index.create(target, checkfirst=True)
+
+
+def _drop_stale_indexes(target: Engine, table) -> None:
+    """Drop ``ix_<table>_*`` indexes that the models no longer declare."""
+    if target.dialect.name != "sqlite":
+        return
+    declared = {index.name for index in table.indexes}
+    with target.begin() as connection:
+        names = connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND name LIKE ?",
+            (table.name, f"ix_{table.name}_%"),
+        ).scalars().all()
+        for name in names:
+            if name not in declared:
+                connection.exec_driver_sql(f'DROP INDEX "{name}"')
+
+
+def _create_schema(target: Engine, tables: List, with_bets: bool) -> None:
+    SQLModel.metadata.create_all(target, tables=tables)
+    for table in tables:
+        _drop_stale_indexes(target, table)
+        for index in table.indexes:
+            _ensure_index(target, index)
+    if with_bets:
+        with target.begin() as connection:
+            ensure_search_index(connection)
+            ensure_version_table(connection)
+
+
+def _shard_engine(path: Path) -> Engine:
+    with _shard_lock:
+        cached = _shard_engines.get(path)
+        if cached is not None:
+            _shard_engines.move_to_end(path)
+            return cached
+        from . import models  # noqa: F401  (registers the tables on the metadata)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        shard = _new_engine(f"sqlite:///{path.as_posix()}")
+        try:
+            _create_schema(shard, _tables(BET_TABLES), with_bets=True)
+        except OperationalError:
+            # Another worker process created the same shard concurrently;
+            # every step is idempotent, so one more pass settles it.
+            _create_schema(shard, _tables(BET_TABLES), with_bets=True)
+        _shard_engines[path] = shard
+        while len(_shard_engines) > settings.shard_engine_cache:
+            _, evicted = _shard_engines.popitem(last=False)
+            evicted.dispose()
+        return shard
+
+
+def engine_for_user(user_id: UUID) -> Engine:
+    """Engine holding ``user_id``'s bets: its shard, or the central engine when unsharded."""
+    if not sharding_enabled():
+        return engine
+    return _shard_engine(shard_path(user_id))
+
+
+def bet_engines() -> Iterator[Engine]:
+    """Every engine that holds bets, for maintenance jobs that walk all of them."""
+    if not sharding_enabled():
+        yield engine
+        return
+    for path in sorted(Path(settings.shard_dir).glob("*.db")):
+        yield _shard_engine(path)
+
+
+def open_engines() -> List[Engine]:
+    """The central engine and every shard engine currently cached, without opening new ones."""
+    with _shard_lock:
+        return [engine, *_shard_engines.values()]
 
 
 def init_db() -> None:
-    """Create tables if they do not exist."""
-    SQLModel.metadata.create_all(engine)
+    """Create tables and any indexes missing from databases created earlier."""
+    from . import models  # noqa: F401  (registers the tables on the metadata)
+
+    if sharding_enabled():
+        central = [table for table in SQLModel.metadata.sorted_tables if table.name not in BET_TABLES]
+        _create_schema(engine, central, with_bets=False)
+    else:
+        _create_schema(engine, SQLModel.metadata.sorted_tables, with_bets=True)
 
 
 @contextmanager
-def session_scope():
-    session = Session(engine)
+def session_scope(bind: Optional[Engine] = None):
+    session = Session(bind or engine)
     try:
         yield session
         session.commit()
@@ -28,9 +179,26 @@ def session_scope():
         session.close()
 
 
+def user_session_scope(user_id: UUID):
+    """``session_scope`` over the database holding ``user_id``'s bets."""
+    return session_scope(engine_for_user(user_id))
+
+
 def get_session():
     with Session(engine) as session:
         yield session
 
 
-__all__ = ["engine", "init_db", "session_scope", "get_session"]
+__all__ = [
+    "BET_TABLES",
+    "bet_engines",
+    "engine",
+    "engine_for_user",
+    "get_session",
+    "init_db",
+    "open_engines",
+    "session_scope",
+    "shard_path",
+    "sharding_enabled",
+    "user_session_scope",
+]
@@ -0,0 +1,326 @@
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Callable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlmodel import select
+
+from . import crud
+from .db import bet_engines, engine, init_db, sharding_enabled
+from .models import (
+    Bet,
+    BetArchive,
+    BetBulkFilter,
+    BetFilter,
+    BetOutcome,
+    BetSortKey,
+    BetType,
+    RefreshToken,
+    User,
+)
+from .search import build_match_query, search_statement
+
+# Pages released per ``PRAGMA incremental_vacuum`` step, so the time budget
+# is checked often.
+_VACUUM_STEP_PAGES = 256
+_AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+@dataclass
+class ObjectSize:
+    name: str
+    kind: str
+    table: str
+    bytes: int
+    rows: Optional[int] = None
+
+
+@dataclass
+class QueryPlan:
+    name: str
+    plan: List[str]
+
+    @property
+    def full_scans(self) -> List[str]:
+        """Plan steps reading a whole table instead of seeking an index.
+
+        Scans of subquery results (``anon_*``) and FTS virtual tables are not
+        table scans.
+        """
+        return [
+            step
+            for step in self.plan
+            if step.startswith("SCAN ")
+            and " USING " not in step
+            and "VIRTUAL TABLE" not in step
+            and not step.split()[1].startswith("anon_")
+        ]
+
+    @property
+    def temp_sorts(self) -> List[str]:
+        return [step for step in self.plan if "TEMP B-TREE" in step]
+
+
+@dataclass
+class VacuumResult:
+    mode: str
+    pages_freed: int
+    seconds: float
+    complete: bool
+    note: Optional[str] = None
+
+
+@dataclass
+class DatabaseReport:
+    label: str
+    path: Optional[str]
+    file_bytes: Optional[int]
+    wal_bytes: Optional[int]
+    journal_mode: str
+    page_size: int
+    page_count: int
+    freelist_count: int
+    auto_vacuum: str
+    objects: List[ObjectSize] = field(default_factory=list)
+    redundant_indexes: List[Tuple[str, str]] = field(default_factory=list)
+    plans: List[QueryPlan] = field(default_factory=list)
+    analyze_ms: Optional[float] = None
+    optimize_ms: Optional[float] = None
+    vacuum: Optional[VacuumResult] = None
+
+    @property
+    def freelist_ratio(self) -> float:
+        return self.freelist_count / self.page_count if self.page_count else 0.0
+
+
+def _pragma(connection: Connection, name: str):
+    return connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def _file_size(path: Optional[str]) -> Optional[int]:
+    if not path or not os.path.exists(path):
+        return None
+    return os.path.getsize(path)
+
+
+def _object_sizes(connection: Connection) -> List[ObjectSize]:
+    objects = {
+        name: (kind, table)
+        for kind, name, table in connection.exec_driver_sql(
+            "SELECT type, name, tbl_name FROM sqlite_master WHERE type IN ('table', 'index')"
+        )
+    }
+    try:
+        sizes = dict(connection.exec_driver_sql("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").all())
+    except OperationalError:
+        # SQLite built without dbstat: page counts are not available.
+        sizes = {}
+    report = []
+    for name, (kind, table) in objects.items():
+        rows = None
+        if kind == "table":
+            rows = connection.exec_driver_sql(f'SELECT COUNT(*) FROM "{name}"').scalar()
+        report.append(ObjectSize(name=name, kind=kind, table=table, bytes=int(sizes.get(name) or 0), rows=rows))
+    report.sort(key=lambda item: item.bytes, reverse=True)
+    return report
+
+
+def _redundant_indexes(connection: Connection) -> List[Tuple[str, str]]:
+    """Non-unique indexes whose columns are a prefix of another index on the same table.
+
+    Returns ``(index, covered_by)`` pairs; such indexes cost space and write
+    time without giving the planner anything new.
+    """
+    columns = {}
+    unique = {}
+    for (table,) in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'"):
+        for row in connection.exec_driver_sql(f'PRAGMA index_list("{table}")'):
+            name, is_unique = row[1], bool(row[2])
+            info = connection.exec_driver_sql(f'PRAGMA index_info("{name}")').all()
+            columns[name] = (table, tuple(item[2] for item in sorted(info)))
+            unique[name] = is_unique
+    redundant = []
+    for name, (table, cols) in columns.items():
+        if unique[name] or not cols:
+            continue
+        for other, (other_table, other_cols) in sorted(columns.items()):
+            if other != name and other_table == table and other_cols[: len(cols)] == cols and (
+                len(other_cols) > len(cols) or unique[other]
+            ):
+                redundant.append((name, other))
+                break
+    return redundant
+
+
+def _bet_queries() -> List[Tuple[str, object]]:
+    """The statements ``crud`` issues against the bet tables, with sample values."""
+    user_id = UUID(int=1)
+    now = datetime.now(timezone.utc)
+    queries: List[Tuple[str, object]] = []
+    for label, filters in (
+        ("list_bets", BetFilter()),
+        ("list_bets outcome", BetFilter(outcome=BetOutcome.WIN)),
+        ("list_bets type", BetFilter(type=BetType.PARLAY)),
+        ("list_bets rango", BetFilter(start=date(2024, 1, 1), end=date(2024, 12, 31))),
+        ("list_bets sort=odds", BetFilter(sort=BetSortKey.ODDS)),
+        ("list_bets sort=stake", BetFilter(sort=BetSortKey.STAKE)),
+        ("list_bets sort=updated_at", BetFilter(sort=BetSortKey.UPDATED_AT)),
+    ):
+        for model in crud._tier_models(filters):
+            statement = crud._apply_filter(select(model).where(model.user_id == user_id), filters, model)
+            suffix = "" if model is Bet else " (archivo)"
+            queries.append((label + suffix, crud._apply_sort(statement, filters, model)))
+    for model in (Bet, BetArchive):
+        suffix = "" if model is Bet else " (archivo)"
+        queries.append(("get_bet" + suffix, select(model).where(model.id == UUID(int=2), model.user_id == user_id)))
+        queries.append((
+            "get_bets" + suffix,
+            select(model).where(model.user_id == user_id, model.id.in_([UUID(int=2), UUID(int=3)])),
+        ))
+        queries.append((
+            "sync_since" + suffix,
+            crud._sync_statement(select(model).where(model.user_id == user_id), model, now, (now, UUID(int=2)), 500),
+        ))
+        queries.append((
+            "bulk filter" + suffix,
+            crud._apply_bulk_filter(select(model.id), BetBulkFilter(start=date(2024, 1, 1)), user_id, model),
+        ))
+    queries.append((
+        "settled_history",
+        select(Bet.stake, Bet.odds, Bet.outcome).where(
+            Bet.user_id == user_id, Bet.outcome.in_((BetOutcome.WIN, BetOutcome.LOSS))
+        ),
+    ))
+    queries.append(("search_bets", search_statement(build_match_query(user_id, "inter"), 50, 0)))
+    return queries
+
+
+def _central_queries() -> List[Tuple[str, object]]:
+    return [
+        ("get_user_by_email", select(User).where(User.email == "doctor@example.com")),
+        ("get_refresh_token", select(RefreshToken).where(RefreshToken.token_hash == "0" * 64)),
+    ]
+
+
+def _explain(connection: Connection, name: str, statement) -> QueryPlan:
+    sql = str(statement.compile(connection, compile_kwargs={"literal_binds": True}))
+    try:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+    except OperationalError as exc:
+        return QueryPlan(name=name, plan=[f"error: {exc.orig}"])
+    return QueryPlan(name=name, plan=[row[-1] for row in rows])
+
+
+def _timed(action: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    action()
+    return (time.perf_counter() - started) * 1000
+
+
+def _vacuum(connection: Connection, auto_vacuum: str, budget_seconds: float, convert: bool) -> VacuumResult:
+    """Release free pages until none are left or ``budget_seconds`` runs out.
+
+    Only databases in ``auto_vacuum=incremental`` can do this in steps. Others
+    need one full VACUUM to switch modes, which is not time-bounded, so it is
+    only done with ``convert``.
+    """
+    before = _pragma(connection, "freelist_count")
+    started = time.perf_counter()
+    if auto_vacuum != "incremental":
+        if not convert:
+            return VacuumResult(
+                mode=auto_vacuum,
+                pages_freed=0,
+                seconds=0.0,
+                complete=False,
+                note="auto_vacuum no es incremental; usa --convert-vacuum (VACUUM completo, una sola vez)",
+            )
+        connection.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        connection.exec_driver_sql("VACUUM")
+        return VacuumResult(
+            mode="incremental",
+            pages_freed=before - _pragma(connection, "freelist_count"),
+            seconds=time.perf_counter() - started,
+            complete=True,
+            note="convertida a auto_vacuum incremental",
+        )
+
+    deadline = started + budget_seconds
+    remaining = before
+    while remaining and time.perf_counter() < deadline:
+        # ``executescript`` steps the pragma to completion; a plain execute
+        # through the driver frees a single page per call.
+        connection.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({_VACUUM_STEP_PAGES})")
+        remaining = _pragma(connection, "freelist_count")
+    return VacuumResult(
+        mode=auto_vacuum,
+        pages_freed=before - remaining,
+        seconds=time.perf_counter() - started,
+        complete=remaining == 0,
+    )
+
+
+def diagnose(
+    target: Engine,
+    label: str,
+    queries: List[Tuple[str, object]],
+    analyze: bool = True,
+    vacuum_seconds: Optional[float] = None,
+    convert_vacuum: bool = False,
+) -> DatabaseReport:
+    path = target.url.database if target.url.database not in (None, "", ":memory:") else None
+    # Autocommit so ANALYZE, VACUUM and the PRAGMAs are not wrapped in a transaction.
+    with target.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        report = DatabaseReport(
+            label=label,
+            path=path,
+            file_bytes=_file_size(path),
+            wal_bytes=_file_size(f"{path}-wal" if path else None),
+            journal_mode=str(_pragma(connection, "journal_mode")),
+            page_size=_pragma(connection, "page_size"),
+            page_count=_pragma(connection, "page_count"),
+            freelist_count=_pragma(connection, "freelist_count"),
+            auto_vacuum=_AUTO_VACUUM_MODES.get(_pragma(connection, "auto_vacuum"), "?"),
+        )
+        report.objects = _object_sizes(connection)
+        report.redundant_indexes = _redundant_indexes(connection)
+        if analyze:
+            report.analyze_ms = _timed(lambda: connection.exec_driver_sql("ANALYZE"))
+            report.optimize_ms = _timed(lambda: connection.exec_driver_sql("PRAGMA optimize").all())
+        report.plans = [_explain(connection, name, statement) for name, statement in queries]
+        if vacuum_seconds:
+            report.vacuum = _vacuum(connection, report.auto_vacuum, vacuum_seconds, convert_vacuum)
+            report.page_count = _pragma(connection, "page_count")
+            report.freelist_count = _pragma(connection, "freelist_count")
+            report.file_bytes = _file_size(path)
+    return report
+
+
+def run_doctor(
+    analyze: bool = True,
+    vacuum_seconds: Optional[float] = None,
+    convert_vacuum: bool = False,
+) -> List[DatabaseReport]:
+    """Diagnose the central database and, when sharded, every shard.
+
+    The vacuum budget applies to each database separately.
+    """
+    init_db()
+    if engine.dialect.name != "sqlite":
+        raise RuntimeError("invictos doctor solo soporta SQLite")
+    options = {"analyze": analyze, "vacuum_seconds": vacuum_seconds, "convert_vacuum": convert_vacuum}
+    if not sharding_enabled():
+        return [diagnose(engine, "central", _central_queries() + _bet_queries(), **options)]
+    reports = [diagnose(engine, "central", _central_queries(), **options)]
+    for shard in bet_engines():
+        reports.append(diagnose(shard, os.path.basename(shard.url.database), _bet_queries(), **options))
+    return reports
+
+
+__all__ = ["DatabaseReport", "ObjectSize", "QueryPlan", "VacuumResult", "diagnose", "run_doctor"]
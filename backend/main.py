@@ -1,34 +1,62 @@
 ﻿from __future__ import annotations
 
-from datetime import date, datetime
-from typing import List, Optional
+import base64
+import binascii
+import json
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Optional, Tuple
 from uuid import UUID
 
-from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, HTTPException, Query, Response, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session
 
-from . import crud
-from .auth import authenticate_user, get_current_user, get_current_user_id
+from . import backup, crud, simulation
+from .auth import (
+    authenticate_user,
+    get_bet_session,
+    get_current_user,
+    get_current_user_id,
+    issue_refresh_token,
+    require_admin,
+    revoke_refresh_token,
+    rotate_refresh_token,
+)
 from .db import get_session, init_db
 from .models import (
     AuthResponse,
+    BetBulkFilter,
+    BetBulkUpdate,
     BetCreate,
+    BetFilter,
+    BetQuery,
+    BetQueryResponse,
     BetRead,
+    BetSearchResponse,
     BetUpdate,
+    BulkResult,
+    RefreshRequest,
     SyncResponse,
     UserCreate,
     UserLogin,
     UserRead,
     utcnow,
 )
+from .ratelimit import rate_limit_middleware
+from .response_cache import data_version, response_cache
 from .security import create_access_token, hash_password
 from .settings import get_settings
 
 app = FastAPI(title="Invictos Tracker API", version="0.2.0")
 settings = get_settings()
 
+# Middleware added last runs first: the limiter goes in before CORS so its
+# 429/503 responses still carry the CORS headers browsers need to read them.
+app.middleware("http")(rate_limit_middleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins,
@@ -60,8 +88,7 @@ def register_user(payload: UserCreate, session: Session = Depends(get_session))
         session.rollback()
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Correo ya registrado") from exc
 
-    token = create_access_token(subject=user.id)
-    return AuthResponse(access_token=token, user=_to_user_read(user))
+    return _auth_response(user, issue_refresh_token(session, user.id))
 
 
 @app.post("/auth/login", response_model=AuthResponse)
@@ -69,8 +96,18 @@ def login_user(payload: UserLogin, session: Session = Depends(get_session)) -> A
     user = authenticate_user(session, payload.email, payload.password)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas")
-    token = create_access_token(subject=user.id)
-    return AuthResponse(access_token=token, user=_to_user_read(user))
+    return _auth_response(user, issue_refresh_token(session, user.id))
+
+
+@app.post("/auth/refresh", response_model=AuthResponse)
+def refresh_session(payload: RefreshRequest, session: Session = Depends(get_session)) -> AuthResponse:
+    user, refresh_token = rotate_refresh_token(session, payload.refresh_token)
+    return _auth_response(user, refresh_token)
+
+
+@app.post("/auth/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout_session(payload: RefreshRequest, session: Session = Depends(get_session)) -> None:
+    revoke_refresh_token(session, payload.refresh_token)
 
 
 @app.get("/auth/me", response_model=UserRead)
@@ -78,21 +115,135 @@ def get_me(current_user = Depends(get_current_user)) -> UserRead:
     return _to_user_read(current_user)
 
 
-@app.get("/bets", response_model=List[BetRead])
+# ``GET /bets`` answers with cached, pre-serialized JSON and ``GET /sync``
+# with either a model or raw JSON, so FastAPI cannot derive their schemas from
+# a return model. Without ``fields`` and with legs the items are ``BetRead``;
+# otherwise they hold only the requested columns.
+_PARTIAL_BET = {
+    "type": "object",
+    "description": "`id` más los campos de `fields` (y `legs` si `include_legs`)",
+    "required": ["id"],
+    "properties": {
+        name: {"$ref": f"#/components/schemas/BetRead/properties/{name}"} for name in (*crud.BET_FIELDS, "legs")
+    },
+}
+_BET_LIST_RESPONSES = {
+    200: {
+        "description": "Apuestas del usuario, completas o solo con los campos pedidos",
+        "content": {
+            "application/json": {
+                "schema": {
+                    "oneOf": [
+                        {"type": "array", "items": {"$ref": "#/components/schemas/BetRead"}},
+                        {"type": "array", "items": _PARTIAL_BET},
+                    ]
+                }
+            }
+        },
+    }
+}
+_SYNC_SCHEMA = SyncResponse.model_json_schema(ref_template="#/components/schemas/{model}", mode="serialization")
+_SYNC_SCHEMA.pop("$defs", None)
+_SYNC_RESPONSES = {
+    200: {
+        "description": "Cambios desde `since`, completos o solo con los campos pedidos",
+        "content": {
+            "application/json": {
+                "schema": {
+                    "oneOf": [
+                        _SYNC_SCHEMA,
+                        {
+                            **_SYNC_SCHEMA,
+                            "title": "SyncFieldsResponse",
+                            "properties": {
+                                **_SYNC_SCHEMA["properties"],
+                                "items": {"type": "array", "title": "Items", "items": _PARTIAL_BET},
+                            },
+                        },
+                    ]
+                }
+            }
+        },
+    }
+}
+
+
+@app.get("/bets", response_class=Response, responses=_BET_LIST_RESPONSES)
 def api_list_bets(
-    start: Optional[date] = None,
-    end: Optional[date] = None,
-    session: Session = Depends(get_session),
+    filters: BetFilter = Depends(),
+    fields: Optional[str] = None,
+    include_legs: bool = True,
+    session: Session = Depends(get_bet_session),
+    user_id: UUID = Depends(get_current_user_id),
+) -> Response:
+    projection = _parse_fields(fields, include_legs)
+
+    def _compute() -> bytes:
+        if projection is not None:
+            rows = crud.list_bet_fields(session, user_id, projection, filters=filters, include_legs=include_legs)
+            return _dump_json(rows)
+        bets = crud.list_bets(session, user_id=user_id, filters=filters)
+        return _serialize_bets(bets)
+
+    key = ("bets", *filters.cache_key(), projection, include_legs)
+    version = data_version(session.connection(), user_id)
+    body = response_cache.get_or_compute(user_id, key, _compute, version)
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/bets/search", response_model=BetSearchResponse)
+def api_search_bets(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    session: Session = Depends(get_bet_session),
     user_id: UUID = Depends(get_current_user_id),
-) -> List[BetRead]:
-    bets = crud.list_bets(session, user_id=user_id, start=start, end=end)
-    return [_to_bet_read(bet) for bet in bets]
+) -> BetSearchResponse:
+    bets = crud.search_bets(session, user_id, q, limit + 1, offset)
+    next_offset = offset + limit if len(bets) > limit else None
+    return BetSearchResponse(items=[_to_bet_read(bet) for bet in bets[:limit]], next_offset=next_offset)
+
+
+@app.post("/bets/query", response_model=BetQueryResponse)
+def api_query_bets(
+    payload: BetQuery,
+    session: Session = Depends(get_bet_session),
+    user_id: UUID = Depends(get_current_user_id),
+) -> BetQueryResponse:
+    bets = crud.get_bets(session, payload.ids, user_id)
+    found = {bet.id for bet in bets}
+    missing = [bet_id for bet_id in dict.fromkeys(payload.ids) if bet_id not in found]
+    return BetQueryResponse(items=[_to_bet_read(bet) for bet in bets], missing=missing)
+
+
+@app.post("/bets/bulk-update", response_model=BulkResult)
+def api_bulk_update_bets(
+    payload: BetBulkUpdate,
+    session: Session = Depends(get_bet_session),
+    user_id: UUID = Depends(get_current_user_id),
+) -> BulkResult:
+    _require_criteria(payload.where)
+    if payload.outcome is None and payload.cashout is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nada que actualizar")
+    ids = crud.bulk_update_bets(session, user_id, payload.where, outcome=payload.outcome, cashout=payload.cashout)
+    return BulkResult(affected=len(ids), ids=ids)
+
+
+@app.post("/bets/bulk-delete", response_model=BulkResult)
+def api_bulk_delete_bets(
+    payload: BetBulkFilter,
+    session: Session = Depends(get_bet_session),
+    user_id: UUID = Depends(get_current_user_id),
+) -> BulkResult:
+    _require_criteria(payload)
+    ids = crud.bulk_delete_bets(session, user_id, payload)
+    return BulkResult(affected=len(ids), ids=ids)
 
 
 @app.get("/bets/{bet_id}", response_model=BetRead)
 def api_get_bet(
     bet_id: UUID,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_bet_session),
     user_id: UUID = Depends(get_current_user_id),
 ) -> BetRead:
     bet = crud.get_bet(session, bet_id, user_id)
@@ -104,7 +255,7 @@ def api_get_bet(
 @app.post("/bets", response_model=BetRead, status_code=status.HTTP_201_CREATED)
 def api_create_bet(
     payload: BetCreate,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_bet_session),
     user_id: UUID = Depends(get_current_user_id),
 ) -> BetRead:
     bet = crud.create_bet(session, payload, user_id)
@@ -115,10 +266,15 @@ def api_create_bet(
 def api_update_bet(
     bet_id: UUID,
     payload: BetUpdate,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_bet_session),
     user_id: UUID = Depends(get_current_user_id),
 ) -> BetRead:
-    bet = crud.get_bet(session, bet_id, user_id)
+    if crud.is_scalar_update(payload):
+        updated = crud.update_bet_scalars(session, bet_id, user_id, payload)
+        if not updated:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Apuesta no encontrada")
+        return _to_bet_read(updated)
+    bet = crud.get_bet(session, bet_id, user_id, restore=True)
     if not bet:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Apuesta no encontrada")
     updated = crud.update_bet(session, bet, payload)
@@ -128,7 +284,7 @@ def api_update_bet(
 @app.delete("/bets/{bet_id}", status_code=status.HTTP_204_NO_CONTENT)
 def api_delete_bet(
     bet_id: UUID,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_bet_session),
     user_id: UUID = Depends(get_current_user_id),
 ) -> None:
     bet = crud.get_bet(session, bet_id, user_id)
@@ -137,16 +293,135 @@ def api_delete_bet(
     crud.delete_bet(session, bet)
 
 
-@app.get("/sync", response_model=SyncResponse)
+@app.get("/sync", responses=_SYNC_RESPONSES)
 def api_sync(
     since: Optional[str] = None,
-    session: Session = Depends(get_session),
+    fields: Optional[str] = None,
+    include_legs: bool = True,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    session: Session = Depends(get_bet_session),
     user_id: UUID = Depends(get_current_user_id),
-) -> SyncResponse:
+):
+    """Changes since ``since`` in ``(updated_at, id)`` order.
+
+    With ``limit`` the response is one page; while ``has_more`` is true the
+    client asks again with the same ``since`` and ``cursor=next_cursor``, and
+    keeps ``last_sync`` from the last page.
+    """
     parsed_since = _parse_since(since)
-    bets = crud.sync_since(session, user_id, parsed_since)
+    after = _decode_cursor(cursor)
+    fetch = limit + 1 if limit is not None else None
+    projection = _parse_fields(fields, include_legs)
+    # Taken before reading: a write committed during the query is past
+    # ``last_sync`` and comes back on the next sync instead of being skipped.
     now = utcnow()
-    return SyncResponse(last_sync=now, items=[_to_bet_read(bet) for bet in bets])
+    if projection is not None:
+        keyed = projection if "updated_at" in projection else (*projection, "updated_at")
+        rows = crud.sync_fields(
+            session, user_id, parsed_since, keyed, include_legs=include_legs, after=after, limit=fetch
+        )
+        rows, next_cursor = _page(rows, limit, lambda row: (row["updated_at"], row["id"]))
+        if keyed is not projection:
+            for row in rows:
+                del row["updated_at"]
+        body = {"last_sync": now, "items": rows, "next_cursor": next_cursor, "has_more": next_cursor is not None}
+        return Response(content=_dump_json(body), media_type="application/json")
+    bets = crud.sync_since(session, user_id, parsed_since, after=after, limit=fetch)
+    bets, next_cursor = _page(bets, limit, lambda bet: (bet.updated_at, bet.id))
+    return SyncResponse(
+        last_sync=now,
+        items=[_to_bet_read(bet) for bet in bets],
+        next_cursor=next_cursor,
+        has_more=next_cursor is not None,
+    )
+
+
+def _page(items: list, limit: Optional[int], key) -> Tuple[list, Optional[str]]:
+    """Trim the extra look-ahead row and build the cursor for the next page."""
+    if limit is None or len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, _encode_cursor(*key(items[-1]))
+
+
+def _encode_cursor(updated_at: datetime, bet_id: UUID) -> str:
+    raw = f"{updated_at.isoformat()}|{bet_id.hex}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(value: Optional[str]) -> Optional[crud.SyncCursor]:
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode("ascii")
+        stamp, _, bet_id = raw.partition("|")
+        return _as_utc(datetime.fromisoformat(stamp)), UUID(hex=bet_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parámetro 'cursor' inválido") from exc
+
+
+def _require_criteria(where: BetBulkFilter) -> None:
+    # An empty filter would touch the whole account; make that explicit.
+    if where.is_empty():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Indica al menos un criterio")
+
+
+@app.get("/simulate")
+def api_simulate(
+    bankroll: float = Query(..., gt=0),
+    paths: int = Query(10_000, ge=100, le=100_000),
+    bets: int = Query(1_000, ge=1, le=10_000),
+    ruin_level: float = Query(0.0, ge=0),
+    seed: Optional[int] = None,
+    stream: bool = False,
+    session: Session = Depends(get_bet_session),
+    user_id: UUID = Depends(get_current_user_id),
+) -> Response:
+    """Monte Carlo bankroll paths from the user's settled bets.
+
+    With ``stream=true`` the body is NDJSON: ``{"progress": ...}`` lines
+    followed by one ``{"result": ...}`` line.
+    """
+    if not simulation.available():
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Simulación no disponible: falta numpy")
+    if ruin_level >= bankroll:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El nivel de ruina debe ser menor al bankroll")
+    history = crud.settled_history(session, user_id)
+    if not history:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Sin apuestas resueltas para simular")
+    params = simulation.SimulationParams(bankroll=bankroll, paths=paths, bets=bets, ruin_level=ruin_level, seed=seed)
+    if stream:
+        events = simulation.iter_simulation(history, params)
+        return StreamingResponse((_dump_json(event) + b"\n" for event in events), media_type="application/x-ndjson")
+    return Response(content=_dump_json(simulation.run_simulation(history, params)), media_type="application/json")
+
+
+@app.post("/admin/backup", dependencies=[Depends(require_admin)])
+def api_backup(compress: bool = False, verify: bool = True) -> dict:
+    """Online backup of every database file into ``INVICTOS_BACKUP_DIR``.
+
+    Runs in the request's worker thread; writers keep going between steps.
+    """
+    try:
+        reports = backup.run_backup(compress=compress, verify=verify)
+    except backup.BackupError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+    return {"backups": [asdict(report) for report in reports]}
+
+
+def _parse_fields(value: Optional[str], include_legs: bool) -> Optional[Tuple[str, ...]]:
+    """Validate a ``fields=`` list; ``None`` means the full ``BetRead`` shape."""
+    if value is None:
+        return None if include_legs else crud.BET_FIELDS
+    requested = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = [item for item in requested if item not in crud.BET_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campos no soportados: {', '.join(unknown)}",
+        )
+    return tuple(name for name in crud.BET_FIELDS if name in requested or name == "id")
 
 
 def _parse_since(value: Optional[str]) -> Optional[datetime]:
@@ -157,17 +432,45 @@ def _parse_since(value: Optional[str]) -> Optional[datetime]:
         return None
     normalized = value.replace("Z", "+00:00")
     try:
-        return datetime.fromisoformat(normalized)
+        return _as_utc(datetime.fromisoformat(normalized))
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parámetro 'since' inválido") from exc
 
 
+def _as_utc(value: datetime) -> datetime:
+    # Stored timestamps are UTC; a naive value from a client means the same.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
 def _to_bet_read(bet) -> BetRead:
     if hasattr(BetRead, "model_validate"):
         return BetRead.model_validate(bet)
     return BetRead.from_orm(bet)  # type: ignore[attr-defined]
 
 
+def _serialize_bets(bets) -> bytes:
+    items = [_to_bet_read(bet) for bet in bets]
+    if hasattr(BetRead, "model_dump_json"):
+        parts = [item.model_dump_json() for item in items]
+    else:
+        parts = [item.json() for item in items]  # type: ignore[attr-defined]
+    return ("[" + ",".join(parts) + "]").encode("utf-8")
+
+
+def _dump_json(data) -> bytes:
+    return json.dumps(jsonable_encoder(data), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _auth_response(user, refresh_token: str) -> AuthResponse:
+    token = create_access_token(subject=user.id)
+    return AuthResponse(
+        access_token=token,
+        user=_to_user_read(user),
+        refresh_token=refresh_token,
+        expires_in=settings.jwt_exp_minutes * 60,
+    )
+
+
 def _to_user_read(user) -> UserRead:
     if hasattr(UserRead, "model_validate"):
         return UserRead.model_validate(user)
@@ -6,6 +6,7 @@ from typing import Optional
 from uuid import UUID, uuid4
 
 from pydantic import ConfigDict, EmailStr
+from sqlalchemy import Index
 from sqlalchemy.orm import relationship
 from sqlmodel import Field, Relationship, SQLModel
 
@@ -21,17 +22,44 @@ class BetOutcome(str, Enum):
     PENDING = "pendiente"
 
 
+class BetSortKey(str, Enum):
+    EVENT_DATE = "event_date"
+    CREATED_AT = "created_at"
+    UPDATED_AT = "updated_at"
+    STAKE = "stake"
+    ODDS = "odds"
+
+
 def utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def _listing_indexes(table: str) -> tuple:
+    """Indexes behind the bet listings, for the hot table and its archive.
+
+    Each sort index ends with the sort's tie-breakers (see
+    ``crud.sort_columns``) so SQLite reads rows in order instead of sorting;
+    ``ix_*_user_updated`` also serves the ``(updated_at, id)`` sync order.
+    They all lead with ``user_id``, so no index on it alone is needed.
+    """
+    return (
+        Index(f"ix_{table}_user_date", "user_id", "event_date", "created_at", "id"),
+        Index(f"ix_{table}_user_outcome_date", "user_id", "outcome", "event_date", "created_at", "id"),
+        Index(f"ix_{table}_user_type_date", "user_id", "type", "event_date", "created_at", "id"),
+        Index(f"ix_{table}_user_created", "user_id", "created_at", "id"),
+        Index(f"ix_{table}_user_odds", "user_id", "odds", "id"),
+        Index(f"ix_{table}_user_stake", "user_id", "stake", "id"),
+        Index(f"ix_{table}_user_updated", "user_id", "updated_at", "id"),
+    )
+
+
 class UserBase(SQLModel):
     email: EmailStr = Field(index=True, unique=True)
     full_name: Optional[str] = Field(default=None, max_length=120)
 
 
 class User(UserBase, table=True):
-    id: UUID = Field(default_factory=uuid4, primary_key=True, index=True)
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
     hashed_password: str = Field(max_length=256)
     created_at: datetime = Field(default_factory=utcnow)
 
@@ -67,6 +95,28 @@ class Token(SQLModel):
 
 class AuthResponse(Token):
     user: UserRead
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+
+class RefreshRequest(SQLModel):
+    refresh_token: str = Field(min_length=16, max_length=256)
+
+
+class RefreshToken(SQLModel, table=True):
+    """Server side of a rotating refresh token; only a SHA-256 of the token is stored.
+
+    Tokens issued from one login share a ``family_id`` so reuse of an already
+    rotated token can revoke the whole chain.
+    """
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    user_id: UUID = Field(foreign_key="user.id", index=True)
+    family_id: UUID = Field(index=True)
+    token_hash: str = Field(max_length=64, unique=True, index=True)
+    created_at: datetime = Field(default_factory=utcnow)
+    expires_at: datetime
+    revoked_at: Optional[datetime] = None
 
 
 class TokenPayload(SQLModel):
@@ -79,7 +129,7 @@ class ParlayLegBase(SQLModel):
 
 
 class BetBase(SQLModel):
-    event_date: date = Field(index=True)
+    event_date: date
     type: BetType = Field(default=BetType.SINGLE)
     detail: str = Field(max_length=512)
     stake: float = Field(gt=0)
@@ -89,10 +139,12 @@ class BetBase(SQLModel):
 
 
 class Bet(BetBase, table=True):
-    id: UUID = Field(default_factory=uuid4, primary_key=True, index=True)
-    user_id: UUID = Field(foreign_key="user.id", index=True)
+    __table_args__ = _listing_indexes("bet")
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    user_id: UUID = Field(foreign_key="user.id")
     created_at: datetime = Field(default_factory=utcnow)
-    updated_at: datetime = Field(default_factory=utcnow, index=True)
+    updated_at: datetime = Field(default_factory=utcnow)
 
     user: Optional[User] = Relationship(
         sa_relationship=relationship(
@@ -113,7 +165,7 @@ class Bet(BetBase, table=True):
 
 
 class ParlayLeg(ParlayLegBase, table=True):
-    id: UUID = Field(default_factory=uuid4, primary_key=True, index=True)
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
     bet_id: UUID = Field(foreign_key="bet.id", index=True)
     created_at: datetime = Field(default_factory=utcnow)
 
@@ -123,6 +175,41 @@ class ParlayLeg(ParlayLegBase, table=True):
     )
 
 
+class BetArchive(BetBase, table=True):
+    """Settled bets moved out of the hot ``bet`` table; same columns as :class:`Bet`."""
+
+    __tablename__ = "bet_archive"
+    __table_args__ = _listing_indexes("bet_archive")
+
+    id: UUID = Field(primary_key=True)
+    user_id: UUID = Field(foreign_key="user.id")
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow)
+
+    legs: list["ParlayLegArchive"] = Relationship(
+        back_populates="bet",
+        sa_relationship=relationship(
+            "ParlayLegArchive",
+            back_populates="bet",
+            cascade="all, delete-orphan",
+            lazy="joined",
+        ),
+    )
+
+
+class ParlayLegArchive(ParlayLegBase, table=True):
+    __tablename__ = "parlayleg_archive"
+
+    id: UUID = Field(primary_key=True)
+    bet_id: UUID = Field(foreign_key="bet_archive.id", index=True)
+    created_at: datetime = Field(default_factory=utcnow)
+
+    bet: BetArchive = Relationship(
+        back_populates="legs",
+        sa_relationship=relationship("BetArchive", back_populates="legs"),
+    )
+
+
 class ParlayLegRead(ParlayLegBase):
     model_config = ConfigDict(from_attributes=True)
 
@@ -144,6 +231,10 @@ class BetCreate(BetBase):
     legs: list[ParlayLegBase] = Field(default_factory=list)
 
 
+class ParlayLegUpdate(ParlayLegBase):
+    id: Optional[UUID] = None
+
+
 class BetUpdate(SQLModel):
     event_date: Optional[date] = None
     type: Optional[BetType] = None
@@ -152,7 +243,70 @@ class BetUpdate(SQLModel):
     odds: Optional[float] = Field(default=None, gt=1)
     cashout: Optional[float] = Field(default=None, ge=0)
     outcome: Optional[BetOutcome] = None
-    legs: Optional[list[ParlayLegBase]] = None
+    legs: Optional[list[ParlayLegUpdate]] = None
+
+
+class BetFilter(SQLModel):
+    start: Optional[date] = None
+    end: Optional[date] = None
+    outcome: Optional[BetOutcome] = None
+    type: Optional[BetType] = None
+    min_odds: Optional[float] = None
+    max_odds: Optional[float] = None
+    min_stake: Optional[float] = None
+    max_stake: Optional[float] = None
+    has_cashout: Optional[bool] = None
+    sort: BetSortKey = BetSortKey.EVENT_DATE
+    desc: bool = True
+
+    def cache_key(self) -> tuple:
+        data = self.model_dump() if hasattr(self, "model_dump") else self.dict()  # type: ignore[attr-defined]
+        return tuple(data.items())
+
+
+class BetSearchResponse(SQLModel):
+    items: list[BetRead]
+    next_offset: Optional[int] = None
+
+
+# Most ids ``POST /bets/query`` accepts at once.
+MAX_QUERY_IDS = 500
+
+
+class BetQuery(SQLModel):
+    ids: list[UUID] = Field(min_length=1, max_length=MAX_QUERY_IDS)
+
+
+class BetQueryResponse(SQLModel):
+    items: list[BetRead]
+    missing: list[UUID]
+
+
+class BetBulkFilter(SQLModel):
+    """Which bets a bulk operation touches; every given criterion must match."""
+
+    ids: Optional[list[UUID]] = Field(default=None, min_length=1, max_length=MAX_QUERY_IDS)
+    start: Optional[date] = None
+    end: Optional[date] = None
+    outcome: Optional[BetOutcome] = None
+    type: Optional[BetType] = None
+
+    def is_empty(self) -> bool:
+        return not self.ids and self.start is None and self.end is None and self.outcome is None and self.type is None
+
+    def as_filter(self) -> BetFilter:
+        return BetFilter(start=self.start, end=self.end, outcome=self.outcome, type=self.type)
+
+
+class BetBulkUpdate(SQLModel):
+    where: BetBulkFilter
+    outcome: Optional[BetOutcome] = None
+    cashout: Optional[float] = Field(default=None, ge=0)
+
+
+class BulkResult(SQLModel):
+    affected: int
+    ids: list[UUID]
 
 
 class SyncResponse(SQLModel):
@@ -160,20 +314,36 @@ class SyncResponse(SQLModel):
 
     last_sync: datetime
     items: list[BetRead]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
 
 
 __all__ = [
     "AuthResponse",
     "Bet",
+    "BetArchive",
     "BetBase",
+    "BetBulkFilter",
+    "BetBulkUpdate",
     "BetCreate",
+    "BetFilter",
     "BetOutcome",
+    "BetQuery",
+    "BetQueryResponse",
     "BetRead",
+    "BetSearchResponse",
+    "BetSortKey",
     "BetType",
     "BetUpdate",
+    "BulkResult",
+    "MAX_QUERY_IDS",
     "ParlayLeg",
+    "ParlayLegArchive",
     "ParlayLegBase",
     "ParlayLegRead",
+    "ParlayLegUpdate",
+    "RefreshRequest",
+    "RefreshToken",
     "SyncResponse",
     "Token",
     "TokenPayload",
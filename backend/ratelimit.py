@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import anyio.to_thread
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+
+from .db import open_engines
+from .security import decode_access_token
+from .settings import get_settings
+
+READ = "read"
+WRITE = "write"
+AUTH = "auth"
+
+_EXEMPT_PATHS = frozenset({"/health", "/docs", "/openapi.json", "/redoc"})
+# POST endpoints that only read, so they share the read budget.
+_READ_POSTS = frozenset({"/bets/query"})
+
+
+@dataclass(frozen=True)
+class BucketSpec:
+    rate: float
+    burst: float
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by (class, identity), bounded by LRU eviction.
+
+    ``acquire`` returns 0 when the request is admitted, otherwise the number
+    of seconds until enough tokens will be available. ``reserve`` is the
+    fraction of the burst that must stay in the bucket, which is how load
+    shedding turns away clients that have been bursting while well-behaved
+    ones still get in.
+    """
+
+    def __init__(self, specs: Dict[str, BucketSpec], max_keys: int = 10000) -> None:
+        self.specs = specs
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Tuple[str, str], Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, bucket_class: str, key: str, reserve: float = 0.0, scale: float = 1.0) -> float:
+        return self.acquire_all(bucket_class, [(key, scale)], reserve)
+
+    def acquire_all(self, bucket_class: str, keys: Sequence[Tuple[str, float]], reserve: float = 0.0) -> float:
+        """Take one token from every ``(key, scale)`` bucket, or from none of them.
+
+        A request is charged only when all its buckets admit it, so being
+        turned away by one (say, the per-IP bucket) does not drain another.
+        Returns the longest wait among the buckets that refused.
+        """
+        spec = self.specs[bucket_class]
+        now = time.monotonic()
+        with self._lock:
+            state = []
+            wait = 0.0
+            for key, scale in keys:
+                rate, burst = spec.rate * scale, spec.burst * scale
+                bucket_key = (bucket_class, key)
+                tokens, updated = self._buckets.pop(bucket_key, (burst, now))
+                tokens = min(burst, tokens + (now - updated) * rate)
+                needed = 1.0 + reserve * burst
+                if tokens < needed:
+                    wait = max(wait, (needed - tokens) / rate if rate > 0 else float("inf"))
+                state.append((bucket_key, tokens))
+            for bucket_key, tokens in state:
+                self._buckets[bucket_key] = (tokens - 1.0 if wait == 0.0 else tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+def classify(request: Request) -> Optional[str]:
+    path = request.url.path
+    if path in _EXEMPT_PATHS or request.method == "OPTIONS":
+        return None
+    if path.startswith("/auth/") and request.method == "POST":
+        return AUTH
+    if request.method in ("GET", "HEAD") or path in _READ_POSTS:
+        return READ
+    return WRITE
+
+
+def _user_key(request: Request) -> Optional[str]:
+    header = request.headers.get("authorization", "")
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = decode_access_token(token)
+    except ValueError:
+        return None
+    return str(payload.sub) if payload.sub else None
+
+
+def current_pressure() -> float:
+    """Utilization (0..1) of the worker threadpool or the busiest DB connection pool.
+
+    With sharding every open shard engine has a pool of its own; one that is
+    exhausted stalls its users' requests just like the central pool would.
+    """
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    pressure = limiter.borrowed_tokens / max(limiter.total_tokens, 1)
+    for target in open_engines():
+        pool = target.pool
+        if hasattr(pool, "checkedout") and hasattr(pool, "size"):
+            capacity = pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+            if capacity > 0:
+                pressure = max(pressure, pool.checkedout() / capacity)
+    return pressure
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    seconds = max(1, math.ceil(min(retry_after, 3600)))
+    return JSONResponse(status_code=status_code, content={"detail": detail}, headers={"Retry-After": str(seconds)})
+
+
+settings = get_settings()
+limiter = TokenBucketLimiter({name: BucketSpec(*spec) for name, spec in settings.rate_limits.items()})
+
+
+async def rate_limit_middleware(request: Request, call_next):
+    bucket_class = classify(request) if settings.rate_limit_enabled else None
+    if bucket_class is None:
+        return await call_next(request)
+
+    shedding = current_pressure() >= settings.shed_threshold
+    reserve = 0.5 if shedding else 0.0
+    identities = []
+    user_key = _user_key(request) if bucket_class != AUTH else None
+    if user_key:
+        identities.append((f"user:{user_key}", 1.0))
+    if request.client:
+        scale = 1.0 if bucket_class == AUTH else settings.rate_limit_ip_multiplier
+        identities.append((f"ip:{request.client.host}", scale))
+
+    wait = limiter.acquire_all(bucket_class, identities, reserve=reserve)
+    if wait > 0:
+        if shedding:
+            return _reject(status.HTTP_503_SERVICE_UNAVAILABLE, "Servidor ocupado, reintenta en breve", wait)
+        return _reject(status.HTTP_429_TOO_MANY_REQUESTS, "Demasiadas solicitudes", wait)
+    return await call_next(request)
+
+
+__all__ = [
+    "AUTH",
+    "BucketSpec",
+    "READ",
+    "TokenBucketLimiter",
+    "WRITE",
+    "classify",
+    "current_pressure",
+    "rate_limit_middleware",
+]
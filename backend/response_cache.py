@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .settings import get_settings
+
+CacheKey = Tuple[Hashable, ...]
+
+# Per-user version of the bet data, shared by every worker process. Triggers
+# bump it inside the transaction of any write (ORM, bulk statements,
+# archiving), so a cached response is only served while the version it was
+# computed at is still current.
+_VERSION_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS bet_version (
+        user_id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+    """,
+]
+_BUMP = (
+    "INSERT INTO bet_version (user_id, version) {source} "
+    "ON CONFLICT(user_id) DO UPDATE SET version = version + 1;"
+)
+
+
+def _bump(user_ref: str) -> str:
+    return _BUMP.format(source=f"VALUES ({user_ref}, 1)")
+
+
+def _bump_via_bet(table: str, bet_ref: str) -> str:
+    # Legs carry no user_id; when the bet row is already gone its own
+    # delete trigger has bumped the version.
+    return _BUMP.format(source=f"SELECT user_id, 1 FROM {table} WHERE id = {bet_ref}")
+
+
+for _table, _legs in (("bet", "parlayleg"), ("bet_archive", "parlayleg_archive")):
+    _VERSION_DDL += [
+        f"CREATE TRIGGER IF NOT EXISTS {_table}_version_ai AFTER INSERT ON {_table} BEGIN {_bump('new.user_id')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {_table}_version_au AFTER UPDATE ON {_table} BEGIN "
+        f"{_bump('new.user_id')} {_bump('old.user_id')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {_table}_version_ad AFTER DELETE ON {_table} BEGIN {_bump('old.user_id')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {_legs}_version_ai AFTER INSERT ON {_legs} BEGIN "
+        f"{_bump_via_bet(_table, 'new.bet_id')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {_legs}_version_au AFTER UPDATE ON {_legs} BEGIN "
+        f"{_bump_via_bet(_table, 'new.bet_id')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {_legs}_version_ad AFTER DELETE ON {_legs} BEGIN "
+        f"{_bump_via_bet(_table, 'old.bet_id')} END",
+    ]
+del _table, _legs
+
+
+def ensure_version_table(connection: Connection) -> None:
+    """Create ``bet_version`` and the triggers that keep it current."""
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in _VERSION_DDL:
+        connection.execute(text(statement))
+
+
+def data_version(connection: Connection, user_id: UUID) -> Optional[int]:
+    """The user's current ``bet_version``; ``None`` where it is not tracked (non-SQLite)."""
+    if connection.dialect.name != "sqlite":
+        return None
+    row = connection.execute(
+        text("SELECT version FROM bet_version WHERE user_id = :user_id"), {"user_id": user_id.hex}
+    ).first()
+    return row[0] if row else 0
+
+
+class _Flight:
+    """A computation in progress that concurrent identical requests wait on."""
+
+    __slots__ = ("event", "generation", "version", "value", "error")
+
+    def __init__(self, generation: int, version: Optional[int]) -> None:
+        self.event = threading.Event()
+        self.generation = generation
+        self.version = version
+        self.value: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """LRU cache of serialized responses, keyed by user and query parameters.
+
+    Every mutation for a user bumps that user's generation and drops their
+    entries; results computed against an older generation are returned to the
+    requests that asked for them but never stored. Generations only cover
+    this process, so each entry also records the shared ``data_version`` it
+    was computed at and is served only while the caller reads the same one:
+    a write handled by another worker makes it a miss here too.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[UUID, CacheKey], Tuple[Optional[int], bytes]]" = OrderedDict()
+        self._user_keys: Dict[UUID, Set[Tuple[UUID, CacheKey]]] = {}
+        self._generations: Dict[UUID, int] = {}
+        self._inflight: Dict[Tuple[UUID, CacheKey], _Flight] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(
+        self, user_id: UUID, key: CacheKey, compute: Callable[[], bytes], version: Optional[int] = None
+    ) -> bytes:
+        """Cached bytes for ``key``, or ``compute()``'s; ``version`` is the caller's ``data_version``.
+
+        Read ``version`` before ``compute`` runs: a write landing in between
+        leaves newer bytes under an older version, which only costs a miss.
+        """
+        full_key = (user_id, key)
+        with self._lock:
+            cached = self._entries.get(full_key)
+            if cached is not None and cached[0] == version:
+                self._entries.move_to_end(full_key)
+                return cached[1]
+            flight = self._inflight.get(full_key)
+            leader = flight is None or flight.version != version
+            if leader:
+                flight = _Flight(self._generations.get(user_id, 0), version)
+                self._inflight[full_key] = flight
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value  # type: ignore[return-value]
+
+        try:
+            flight.value = compute()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(full_key) is flight:
+                    del self._inflight[full_key]
+                if flight.error is None and flight.generation == self._generations.get(user_id, 0):
+                    self._store(full_key, version, flight.value)  # type: ignore[arg-type]
+            flight.event.set()
+        return flight.value
+
+    def invalidate_user(self, user_id: UUID) -> None:
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for full_key in self._user_keys.pop(user_id, set()):
+                self._size -= len(self._entries.pop(full_key, (None, b""))[1])
+            for full_key in [k for k in self._inflight if k[0] == user_id]:
+                del self._inflight[full_key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+            self._size = 0
+
+    def _store(self, full_key: Tuple[UUID, CacheKey], version: Optional[int], value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        previous = self._entries.pop(full_key, None)
+        if previous is not None:
+            self._size -= len(previous[1])
+        self._entries[full_key] = (version, value)
+        self._user_keys.setdefault(full_key[0], set()).add(full_key)
+        self._size += len(value)
+        while self._size > self.max_bytes and self._entries:
+            evicted_key, (_version, evicted) = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            keys = self._user_keys.get(evicted_key[0])
+            if keys is not None:
+                keys.discard(evicted_key)
+                if not keys:
+                    del self._user_keys[evicted_key[0]]
+
+
+response_cache = ResponseCache(get_settings().response_cache_bytes)
+
+
+__all__ = ["ResponseCache", "data_version", "ensure_version_table", "response_cache"]
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import re
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import TextClause, text
+from sqlalchemy.engine import Connection
+
+# One FTS row per bet, keyed by the bet's id and its tier (``bet`` or
+# ``archive``). The implicit rowid of ``bet`` is not used as the key: the
+# table has a UUID primary key, so VACUUM may renumber it. ``bet_id`` is an
+# indexed column so the triggers find their row through the full-text index
+# (``bet_id : "<hex>"``) instead of scanning the table. ``user_id`` is indexed
+# so a search only intersects the user's own postings instead of filtering
+# after ranking every match in the table. Triggers keep the index in sync with
+# any write path (ORM, bulk statements, archiving).
+_COLUMNS = ("bet_id", "tier", "user_id", "detail", "legs")
+
+
+def _row(tier: str, ref: str) -> str:
+    """``WHERE`` clause picking the FTS row of bet ``ref`` (e.g. ``new.id``) in ``tier``."""
+    return f"""bet_fts MATCH 'bet_id : "' || {ref} || '"' AND tier = '{tier}'"""
+
+
+def _legs(table: str, ref: str) -> str:
+    return f"coalesce((SELECT group_concat(detail, ' ') FROM {table} WHERE bet_id = {ref}), '')"
+
+
+_TABLE = """
+CREATE VIRTUAL TABLE bet_fts USING fts5(
+    bet_id, tier UNINDEXED, user_id, detail, legs,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+_TRIGGERS = {
+    "bet_fts_ai": """
+    AFTER INSERT ON bet BEGIN
+        INSERT INTO bet_fts(bet_id, tier, user_id, detail, legs) VALUES (new.id, 'bet', new.user_id, new.detail, '');
+    END
+    """,
+    "bet_fts_au": f"""
+    AFTER UPDATE OF detail, user_id ON bet BEGIN
+        UPDATE bet_fts SET user_id = new.user_id, detail = new.detail WHERE {_row('bet', 'new.id')};
+    END
+    """,
+    "bet_fts_ad": f"""
+    AFTER DELETE ON bet BEGIN
+        DELETE FROM bet_fts WHERE {_row('bet', 'old.id')};
+    END
+    """,
+    "parlayleg_fts_ai": f"""
+    AFTER INSERT ON parlayleg BEGIN
+        UPDATE bet_fts SET legs = {_legs('parlayleg', 'new.bet_id')} WHERE {_row('bet', 'new.bet_id')};
+    END
+    """,
+    "parlayleg_fts_au": f"""
+    AFTER UPDATE OF detail ON parlayleg BEGIN
+        UPDATE bet_fts SET legs = {_legs('parlayleg', 'new.bet_id')} WHERE {_row('bet', 'new.bet_id')};
+    END
+    """,
+    "parlayleg_fts_ad": f"""
+    AFTER DELETE ON parlayleg BEGIN
+        UPDATE bet_fts SET legs = {_legs('parlayleg', 'old.bet_id')} WHERE {_row('bet', 'old.bet_id')};
+    END
+    """,
+    "bet_archive_fts_ai": """
+    AFTER INSERT ON bet_archive BEGIN
+        INSERT INTO bet_fts(bet_id, tier, user_id, detail, legs) VALUES (new.id, 'archive', new.user_id, new.detail, '');
+    END
+    """,
+    "bet_archive_fts_ad": f"""
+    AFTER DELETE ON bet_archive BEGIN
+        DELETE FROM bet_fts WHERE {_row('archive', 'old.id')};
+    END
+    """,
+    "parlayleg_archive_fts_ai": f"""
+    AFTER INSERT ON parlayleg_archive BEGIN
+        UPDATE bet_fts SET legs = {_legs('parlayleg_archive', 'new.bet_id')} WHERE {_row('archive', 'new.bet_id')};
+    END
+    """,
+}
+
+_BACKFILL = [
+    f"""
+    INSERT INTO bet_fts(bet_id, tier, user_id, detail, legs)
+    SELECT {table}.id, '{tier}', {table}.user_id, {table}.detail, {_legs(legs, f'{table}.id')}
+    FROM {table}
+    """
+    for table, tier, legs in (("bet", "bet", "parlayleg"), ("bet_archive", "archive", "parlayleg_archive"))
+]
+
+_SEARCH = """
+SELECT bet_fts.bet_id FROM bet_fts
+LEFT JOIN bet ON bet_fts.tier = 'bet' AND bet.id = bet_fts.bet_id
+LEFT JOIN bet_archive ON bet_fts.tier = 'archive' AND bet_archive.id = bet_fts.bet_id
+WHERE bet_fts MATCH :match
+ORDER BY bm25(bet_fts, 0.0, 0.0, 0.0, 2.0, 1.0), coalesce(bet.event_date, bet_archive.event_date) DESC
+LIMIT :limit OFFSET :offset
+"""
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def ensure_search_index(connection: Connection) -> None:
+    """Create the FTS table and triggers, backfilling existing bets once.
+
+    An index from an older layout (keyed by rowid) is dropped and rebuilt.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bet_fts'")
+    ).first()
+    if exists:
+        columns = tuple(row[1] for row in connection.execute(text("PRAGMA table_info(bet_fts)")))
+        if columns != _COLUMNS:
+            for name in _TRIGGERS:
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            connection.execute(text("DROP TABLE bet_fts"))
+            exists = None
+    if not exists:
+        connection.execute(text(_TABLE))
+    for name, body in _TRIGGERS.items():
+        connection.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {body}"))
+    if not exists:
+        for statement in _BACKFILL:
+            connection.execute(text(statement))
+
+
+def build_match_query(user_id: UUID, query: str) -> Optional[str]:
+    """Turn free text into an FTS5 prefix query scoped to one user."""
+    tokens = _TOKEN.findall(query)
+    if not tokens:
+        return None
+    terms = " ".join(f'"{token}"*' for token in tokens)
+    return f'user_id : "{user_id.hex}" AND {{detail legs}} : ({terms})'
+
+
+def search_statement(match: str, limit: int, offset: int) -> TextClause:
+    return text(_SEARCH).bindparams(match=match, limit=limit, offset=offset)
+
+
+def search_bet_ids(connection: Connection, match: str, limit: int, offset: int) -> List[UUID]:
+    rows = connection.execute(search_statement(match, limit, offset))
+    return [UUID(row[0]) for row in rows]
+
+
+__all__ = ["build_match_query", "ensure_search_index", "search_bet_ids", "search_statement"]
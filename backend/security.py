@@ -1,5 +1,7 @@
 ﻿from __future__ import annotations
 
+import hashlib
+import secrets
 from datetime import datetime, timedelta, timezone
 from uuid import UUID
 
@@ -40,9 +42,20 @@ def decode_access_token(token: str) -> TokenPayload:
     return TokenPayload(sub=UUID(sub))
 
 
+def new_refresh_token() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def hash_refresh_token(token: str) -> str:
+    """Refresh tokens are random, so a fast digest is enough for storage."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
 __all__ = [
     "verify_password",
     "hash_password",
     "create_access_token",
     "decode_access_token",
+    "new_refresh_token",
+    "hash_refresh_token",
 ]
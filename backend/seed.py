@@ -2,19 +2,23 @@
 
 from datetime import date
 
-from sqlmodel import delete
+from sqlmodel import Session, delete
 
 from . import crud
-from .db import init_db, session_scope
+from .db import bet_engines, init_db, session_scope, user_session_scope
 from .models import Bet, BetOutcome, BetType, ParlayLeg, User, UserCreate, utcnow
 from .security import hash_password
 
 
 def seed_demo_data() -> None:
     init_db()
+    for bet_engine in bet_engines():
+        with Session(bet_engine) as session:
+            session.exec(delete(ParlayLeg))
+            session.exec(delete(Bet))
+            session.commit()
+
     with session_scope() as session:
-        session.exec(delete(ParlayLeg))
-        session.exec(delete(Bet))
         session.exec(delete(User))
 
         demo_user = UserCreate(
@@ -23,7 +27,9 @@ def seed_demo_data() -> None:
             password="demo1234",
         )
         user = crud.create_user(session, demo_user, hash_password(demo_user.password))
+        user_id = user.id
 
+    with user_session_scope(user_id) as session:
         sample = [
             Bet(
                 event_date=date(2025, 9, 24),
@@ -33,7 +39,7 @@ def seed_demo_data() -> None:
                 odds=1.92,
                 cashout=None,
                 outcome=BetOutcome.WIN,
-                user_id=user.id,
+                user_id=user_id,
             ),
             Bet(
                 event_date=date(2025, 9, 24),
@@ -48,7 +54,7 @@ def seed_demo_data() -> None:
                     ParlayLeg(detail="Monterrey +1.5 goles", odds=1.75),
                     ParlayLeg(detail="Toluca doble oportunidad", odds=1.2),
                 ],
-                user_id=user.id,
+                user_id=user_id,
             ),
             Bet(
                 event_date=date(2025, 9, 23),
@@ -58,7 +64,7 @@ def seed_demo_data() -> None:
                 odds=1.68,
                 cashout=0,
                 outcome=BetOutcome.LOSS,
-                user_id=user.id,
+                user_id=user_id,
             ),
             Bet(
                 event_date=date(2025, 8, 18),
@@ -68,7 +74,7 @@ def seed_demo_data() -> None:
                 odds=3.1,
                 cashout=186,
                 outcome=BetOutcome.WIN,
-                user_id=user.id,
+                user_id=user_id,
             ),
             Bet(
                 event_date=date(2025, 8, 22),
@@ -83,7 +89,7 @@ def seed_demo_data() -> None:
                     ParlayLeg(detail="Inter Miami gana", odds=1.65),
                     ParlayLeg(detail="Atlanta United +0.5", odds=1.45),
                 ],
-                user_id=user.id,
+                user_id=user_id,
             ),
         ]
 
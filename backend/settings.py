@@ -3,7 +3,7 @@
 import os
 from dataclasses import dataclass, field
 from functools import lru_cache
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 
 @dataclass
@@ -11,12 +11,36 @@ class Settings:
     """Simple settings object driven by environment variables."""
 
     database_url: str = field(default_factory=lambda: os.getenv("INVICTOS_DB_URL", "sqlite:///./invictos.db"))
+    shard_dir: Optional[str] = field(default_factory=lambda: os.getenv("INVICTOS_SHARD_DIR") or None)
+    shard_buckets: int = field(default_factory=lambda: int(os.getenv("INVICTOS_SHARD_BUCKETS", "0")))
+    shard_engine_cache: int = field(default_factory=lambda: int(os.getenv("INVICTOS_SHARD_ENGINES", "64")))
+    sqlite_journal_mode: Optional[str] = field(default_factory=lambda: os.getenv("INVICTOS_SQLITE_JOURNAL_MODE") or None)
+    sqlite_synchronous: Optional[str] = field(default_factory=lambda: os.getenv("INVICTOS_SQLITE_SYNCHRONOUS") or None)
+    sqlite_busy_timeout_ms: int = field(default_factory=lambda: int(os.getenv("INVICTOS_SQLITE_BUSY_TIMEOUT_MS", "5000")))
     allowed_origins: List[str] = field(
         default_factory=lambda: _parse_origins(os.getenv("INVICTOS_ALLOWED_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000"))
     )
     jwt_secret: str = field(default_factory=lambda: os.getenv("INVICTOS_JWT_SECRET", "insecure-secret"))
     jwt_algorithm: str = field(default_factory=lambda: os.getenv("INVICTOS_JWT_ALGORITHM", "HS256"))
     jwt_exp_minutes: int = field(default_factory=lambda: int(os.getenv("INVICTOS_JWT_EXP_MIN", "120")))
+    refresh_exp_days: int = field(default_factory=lambda: int(os.getenv("INVICTOS_REFRESH_EXP_DAYS", "30")))
+    backup_dir: str = field(default_factory=lambda: os.getenv("INVICTOS_BACKUP_DIR", "./backups"))
+    backup_pages_per_step: int = field(default_factory=lambda: int(os.getenv("INVICTOS_BACKUP_PAGES", "128")))
+    backup_pause_ms: float = field(default_factory=lambda: float(os.getenv("INVICTOS_BACKUP_PAUSE_MS", "5")))
+    backup_max_step_pages: int = field(default_factory=lambda: int(os.getenv("INVICTOS_BACKUP_MAX_PAGES", "2048")))
+    admin_token: Optional[str] = field(default_factory=lambda: os.getenv("INVICTOS_ADMIN_TOKEN") or None)
+    archive_after_days: int = field(default_factory=lambda: int(os.getenv("INVICTOS_ARCHIVE_DAYS", "365")))
+    response_cache_bytes: int = field(
+        default_factory=lambda: int(os.getenv("INVICTOS_RESPONSE_CACHE_MB", "32")) * 1024 * 1024
+    )
+    rate_limit_enabled: bool = field(default_factory=lambda: os.getenv("INVICTOS_RATE_LIMIT", "1") != "0")
+    rate_limits: Dict[str, Tuple[float, float]] = field(
+        default_factory=lambda: _parse_rate_limits(
+            os.getenv("INVICTOS_RATE_LIMITS", "read=20:60,write=10:30,auth=0.5:10")
+        )
+    )
+    rate_limit_ip_multiplier: float = field(default_factory=lambda: float(os.getenv("INVICTOS_RATE_LIMIT_IP_MULT", "4")))
+    shed_threshold: float = field(default_factory=lambda: float(os.getenv("INVICTOS_SHED_THRESHOLD", "0.8")))
 
 
 def _parse_origins(raw: str) -> List[str]:
@@ -24,6 +48,17 @@ def _parse_origins(raw: str) -> List[str]:
     return values or ["*"]
 
 
+def _parse_rate_limits(raw: str) -> Dict[str, Tuple[float, float]]:
+    """Parse ``class=rate:burst`` pairs (tokens per second, bucket size)."""
+    limits = {"read": (20.0, 60.0), "write": (10.0, 30.0), "auth": (0.5, 10.0)}
+    for item in raw.split(","):
+        name, _, spec = item.strip().partition("=")
+        rate, _, burst = spec.partition(":")
+        if name in limits and rate:
+            limits[name] = (float(rate), float(burst or rate))
+    return limits
+
+
 @lru_cache
 def get_settings() -> Settings:
     return Settings()
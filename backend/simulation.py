@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:  # NumPy is an optional extra (``pip install invictos[simulate]``).
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+PERCENTILES = (5, 25, 50, 75, 95)
+# Cells (paths x bets) per vectorized step, which bounds memory; progress is
+# reported after each step.
+_CHUNK_CELLS = 1_000_000
+# Points per percentile band, whatever the horizon.
+_BAND_POINTS = 50
+
+# One settled bet: (stake, odds, won).
+HistoryRow = Tuple[float, float, bool]
+
+
+class SimulationUnavailable(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class SimulationParams:
+    bankroll: float
+    paths: int = 10_000
+    bets: int = 1_000
+    ruin_level: float = 0.0
+    seed: Optional[int] = None
+
+
+def available() -> bool:
+    return np is not None
+
+
+def run_simulation(history: Sequence[HistoryRow], params: SimulationParams) -> Dict[str, Any]:
+    result: Dict[str, Any] = {}
+    for event in iter_simulation(history, params):
+        result = event.get("result", result)
+    return result
+
+
+def iter_simulation(
+    history: Sequence[HistoryRow],
+    params: SimulationParams,
+    clock: Callable[[], float] = time.perf_counter,
+) -> Iterator[Dict[str, Any]]:
+    """Simulate ``params.paths`` bankrolls over ``params.bets`` future bets.
+
+    Each future bet resamples a past (stake, odds) pair, so the staking and
+    the odds the user plays keep their historical mix. It wins with
+    probability ``skill / odds``, where ``skill`` is how many wins the user
+    got relative to what fair odds predicted. ``skill`` is drawn once per path
+    from its posterior, so a short history widens the bands instead of
+    pretending the hit rate is known. A path is ruined, and frozen, once its
+    bankroll drops to ``ruin_level``.
+
+    Yields ``{"progress": fraction}`` after every chunk of bets and finally
+    ``{"result": {...}}``.
+    """
+    if np is None:
+        raise SimulationUnavailable("numpy no esta instalado")
+    if not history:
+        raise ValueError("Sin apuestas resueltas para simular")
+
+    started = clock()
+    stakes = np.array([row[0] for row in history], dtype=np.float64)
+    odds = np.array([row[1] for row in history], dtype=np.float64)
+    wins = int(sum(1 for row in history if row[2]))
+    fair_wins = float(np.sum(1.0 / odds))
+
+    rng = np.random.default_rng(params.seed)
+    paths, horizon = params.paths, params.bets
+    skill = rng.gamma(wins + 1.0, 1.0, size=paths) / fair_wins
+    bankroll = np.full(paths, float(params.bankroll))
+    ruined = bankroll <= params.ruin_level
+    ruined_at = np.where(ruined, 0, -1)
+
+    band_steps = np.unique(np.linspace(1, horizon, min(_BAND_POINTS, horizon)).round().astype(np.int64))
+    bands: List[Dict[str, float]] = []
+    rows = np.arange(paths)
+
+    step_bets = max(1, _CHUNK_CELLS // paths)
+    for offset in range(0, horizon, step_bets):
+        width = min(step_bets, horizon - offset)
+        picks = rng.integers(0, len(history), size=(paths, width))
+        chunk_stakes = stakes[picks]
+        chunk_odds = odds[picks]
+        won = rng.random((paths, width)) * chunk_odds < skill[:, None]
+        pnl = np.where(won, chunk_stakes * (chunk_odds - 1.0), -chunk_stakes)
+        pnl[ruined] = 0.0
+        running = bankroll[:, None] + np.cumsum(pnl, axis=1)
+
+        # Freeze each newly ruined path at the value it had when it went under.
+        hit = running <= params.ruin_level
+        newly = hit.any(axis=1) & ~ruined
+        if newly.any():
+            first = hit.argmax(axis=1)
+            after = np.arange(width)[None, :] >= first[:, None]
+            running = np.where(newly[:, None] & after, running[rows, first][:, None], running)
+            ruined_at[newly] = offset + first[newly] + 1
+            ruined |= newly
+        bankroll = running[:, -1]
+
+        in_chunk = band_steps[(band_steps > offset) & (band_steps <= offset + width)]
+        if in_chunk.size:
+            levels = np.percentile(running[:, in_chunk - offset - 1], PERCENTILES, axis=0)
+            for column, step in enumerate(in_chunk):
+                band = {"step": int(step)}
+                band.update({f"p{pct}": float(levels[index, column]) for index, pct in enumerate(PERCENTILES)})
+                band["ruin"] = float(np.mean((ruined_at >= 0) & (ruined_at <= step)))
+                bands.append(band)
+        yield {"progress": (offset + width) / horizon}
+
+    final = np.percentile(bankroll, PERCENTILES)
+    yield {
+        "result": {
+            "bankroll": float(params.bankroll),
+            "paths": paths,
+            "bets": horizon,
+            "ruin_level": float(params.ruin_level),
+            "history": {
+                "samples": len(history),
+                "hit_rate": wins / len(history),
+                "skill": wins / fair_wins,
+                "mean_stake": float(stakes.mean()),
+                "mean_odds": float(odds.mean()),
+            },
+            "risk_of_ruin": float(ruined.mean()),
+            "final": {
+                **{f"p{pct}": float(value) for pct, value in zip(PERCENTILES, final)},
+                "mean": float(bankroll.mean()),
+            },
+            "bands": bands,
+            "elapsed_ms": (clock() - started) * 1000,
+        }
+    }
+
+
+__all__ = [
+    "HistoryRow",
+    "PERCENTILES",
+    "SimulationParams",
+    "SimulationUnavailable",
+    "available",
+    "iter_simulation",
+    "run_simulation",
+]
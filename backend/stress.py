@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+# Storage configurations compared by ``invictos stress``; each maps to the
+# environment the backend processes are started with (``{tmp}`` is the run's
+# scratch directory).
+STORAGE_CONFIGS: Dict[str, Dict[str, str]] = {
+    "default": {},
+    "wal": {"INVICTOS_SQLITE_JOURNAL_MODE": "wal"},
+    "wal-normal": {"INVICTOS_SQLITE_JOURNAL_MODE": "wal", "INVICTOS_SQLITE_SYNCHRONOUS": "normal"},
+    "sharded": {"INVICTOS_SHARD_DIR": "{tmp}/shards"},
+    "sharded-wal": {"INVICTOS_SHARD_DIR": "{tmp}/shards", "INVICTOS_SQLITE_JOURNAL_MODE": "wal"},
+}
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+_REQUEST_TIMEOUT = 30.0
+
+
+@dataclass
+class _Write:
+    detail: str
+    updated_at: datetime
+
+
+def _stamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+@dataclass
+class StressResult:
+    config: str
+    ops: int
+    seconds: float
+    latencies: Dict[str, List[float]]
+    status_errors: Counter = field(default_factory=Counter)
+    timeouts: int = 0
+    hung_workers: int = 0
+    locked_errors: int = 0
+    lost_updates: int = 0
+    missing_bets: int = 0
+    resurrected_bets: int = 0
+    shared_mismatches: int = 0
+    shared_out_of_order: int = 0
+    backups: int = 0
+    backup_restarts: int = 0
+    backup_failures: int = 0
+    backup_step_ms_p99: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return self.ops / self.seconds if self.seconds else 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not (
+            self.status_errors
+            or self.timeouts
+            or self.hung_workers
+            or self.locked_errors
+            or self.lost_updates
+            or self.missing_bets
+            or self.resurrected_bets
+            or self.shared_mismatches
+        )
+
+    def percentile(self, op: str, pct: float) -> float:
+        values = sorted(self.latencies.get(op, []))
+        if not values:
+            return 0.0
+        index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+        return values[index] * 1000
+
+
+class _Ledger:
+    """What the server acknowledged, to compare against the final state."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.owned_last: Dict[str, _Write] = {}
+        self.shared_writes: Dict[str, List[_Write]] = {}
+        self.deleted: set = set()
+        self.latencies: Dict[str, List[float]] = {}
+        self.status_errors: Counter = Counter()
+        self.timeouts = 0
+
+    def record(self, op: str, seconds: float) -> None:
+        with self.lock:
+            self.latencies.setdefault(op, []).append(seconds)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(db_path: Path, env_overrides: Dict[str, str], server_workers: int, log_file) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({name: value.format(tmp=db_path.parent.as_posix()) for name, value in env_overrides.items()})
+    env["INVICTOS_DB_URL"] = f"sqlite:///{db_path.as_posix()}"
+    env["INVICTOS_RATE_LIMIT"] = "0"
+    # Create the schema once so the worker processes do not race on it.
+    subprocess.run(
+        [sys.executable, "-c", "from backend.db import init_db; init_db()"],
+        cwd=_PROJECT_ROOT,
+        env=env,
+        check=True,
+    )
+    command = [
+        sys.executable, "-m", "uvicorn", "backend.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(server_workers), "--log-level", "warning",
+    ]
+    process = subprocess.Popen(command, cwd=_PROJECT_ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("El backend termino antes de arrancar")
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("El backend no respondio a /health")
+
+
+def _call(ledger: _Ledger, http: requests.Session, op: str, method: str, url: str, **kwargs) -> Optional[requests.Response]:
+    started = time.perf_counter()
+    try:
+        response = http.request(method, url, timeout=_REQUEST_TIMEOUT, **kwargs)
+    except requests.Timeout:
+        with ledger.lock:
+            ledger.timeouts += 1
+        return None
+    ledger.record(op, time.perf_counter() - started)
+    if response.status_code >= 400 and not (op == "delete" and response.status_code == 404):
+        with ledger.lock:
+            ledger.status_errors[f"{op} {response.status_code}"] += 1
+        return None
+    return response
+
+
+def _new_bet(index: int) -> dict:
+    return {"event_date": "2025-01-01", "detail": f"stress {index}", "stake": 10, "odds": 2.0}
+
+
+def _worker(
+    worker_id: int,
+    base_url: str,
+    token: str,
+    shared_ids: List[str],
+    ops: int,
+    ledger: _Ledger,
+    barrier: threading.Barrier,
+) -> None:
+    http = requests.Session()
+    http.headers["Authorization"] = f"Bearer {token}"
+    rng = random.Random(worker_id)
+    owned: List[str] = []
+    barrier.wait()
+    for seq in range(ops):
+        roll = rng.random()
+        if roll < 0.2 or not owned:
+            response = _call(ledger, http, "create", "POST", f"{base_url}/bets", json=_new_bet(seq))
+            if response is not None:
+                bet = response.json()
+                owned.append(bet["id"])
+                with ledger.lock:
+                    ledger.owned_last[bet["id"]] = _Write(bet["detail"], _stamp(bet["updated_at"]))
+        elif roll < 0.6:
+            bet_id = rng.choice(owned)
+            detail = f"w{worker_id}-{seq}"
+            response = _call(ledger, http, "patch", "PATCH", f"{base_url}/bets/{bet_id}", json={"detail": detail})
+            if response is not None:
+                with ledger.lock:
+                    ledger.owned_last[bet_id] = _Write(detail, _stamp(response.json()["updated_at"]))
+        elif roll < 0.85 and shared_ids:
+            bet_id = rng.choice(shared_ids)
+            detail = f"s{worker_id}-{seq}"
+            response = _call(ledger, http, "patch_shared", "PATCH", f"{base_url}/bets/{bet_id}", json={"detail": detail})
+            if response is not None:
+                with ledger.lock:
+                    ledger.shared_writes.setdefault(bet_id, []).append(_Write(detail, _stamp(response.json()["updated_at"])))
+        else:
+            bet_id = owned.pop(rng.randrange(len(owned)))
+            response = _call(ledger, http, "delete", "DELETE", f"{base_url}/bets/{bet_id}")
+            if response is not None:
+                with ledger.lock:
+                    ledger.owned_last.pop(bet_id, None)
+                    ledger.deleted.add(bet_id)
+
+
+def _backup_loop(tmp_path: Path, interval: float, stop: threading.Event, result: StressResult) -> None:
+    """Back up every database file of the run, over and over, until ``stop``."""
+    from .backup import BackupError, backup_database
+
+    target_dir = tmp_path / "backups"
+    while not stop.is_set():
+        for path in [tmp_path / "stress.db", *sorted((tmp_path / "shards").glob("*.db"))]:
+            if stop.is_set() or not path.exists():
+                break
+            try:
+                report = backup_database(path, target_dir / path.name, verify=False)
+            except BackupError:
+                # Too busy to copy in bounded steps; the next round retries.
+                result.backup_failures += 1
+                continue
+            result.backups += 1
+            result.backup_restarts += report.restarts
+            result.backup_step_ms_p99 = max(result.backup_step_ms_p99, report.step_ms_p99)
+        stop.wait(interval)
+
+
+def _verify(base_url: str, tokens: List[str], ledger: _Ledger, result: StressResult) -> None:
+    final: Dict[str, dict] = {}
+    for token in tokens:
+        response = requests.get(f"{base_url}/bets", headers={"Authorization": f"Bearer {token}"}, timeout=_REQUEST_TIMEOUT)
+        response.raise_for_status()
+        final.update((bet["id"], bet) for bet in response.json())
+
+    for bet_id, write in ledger.owned_last.items():
+        bet = final.get(bet_id)
+        if bet is None:
+            result.missing_bets += 1
+        elif bet["detail"] != write.detail:
+            result.lost_updates += 1
+    result.resurrected_bets = sum(1 for bet_id in ledger.deleted if bet_id in final)
+
+    for bet_id, writes in ledger.shared_writes.items():
+        bet = final.get(bet_id)
+        if bet is None:
+            result.missing_bets += 1
+            continue
+        stamp = _stamp(bet["updated_at"])
+        matching = [write for write in writes if write.detail == bet["detail"]]
+        if len(matching) != 1 or matching[0].updated_at != stamp:
+            result.shared_mismatches += 1
+        elif stamp != max(write.updated_at for write in writes):
+            # Committed last but stamped earlier: last-writer-wins sync would
+            # disagree with what the database kept.
+            result.shared_out_of_order += 1
+
+
+def run_stress(
+    config: str = "default",
+    workers: int = 16,
+    users: int = 4,
+    ops_per_worker: int = 200,
+    shared_bets: int = 4,
+    server_workers: int = 2,
+    backup_interval: Optional[float] = None,
+) -> StressResult:
+    """Hammer a real backend (``server_workers`` processes) from ``workers`` threads.
+
+    Workers are spread over ``users`` accounts, so several threads write for
+    the same user at once, and all workers of a user also fight over that
+    user's ``shared_bets``. With ``backup_interval`` (seconds) online
+    backups run in a loop during the load, to measure what they cost writers.
+    """
+    env_overrides = STORAGE_CONFIGS[config]
+    with tempfile.TemporaryDirectory(prefix="invictos-stress-") as tmp:
+        tmp_path = Path(tmp)
+        log_path = tmp_path / "server.log"
+        with open(log_path, "wb") as log_file:
+            process, base_url = _start_server(tmp_path / "stress.db", env_overrides, server_workers, log_file)
+            try:
+                tokens: List[str] = []
+                shared_by_user: List[List[str]] = []
+                for index in range(users):
+                    response = requests.post(
+                        f"{base_url}/auth/register",
+                        json={"email": f"stress{index}@example.com", "password": "stress-password"},
+                        timeout=_REQUEST_TIMEOUT,
+                    )
+                    response.raise_for_status()
+                    token = response.json()["access_token"]
+                    tokens.append(token)
+                    headers = {"Authorization": f"Bearer {token}"}
+                    shared_by_user.append([
+                        requests.post(f"{base_url}/bets", json=_new_bet(i), headers=headers, timeout=_REQUEST_TIMEOUT).json()["id"]
+                        for i in range(shared_bets)
+                    ])
+
+                ledger = _Ledger()
+                barrier = threading.Barrier(workers + 1)
+                threads = [
+                    threading.Thread(
+                        target=_worker,
+                        args=(i, base_url, tokens[i % users], shared_by_user[i % users], ops_per_worker, ledger, barrier),
+                        daemon=True,
+                    )
+                    for i in range(workers)
+                ]
+                result = StressResult(config=config, ops=0, seconds=0.0, latencies=ledger.latencies)
+                stop_backups = threading.Event()
+                backups = None
+                if backup_interval is not None:
+                    backups = threading.Thread(
+                        target=_backup_loop, args=(tmp_path, backup_interval, stop_backups, result), daemon=True
+                    )
+                for thread in threads:
+                    thread.start()
+                barrier.wait()
+                if backups is not None:
+                    backups.start()
+                started = time.perf_counter()
+                deadline = started + max(60.0, ops_per_worker * _REQUEST_TIMEOUT / 10)
+                for thread in threads:
+                    thread.join(max(0.0, deadline - time.perf_counter()))
+                elapsed = time.perf_counter() - started
+                stop_backups.set()
+                if backups is not None:
+                    backups.join()
+
+                result.ops = sum(len(values) for values in ledger.latencies.values())
+                result.seconds = elapsed
+                result.status_errors = ledger.status_errors
+                result.timeouts = ledger.timeouts
+                result.hung_workers = sum(1 for thread in threads if thread.is_alive())
+                _verify(base_url, tokens, ledger, result)
+            finally:
+                process.terminate()
+                process.wait(timeout=15)
+        result.locked_errors = log_path.read_text(encoding="utf-8", errors="replace").count("database is locked")
+    return result
+
+
+__all__ = ["STORAGE_CONFIGS", "StressResult", "run_stress"]
@@ -1,7 +1,9 @@
 ﻿from __future__ import annotations
 
-from datetime import datetime
-from typing import Iterable, List, Optional
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 
 import requests
 from requests import Session
@@ -18,20 +20,104 @@ class ApiConnectionError(ApiClientError):
     pass
 
 
+class ApiRateLimitError(ApiClientError):
+    """The server asked us to back off (429 or 503 with ``Retry-After``)."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Refresh the access token this long before it expires.
+REFRESH_MARGIN_SECONDS = 300
+REFRESH_RETRY_SECONDS = 60
+# Bets per ``/sync`` page when walking a full change set.
+SYNC_PAGE_SIZE = 500
+# Delta syncs re-read this much before the stored stamp, so a write that
+# committed just after the previous sync read its snapshot is not missed.
+# Re-read rows merge as no-ops.
+SYNC_OVERLAP = timedelta(seconds=5)
+# Ids per ``POST /bets/query`` (the server's limit).
+MAX_QUERY_IDS = 500
+_CREDENTIAL_PATHS = frozenset({"/auth/login", "/auth/register", "/auth/refresh", "/auth/logout"})
+
+
 class ApiClient:
     def __init__(self) -> None:
         self.config = get_client_config()
         self.session = Session()
         self.session.headers.update({"Accept": "application/json"})
         self._token: Optional[str] = None
+        self._auth: Optional[AuthResponse] = None
+        self._refresh_lock = threading.RLock()
+        self._refresh_timer: Optional[threading.Timer] = None
+        self.on_auth_refreshed: Optional[Callable[[AuthResponse], None]] = None
 
     def set_auth(self, auth: Optional[AuthResponse]) -> None:
+        self._cancel_refresh()
+        self._auth = auth
         if auth is None:
             self._token = None
             self.session.headers.pop("Authorization", None)
             return
         self._token = auth.access_token
         self.session.headers["Authorization"] = f"Bearer {auth.access_token}"
+        self._schedule_refresh()
+
+    def refresh(self, stale_token: Optional[str] = None) -> AuthResponse:
+        """Trade the refresh token for a new token pair.
+
+        ``stale_token`` is the access token a failed request used; if another
+        thread already replaced it, the current auth is returned instead of
+        rotating again.
+        """
+        with self._refresh_lock:
+            auth = self._auth
+            if auth is None or not auth.refresh_token:
+                raise ApiClientError("Sesión sin token de refresco")
+            if stale_token is not None and auth.access_token != stale_token:
+                return auth
+            data = self._request("POST", "/auth/refresh", json={"refresh_token": auth.refresh_token})
+            refreshed = AuthResponse.from_dict(data)
+            self.set_auth(refreshed)
+            if self.on_auth_refreshed:
+                self.on_auth_refreshed(refreshed)
+        return refreshed
+
+    def logout(self) -> None:
+        # Under the refresh lock: a rotation in flight finishes (and is
+        # persisted) first, so the token revoked below is the current one and
+        # the rotated session is never installed again after the logout.
+        with self._refresh_lock:
+            auth = self._auth
+            self.set_auth(None)
+        if auth and auth.refresh_token:
+            self._request("POST", "/auth/logout", json={"refresh_token": auth.refresh_token})
+
+    def _schedule_refresh(self, delay: Optional[float] = None) -> None:
+        auth = self._auth
+        if auth is None or not auth.refresh_token or auth.expires_at is None:
+            return
+        if delay is None:
+            delay = (auth.expires_at - datetime.utcnow()).total_seconds() - REFRESH_MARGIN_SECONDS
+        timer = threading.Timer(max(delay, 5.0), self._background_refresh, args=(auth.access_token,))
+        timer.daemon = True
+        self._refresh_timer = timer
+        timer.start()
+
+    def _cancel_refresh(self) -> None:
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+
+    def _background_refresh(self, token: str) -> None:
+        try:
+            self.refresh(stale_token=token)
+        except ApiConnectionError:
+            if self._token == token:
+                self._schedule_refresh(REFRESH_RETRY_SECONDS)
+        except ApiClientError:
+            pass
 
     def register(self, email: str, password: str, full_name: Optional[str] = None) -> AuthResponse:
         payload = {"email": email, "password": password, "full_name": full_name}
@@ -72,33 +158,132 @@ class ApiClient:
     def delete_bet(self, bet_id: str) -> None:
         self._request("DELETE", f"/bets/{bet_id}")
 
-    def sync(self, since: Optional[datetime]) -> dict:
+    def get_bets(self, bet_ids: Iterable[str]) -> Tuple[List[Bet], List[str]]:
+        """Current server state of ``bet_ids``, plus the ids the server no longer has."""
+        ids = list(dict.fromkeys(bet_ids))
+        bets: List[Bet] = []
+        missing: List[str] = []
+        for offset in range(0, len(ids), MAX_QUERY_IDS):
+            data = self._request("POST", "/bets/query", json={"ids": ids[offset : offset + MAX_QUERY_IDS]})
+            bets.extend(Bet.from_dict(item) for item in data.get("items", []))
+            missing.extend(data.get("missing", []))
+        return bets, missing
+
+    def bulk_update(self, where: dict, outcome: Optional[str] = None, cashout: Optional[float] = None) -> dict:
+        """Set outcome/cashout on every bet matching ``where`` (ids, start, end, outcome, type)."""
+        payload: dict = {"where": where}
+        if outcome is not None:
+            payload["outcome"] = outcome
+        if cashout is not None:
+            payload["cashout"] = cashout
+        return self._request("POST", "/bets/bulk-update", json=payload)
+
+    def bulk_delete(self, where: dict) -> dict:
+        return self._request("POST", "/bets/bulk-delete", json=where)
+
+    def simulate(self, params: dict, on_progress: Optional[Callable[[float], None]] = None) -> dict:
+        """Run ``/simulate``; with ``on_progress`` the result is streamed and progress reported."""
+        if on_progress is None:
+            return self._request("GET", "/simulate", params=params)
+        response = self._checked("GET", "/simulate", params={**params, "stream": "true"}, stream=True)
+        result: dict = {}
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if "progress" in event:
+                    on_progress(float(event["progress"]))
+                result = event.get("result", result)
+        except requests.RequestException as exc:
+            raise ApiConnectionError(str(exc)) from exc
+        finally:
+            response.close()
+        return result
+
+    def sync(self, since: Optional[datetime], limit: Optional[int] = None, cursor: Optional[str] = None) -> dict:
         params = {}
         if since:
             params["since"] = since.isoformat()
+        if limit:
+            params["limit"] = limit
+        if cursor:
+            params["cursor"] = cursor
         return self._request("GET", "/sync", params=params)
 
+    def iter_sync(self, since: Optional[datetime], page_size: int = SYNC_PAGE_SIZE) -> Iterator[dict]:
+        """Yield ``/sync`` pages until the server reports no more changes.
+
+        Only the last page's ``last_sync`` is safe to store as the next ``since``.
+        """
+        cursor = None
+        while True:
+            page = self.sync(since, limit=page_size, cursor=cursor)
+            yield page
+            cursor = page.get("next_cursor")
+            if not page.get("has_more") or not cursor:
+                return
+
+    def fetch_changes(self, since: Optional[datetime]) -> Iterator[Tuple[List[Bet], Optional[datetime]]]:
+        """Bets changed since ``since`` (every bet when ``None``), one ``/sync`` page at a time.
+
+        Yields each page's bets with the stamp to store next, which is only
+        set on the last page. Deletions are not reported; only a full
+        download drops them.
+        """
+        if since is not None:
+            since -= SYNC_OVERLAP
+        for page in self.iter_sync(since):
+            last = not page.get("has_more") or not page.get("next_cursor")
+            stamp = _parse_stamp(page.get("last_sync")) if last else None
+            yield [Bet.from_dict(item) for item in page.get("items", [])], stamp
+
     def _request(self, method: str, path: str, **kwargs):
-        url = self._build_url(path)
-        try:
-            response = self.session.request(method, url, timeout=10, **kwargs)
-        except requests.RequestException as exc:
-            raise ApiConnectionError(str(exc)) from exc
-        if response.status_code >= 400:
-            message = self._extract_error(response)
-            raise ApiClientError(message)
+        response = self._checked(method, path, **kwargs)
         if response.status_code == 204:
             return None
         if response.content:
             return response.json()
         return None
 
+    def _checked(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Send, refreshing once on 401, and raise for error statuses."""
+        token = self._token
+        response = self._send(method, path, **kwargs)
+        if response.status_code == 401 and token and path not in _CREDENTIAL_PATHS:
+            try:
+                self.refresh(stale_token=token)
+            except ApiClientError:
+                pass
+            else:
+                response = self._send(method, path, **kwargs)
+        if response.status_code >= 400:
+            message = self._extract_error(response)
+            if response.status_code in (429, 503):
+                raise ApiRateLimitError(message, self._retry_after(response))
+            raise ApiClientError(message)
+        return response
+
+    def _send(self, method: str, path: str, **kwargs) -> requests.Response:
+        url = self._build_url(path)
+        try:
+            return self.session.request(method, url, timeout=10, **kwargs)
+        except requests.RequestException as exc:
+            raise ApiConnectionError(str(exc)) from exc
+
     def _build_url(self, path: str) -> str:
         base = self.config.api_url.rstrip("/")
         if not path.startswith("/"):
             path = "/" + path
         return base + path
 
+    @staticmethod
+    def _retry_after(response: requests.Response) -> float:
+        try:
+            return float(response.headers.get("Retry-After", "1"))
+        except ValueError:
+            return 1.0
+
     @staticmethod
     def _extract_error(response: requests.Response) -> str:
         try:
@@ -109,4 +294,11 @@ class ApiClient:
         return f"HTTP {response.status_code}: {detail}"
 
 
-__all__ = ["ApiClient", "ApiClientError", "ApiConnectionError"]
+def _parse_stamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+__all__ = ["ApiClient", "ApiClientError", "ApiConnectionError", "ApiRateLimitError"]
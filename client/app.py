@@ -1,22 +1,29 @@
 ﻿from __future__ import annotations
 
+from dataclasses import replace
 from datetime import date, datetime, timedelta
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from uuid import uuid4
 
 import flet as ft
 
 from . import cache
 from .api import ApiClient, ApiClientError, ApiConnectionError
+from .config import get_client_config
 from .models import AuthResponse, Bet, ParlayLeg, User
-from .state import AppState
-from .sync import enqueue_operation, flush_pending
+from .state import AppState, SummaryMetrics
+from .sync import enqueue_operation, flush_pending, pull_changes
 from .ui import theme
 from .ui.components import build_summary_cards
 from .utils.formatting import format_currency, format_full_date, format_month
 from .i18n import t
 
 
+# The bet and month lists scroll inside the page, so they need a fixed height.
+DAILY_LIST_HEIGHT = 520
+HISTORY_LIST_HEIGHT = 360
+
+
 def _show_toast(page: ft.Page, text: str, error: bool = False) -> None:
     page.snack_bar = ft.SnackBar(
         bgcolor=theme.DANGER if error else theme.SURFACE_ALT,
@@ -30,7 +37,8 @@ def main(page: ft.Page) -> None:
     theme.configure_page(page)
 
     api = ApiClient()
-    state = AppState()
+    api.on_auth_refreshed = cache.save_auth
+    state = AppState(columnar=get_client_config().columnar)
     content = ft.Column(expand=True, spacing=0)
     page.add(content)
 
@@ -49,17 +57,21 @@ def main(page: ft.Page) -> None:
         cache.save_auth(auth)
         api.set_auth(auth)
         cached = cache.load_cached_bets(auth.user.id)
-        state.replace_all(cached)
+        state.replace_all(cached, cache.load_last_sync(auth.user.id))
         try:
-            flush_pending(api, state, auth.user.id)
+            if flush_pending(api, state, auth.user.id).failed:
+                _show_toast(page, t("toast.sync.fail"), True)
         except ApiClientError:
             _show_toast(page, t("toast.sync.fail"), True)
         show_dashboard()
         load_remote_fn(None)
 
     def logout(_: ft.ControlEvent | None = None) -> None:
+        try:
+            api.logout()
+        except ApiClientError:
+            pass
         cache.save_auth(None)
-        api.set_auth(None)
         state.set_user(None)
         state.replace_all([])
         state.last_sync = None
@@ -153,8 +165,7 @@ def main(page: ft.Page) -> None:
         if not user:
             return ft.Column([ft.Text(t("auth.required"), color=theme.DANGER)])
 
-        bets_list = state.as_list()
-        selected_date = max((bet.event_date for bet in bets_list), default=date.today())
+        selected_date = state.latest_date() or date.today()
         selected_month = selected_date.strftime("%Y-%m")
 
         date_picker = ft.DatePicker()
@@ -165,8 +176,13 @@ def main(page: ft.Page) -> None:
 
         selected_date_label = ft.Text(format_full_date(selected_date), size=18, weight=ft.FontWeight.W_600)
         daily_headline = ft.Text("", color=theme.TEXT_MUTED)
-        daily_list = ft.Column(spacing=12)
-        history_list = ft.Column(spacing=10)
+        # ListViews only lay out the rows in view. Cards are kept by bet id
+        # (month cards by month) together with what they were built from, so
+        # a refresh rebuilds only what changed and Flet sends only those.
+        daily_list = ft.ListView(spacing=12, height=DAILY_LIST_HEIGHT)
+        history_list = ft.ListView(spacing=10, height=HISTORY_LIST_HEIGHT, first_item_prototype=True)
+        bet_cards: Dict[str, Tuple[Bet, ft.Container]] = {}
+        month_cards: Dict[str, Tuple[SummaryMetrics, ft.Container]] = {}
 
         bet_type_selector = ft.SegmentedButton(
             selected={"single"},
@@ -285,43 +301,54 @@ def main(page: ft.Page) -> None:
                 daily_headline.value = t("daily.empty")
             daily_headline.update()
 
-            daily_list.controls.clear()
+            cards = {}
+            for bet in bets:
+                # Stored bets are replaced, never mutated, on every change.
+                cached = bet_cards.get(bet.id)
+                cards[bet.id] = cached if cached and cached[0] is bet else (bet, build_bet_card(bet))
+            bet_cards.clear()
+            bet_cards.update(cards)
             if not bets:
-                daily_list.controls.append(ft.Text(t("daily.empty"), color=theme.TEXT_MUTED))
+                daily_list.controls[:] = [ft.Text(t("daily.empty"), color=theme.TEXT_MUTED)]
             else:
-                for bet in bets:
-                    daily_list.controls.append(build_bet_card(bet))
+                daily_list.controls[:] = [card for _bet, card in cards.values()]
             daily_list.update()
 
         def refresh_history() -> None:
-            history_list.controls.clear()
+            cards = {}
             for month_key in state.months():
                 if month_key == selected_month:
                     continue
                 metrics = state.month_metrics(month_key)
-                history_list.controls.append(
-                    ft.Container(
-                        bgcolor=theme.SURFACE,
-                        border_radius=12,
-                        padding=ft.padding.all(14),
-                        content=ft.Column(
-                            [
-                                ft.Text(format_month(month_key), weight=ft.FontWeight.W_600),
-                                ft.Text(
-                                    f"Neto {format_currency(metrics.net)}",
-                                    color=theme.ACCENT if metrics.net >= 0 else theme.DANGER,
-                                ),
-                                ft.Text(f"Stake {format_currency(metrics.stake_total)}", color=theme.TEXT_MUTED, size=12),
-                                ft.Text(f"Yield {metrics.yield_percent:.1f}%", color=theme.TEXT_MUTED, size=12),
-                            ],
-                            spacing=4,
-                        ),
-                    )
-                )
-            if not history_list.controls:
-                history_list.controls.append(ft.Text(t("history.empty"), color=theme.TEXT_MUTED))
+                cached = month_cards.get(month_key)
+                cards[month_key] = cached if cached and cached[0] == metrics else (metrics, build_month_card(month_key, metrics))
+            month_cards.clear()
+            month_cards.update(cards)
+            if not cards:
+                history_list.controls[:] = [ft.Text(t("history.empty"), color=theme.TEXT_MUTED)]
+            else:
+                history_list.controls[:] = [card for _metrics, card in cards.values()]
             history_list.update()
 
+        def build_month_card(month_key: str, metrics: SummaryMetrics) -> ft.Container:
+            return ft.Container(
+                bgcolor=theme.SURFACE,
+                border_radius=12,
+                padding=ft.padding.all(14),
+                content=ft.Column(
+                    [
+                        ft.Text(format_month(month_key), weight=ft.FontWeight.W_600),
+                        ft.Text(
+                            f"Neto {format_currency(metrics.net)}",
+                            color=theme.ACCENT if metrics.net >= 0 else theme.DANGER,
+                        ),
+                        ft.Text(f"Stake {format_currency(metrics.stake_total)}", color=theme.TEXT_MUTED, size=12),
+                        ft.Text(f"Yield {metrics.yield_percent:.1f}%", color=theme.TEXT_MUTED, size=12),
+                    ],
+                    spacing=4,
+                ),
+            )
+
         def build_bet_card(bet: Bet) -> ft.Container:
             net_value = bet.net()
             outcome_selector = ft.Dropdown(
@@ -395,12 +422,12 @@ def main(page: ft.Page) -> None:
             except ApiConnectionError:
                 enqueue_operation("update", None, {"bet_id": bet_id, "data": patch}, uid)
                 if bet_id in state.bets:
-                    state.bets[bet_id].outcome = value
-                    state.bets[bet_id].updated_at = datetime.utcnow()
+                    state.upsert(replace(state.bets[bet_id], outcome=value, updated_at=datetime.utcnow()))
             except ApiClientError as error:
                 _show_toast(page, str(error), True)
                 return
-            cache.save_cached_bets(state.as_list(), uid)
+            if bet_id in state.bets:
+                cache.save_cached_bet(state.bets[bet_id], uid)
             refresh_metrics()
             refresh_daily()
 
@@ -416,12 +443,12 @@ def main(page: ft.Page) -> None:
             except ApiConnectionError:
                 enqueue_operation("update", None, {"bet_id": bet_id, "data": payload}, uid)
                 if bet_id in state.bets:
-                    state.bets[bet_id].cashout = payload["cashout"]
-                    state.bets[bet_id].updated_at = datetime.utcnow()
+                    state.upsert(replace(state.bets[bet_id], cashout=payload["cashout"], updated_at=datetime.utcnow()))
             except (ValueError, ApiClientError):
                 _show_toast(page, t("form.error.cashout"), True)
                 return
-            cache.save_cached_bets(state.as_list(), uid)
+            if bet_id in state.bets:
+                cache.save_cached_bet(state.bets[bet_id], uid)
             refresh_metrics()
             refresh_daily()
 
@@ -439,7 +466,7 @@ def main(page: ft.Page) -> None:
             except ApiClientError as error:
                 _show_toast(page, str(error), True)
                 return
-            cache.save_cached_bets(state.as_list(), uid)
+            cache.remove_cached_bet(bet_id, uid)
             refresh_metrics()
             refresh_daily()
             refresh_history()
@@ -465,18 +492,23 @@ def main(page: ft.Page) -> None:
             date_picker.on_change = handle_pick
             date_picker.pick_date()
 
-        def load_remote(_: ft.ControlEvent | None = None) -> None:
+        def load_remote(_: ft.ControlEvent | None = None, full: bool = False) -> None:
+            """Pull changes since the last sync; ``full`` re-downloads everything.
+
+            A full download is also the only way to drop bets deleted on
+            another device, since ``/sync`` does not report deletions.
+            """
             uid = ensure_user_id()
             if not uid:
                 return
+            since = None if full else state.last_sync
             try:
-                remote = api.list_bets()
+                changed = pull_changes(api, state, uid, full=full)
             except ApiConnectionError:
+                # Pages applied before the failure stay; the next pull repeats the rest.
                 _show_toast(page, t("toast.sync.fail"), True)
-                return
-            state.replace_all(remote, datetime.utcnow())
-            cache.save_cached_bets(state.as_list(), uid)
-            _show_toast(page, t("toast.sync.ok"))
+            else:
+                _show_toast(page, t("toast.sync.ok") if since is None else t("toast.sync.delta", count=str(changed)))
             refresh_metrics()
             refresh_daily()
             refresh_history()
@@ -560,6 +592,7 @@ def main(page: ft.Page) -> None:
                 created = api.create_bet(bet)
                 state.upsert(created)
             except ApiConnectionError:
+                created = bet
                 state.upsert(bet)
                 enqueue_operation("create", bet, bet.to_dict(), uid)
                 _show_toast(page, t("form.offline"))
@@ -568,7 +601,7 @@ def main(page: ft.Page) -> None:
                 form_message.color = theme.DANGER
                 form_message.update()
                 return
-            cache.save_cached_bets(state.as_list(), uid)
+            cache.save_cached_bet(created, uid)
             refresh_metrics()
             refresh_daily()
             refresh_history()
@@ -593,6 +626,11 @@ def main(page: ft.Page) -> None:
                 ft.Row(
                     [
                         ft.FilledButton(t("toolbar.sync"), icon=ft.Icons.CLOUD_SYNC, on_click=load_remote),
+                        ft.IconButton(
+                            icon=ft.Icons.CLOUD_DOWNLOAD,
+                            tooltip=t("toolbar.repair"),
+                            on_click=lambda e: load_remote(e, full=True),
+                        ),
                         ft.OutlinedButton(t("auth.logout"), icon=ft.Icons.LOGOUT, on_click=logout),
                     ],
                     spacing=8,
@@ -658,7 +696,7 @@ def main(page: ft.Page) -> None:
             user_profile: User = api.fetch_profile()
             state.set_user(user_profile)
             cached_bets = cache.load_cached_bets(user_profile.id)
-            state.replace_all(cached_bets)
+            state.replace_all(cached_bets, cache.load_last_sync(user_profile.id))
             try:
                 flush_pending(api, state, user_profile.id)
             except ApiClientError:
@@ -1,51 +1,56 @@
 ﻿from __future__ import annotations
 
 import json
+from datetime import datetime
 from pathlib import Path
 from typing import Iterable, List, Optional
 
 from .config import get_client_config
-from .models import AuthResponse, Bet, serialize_bets
+from .journal import JournalEntry, get_journal
+from .models import AuthResponse, Bet
+from .store import get_store
 
 
 def load_cached_bets(user_id: str) -> List[Bet]:
-    cfg = get_client_config()
-    file = cfg.bets_cache_path(user_id)
-    if not file.exists():
-        return []
-    try:
-        raw = json.loads(file.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
-        return []
-    return [Bet.from_dict(item) for item in raw]
+    return get_store(user_id).load_all()
 
 
 def save_cached_bets(bets: Iterable[Bet], user_id: str) -> None:
-    cfg = get_client_config()
-    data = serialize_bets(bets)
-    cfg.bets_cache_path(user_id).write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    """Replace the whole cache; for a full download."""
+    get_store(user_id).replace_all(bets)
 
 
-def load_pending_queue(user_id: str) -> List[dict]:
-    cfg = get_client_config()
-    file = cfg.queue_path(user_id)
-    if not file.exists():
-        return []
-    try:
-        return json.loads(file.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
-        return []
+def save_cached_bet(bet: Bet, user_id: str) -> None:
+    get_store(user_id).upsert(bet)
 
 
-def save_pending_queue(items: Iterable[dict], user_id: str) -> None:
-    cfg = get_client_config()
-    cfg.queue_path(user_id).write_text(json.dumps(list(items), ensure_ascii=False, indent=2), encoding="utf-8")
+def save_cached_changes(bets: Iterable[Bet], user_id: str) -> None:
+    get_store(user_id).upsert_many(bets)
+
+
+def remove_cached_bet(bet_id: str, user_id: str) -> None:
+    get_store(user_id).delete(bet_id)
+
+
+def load_last_sync(user_id: str) -> Optional[datetime]:
+    return get_store(user_id).get_last_sync()
+
+
+def save_last_sync(last_sync: Optional[datetime], user_id: str) -> None:
+    get_store(user_id).set_last_sync(last_sync)
+
+
+def load_pending_queue(user_id: str) -> List[JournalEntry]:
+    return get_journal(user_id).pending()
+
+
+def append_pending_op(op: dict, user_id: str) -> int:
+    return get_journal(user_id).append(op)
 
 
-def append_pending_op(op: dict, user_id: str) -> None:
-    queue = load_pending_queue(user_id)
-    queue.append(op)
-    save_pending_queue(queue, user_id)
+def ack_pending_ops(seqs: Iterable[int], user_id: str) -> None:
+    """Record queued ops as applied; they need not be a prefix of the queue."""
+    get_journal(user_id).acknowledge(seqs)
 
 
 def load_auth() -> Optional[AuthResponse]:
@@ -72,8 +77,13 @@ def save_auth(auth: Optional[AuthResponse]) -> None:
 __all__ = [
     "load_cached_bets",
     "save_cached_bets",
+    "save_cached_bet",
+    "save_cached_changes",
+    "remove_cached_bet",
+    "load_last_sync",
+    "save_last_sync",
     "load_pending_queue",
-    "save_pending_queue",
+    "ack_pending_ops",
     "append_pending_op",
     "load_auth",
     "save_auth",
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+try:  # NumPy is an optional extra (``pip install invictos[simulate]``).
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+from .models import Bet
+
+if TYPE_CHECKING:
+    from .state import SummaryMetrics
+
+OUTCOME_PENDING = 0
+OUTCOME_WIN = 1
+OUTCOME_LOSS = 2
+_OUTCOME_CODES = {"acertada": OUTCOME_WIN, "fallida": OUTCOME_LOSS}
+_INITIAL_CAPACITY = 1024
+
+
+def available() -> bool:
+    return np is not None
+
+
+class BetColumns:
+    """Bets as parallel NumPy arrays, one row per bet, for vectorized analytics.
+
+    Columns: ``stake``, ``odds``, ``cashout`` (NaN when unset), ``outcome``
+    (``OUTCOME_*`` codes; anything but a win or a loss counts as pending),
+    ``day`` (``date.toordinal()``), ``month`` (``year * 12 + month - 1``) and
+    ``type`` (codes from ``type_codes``). Rows ``0..len - 1`` are live;
+    ``rows`` maps a bet id to its row. Removing a bet moves the last row into
+    its place, so the arrays stay dense and are never compacted.
+
+    Sums follow ``Bet.gross_return()`` but NumPy adds pairwise (and
+    ``bincount`` per group), not left to right, so totals can differ from a
+    Python loop over the same bets in the last few bits.
+    """
+
+    _COLUMNS = (
+        ("stake", "float64"),
+        ("odds", "float64"),
+        ("cashout", "float64"),
+        ("outcome", "int8"),
+        ("day", "int32"),
+        ("month", "int32"),
+        ("type", "int16"),
+    )
+
+    def __init__(self, bets: Optional[Iterable[Bet]] = None) -> None:
+        if np is None:
+            raise RuntimeError("numpy no esta instalado")
+        self.rows: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.type_codes: Dict[str, int] = {}
+        self._allocate(_INITIAL_CAPACITY)
+        if bets:
+            self.replace_all(bets)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def column(self, name: str):
+        """The live part of column ``name`` (a view: copy it before keeping it)."""
+        return getattr(self, "_" + name)[: len(self.ids)]
+
+    def upsert(self, bet: Bet) -> None:
+        row = self.rows.get(bet.id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self._stake):
+                self._grow(row * 2)
+            self.rows[bet.id] = row
+            self.ids.append(bet.id)
+        self._write(row, bet)
+
+    def remove(self, bet_id: str) -> None:
+        row = self.rows.pop(bet_id, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        moved = self.ids.pop()
+        if row != last:
+            for name, _dtype in self._COLUMNS:
+                array = getattr(self, "_" + name)
+                array[row] = array[last]
+            self.ids[row] = moved
+            self.rows[moved] = row
+
+    def replace_all(self, bets: Iterable[Bet]) -> None:
+        items = list({bet.id: bet for bet in bets}.values())
+        self.rows = {bet.id: row for row, bet in enumerate(items)}
+        self.ids = [bet.id for bet in items]
+        self.type_codes = {}
+        self._allocate(max(_INITIAL_CAPACITY, len(items)))
+        count = len(items)
+        self._stake[:count] = np.fromiter((bet.stake for bet in items), np.float64, count)
+        self._odds[:count] = np.fromiter((bet.odds for bet in items), np.float64, count)
+        self._cashout[:count] = np.fromiter(
+            (np.nan if bet.cashout is None else bet.cashout for bet in items), np.float64, count
+        )
+        self._outcome[:count] = np.fromiter((_OUTCOME_CODES.get(bet.outcome, 0) for bet in items), np.int8, count)
+        self._day[:count] = np.fromiter((bet.event_date.toordinal() for bet in items), np.int32, count)
+        self._month[:count] = np.fromiter((_month_code(bet.event_date) for bet in items), np.int32, count)
+        self._type[:count] = np.fromiter((self._type_code(bet.type) for bet in items), np.int16, count)
+
+    def gross_returns(self):
+        """Per-row ``Bet.gross_return()``: the cashout if set, else stake x odds for a win, else 0."""
+        cashout = self.column("cashout")
+        won = np.where(self.column("outcome") == OUTCOME_WIN, self.column("stake") * self.column("odds"), 0.0)
+        return np.where(np.isnan(cashout), won, cashout)
+
+    def mask(self, start: Optional[date] = None, end: Optional[date] = None, bet_type: Optional[str] = None):
+        """Rows with ``start <= event_date < end`` (either bound optional) and of ``bet_type``."""
+        selected = np.ones(len(self.ids), dtype=bool)
+        if start is not None:
+            selected &= self.column("day") >= start.toordinal()
+        if end is not None:
+            selected &= self.column("day") < end.toordinal()
+        if bet_type is not None:
+            selected &= self.column("type") == self.type_codes.get(bet_type, -1)
+        return selected
+
+    def metrics(
+        self, start: Optional[date] = None, end: Optional[date] = None, bet_type: Optional[str] = None
+    ) -> "SummaryMetrics":
+        from .state import SummaryMetrics
+
+        selected = self.mask(start, end, bet_type)
+        stake = self.column("stake")[selected]
+        gross = self.gross_returns()[selected]
+        outcome = self.column("outcome")[selected]
+        return SummaryMetrics(
+            stake_total=float(stake.sum()),
+            return_total=float(gross.sum()),
+            net=float((gross - stake).sum()),
+            wins=int(np.count_nonzero(outcome == OUTCOME_WIN)),
+            losses=int(np.count_nonzero(outcome == OUTCOME_LOSS)),
+            pending=int(np.count_nonzero(outcome == OUTCOME_PENDING)),
+            count=int(stake.size),
+        )
+
+    def metrics_by_day(self) -> Dict[date, "SummaryMetrics"]:
+        return {date.fromordinal(key): summary for key, summary in self._grouped(self.column("day")).items()}
+
+    def metrics_by_month(self) -> Dict[str, "SummaryMetrics"]:
+        return {
+            f"{key // 12:04d}-{key % 12 + 1:02d}": summary for key, summary in self._grouped(self.column("month")).items()
+        }
+
+    def _grouped(self, keys) -> Dict[int, "SummaryMetrics"]:
+        from .state import SummaryMetrics
+
+        if not len(keys):
+            return {}
+        groups, inverse = np.unique(keys, return_inverse=True)
+        stake = self.column("stake")
+        gross = self.gross_returns()
+        outcome = self.column("outcome")
+        size = len(groups)
+        # ``bincount`` accumulates in row order, one group at a time.
+        stake_sums = np.bincount(inverse, weights=stake, minlength=size)
+        gross_sums = np.bincount(inverse, weights=gross, minlength=size)
+        net_sums = np.bincount(inverse, weights=gross - stake, minlength=size)
+        counts = np.bincount(inverse, minlength=size)
+        wins = np.bincount(inverse[outcome == OUTCOME_WIN], minlength=size)
+        losses = np.bincount(inverse[outcome == OUTCOME_LOSS], minlength=size)
+        return {
+            int(key): SummaryMetrics(
+                stake_total=float(stake_sums[index]),
+                return_total=float(gross_sums[index]),
+                net=float(net_sums[index]),
+                wins=int(wins[index]),
+                losses=int(losses[index]),
+                pending=int(counts[index] - wins[index] - losses[index]),
+                count=int(counts[index]),
+            )
+            for index, key in enumerate(groups)
+        }
+
+    def _write(self, row: int, bet: Bet) -> None:
+        self._stake[row] = bet.stake
+        self._odds[row] = bet.odds
+        self._cashout[row] = np.nan if bet.cashout is None else bet.cashout
+        self._outcome[row] = _OUTCOME_CODES.get(bet.outcome, OUTCOME_PENDING)
+        self._day[row] = bet.event_date.toordinal()
+        self._month[row] = _month_code(bet.event_date)
+        self._type[row] = self._type_code(bet.type)
+
+    def _type_code(self, bet_type: str) -> int:
+        code = self.type_codes.get(bet_type)
+        if code is None:
+            code = self.type_codes[bet_type] = len(self.type_codes)
+        return code
+
+    def _allocate(self, capacity: int) -> None:
+        for name, dtype in self._COLUMNS:
+            setattr(self, "_" + name, np.zeros(capacity, dtype=dtype))
+
+    def _grow(self, capacity: int) -> None:
+        for name, dtype in self._COLUMNS:
+            old = getattr(self, "_" + name)
+            new = np.zeros(capacity, dtype=dtype)
+            new[: len(old)] = old
+            setattr(self, "_" + name, new)
+
+
+def _month_code(value: date) -> int:
+    return value.year * 12 + value.month - 1
+
+
+__all__ = ["BetColumns", "OUTCOME_LOSS", "OUTCOME_PENDING", "OUTCOME_WIN", "available"]
@@ -11,16 +11,32 @@ class ClientConfig:
     api_url: str
     cache_root: Path
     sync_interval_seconds: int = 180
+    columnar: bool = False
 
     def ensure_user_dir(self, user_id: str) -> Path:
         path = self.cache_root / user_id
         path.mkdir(parents=True, exist_ok=True)
         return path
 
+    def bets_store_path(self, user_id: str) -> Path:
+        return self.ensure_user_dir(user_id) / "bets.db"
+
     def bets_cache_path(self, user_id: str) -> Path:
+        """Pre-SQLite JSON cache, read once to migrate it into the store."""
         return self.ensure_user_dir(user_id) / "bets_cache.json"
 
+    def sync_state_path(self, user_id: str) -> Path:
+        """Pre-SQLite sync stamp, migrated along with the JSON cache."""
+        return self.ensure_user_dir(user_id) / "sync_state.json"
+
+    def journal_path(self, user_id: str) -> Path:
+        return self.ensure_user_dir(user_id) / "pending_ops.jsonl"
+
+    def journal_marker_path(self, user_id: str) -> Path:
+        return self.ensure_user_dir(user_id) / "pending_ops.committed"
+
     def queue_path(self, user_id: str) -> Path:
+        """Pre-journal JSON queue, read once to migrate it into the journal."""
         return self.ensure_user_dir(user_id) / "pending_ops.json"
 
     @property
@@ -37,6 +53,7 @@ def get_client_config() -> ClientConfig:
         api_url=os.getenv("INVICTOS_API_URL", "http://127.0.0.1:8000"),
         cache_root=cache_root,
         sync_interval_seconds=int(os.getenv("INVICTOS_SYNC_INTERVAL", "180")),
+        columnar=os.getenv("INVICTOS_COLUMNAR", "0") == "1",
     )
 
 
@@ -55,6 +55,7 @@ _STRINGS: Dict[str, Dict[str, str]] = {
         "form.success": "Apuesta guardada",
         "form.offline": "Sin conexión. Guardado localmente",
         "toast.sync.ok": "Sincronización completa",
+        "toast.sync.delta": "{count} cambios sincronizados",
         "toast.sync.fail": "Sin conexión con el backend",
         "toast.delete.offline": "Eliminado localmente, pendiente de sincronización",
         "toolbar.today": "Hoy",
@@ -62,6 +63,7 @@ _STRINGS: Dict[str, Dict[str, str]] = {
         "toolbar.next": "Siguiente",
         "toolbar.pick_date": "Elegir fecha",
         "toolbar.sync": "Sincronizar",
+        "toolbar.repair": "Descargar todo de nuevo",
         "actions.delete": "Eliminar",
     }
 }
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+from .config import get_client_config
+
+# Rewrite the journal once this many bytes of it are acknowledged.
+COMPACT_BYTES = 256 * 1024
+
+
+@dataclass(frozen=True)
+class JournalEntry:
+    seq: int
+    op: Dict[str, Any]
+
+
+class PendingJournal:
+    """Append-only JSONL log of offline operations.
+
+    Op lines are ``{"seq": n, "op": {...}}``; acknowledgements are appended
+    as ``{"ack": [n, ...]}`` lines, so ops can be acknowledged in any order
+    without rewriting the log. Every line is fsynced before the call returns.
+    A small marker file records the committed ``seq``: the highest one with
+    every op up to it acknowledged. Acknowledged lines are dropped by
+    rewriting the log once they pass ``COMPACT_BYTES``, or when nothing is
+    left pending.
+    """
+
+    def __init__(self, path: Path, marker_path: Path, legacy_queue: Optional[Path] = None) -> None:
+        self.path = path
+        self.marker_path = marker_path
+        self._lock = threading.Lock()
+        self._committed = self._read_marker()
+        self._next_seq = self._committed + 1
+        # Pending seqs in order with the size of their line, and the acks not
+        # yet folded into ``_committed``.
+        self._pending: Deque[int] = deque()
+        self._line_bytes: Dict[int, int] = {}
+        self._acked: Set[int] = set()
+        self._dead_bytes = 0
+        self._repair()
+        self._load()
+        if legacy_queue is not None and legacy_queue.exists():
+            self._migrate_json(legacy_queue)
+
+    def append(self, op: Dict[str, Any]) -> int:
+        with self._lock:
+            seq = self._next_seq
+            size = self._write_line({"seq": seq, "op": op})
+            self._next_seq = seq + 1
+            self._pending.append(seq)
+            self._line_bytes[seq] = size
+            return seq
+
+    def pending(self) -> List[JournalEntry]:
+        with self._lock:
+            entries, acked = self._scan()
+            return [entry for entry in entries if entry.seq > self._committed and entry.seq not in acked]
+
+    def acknowledge(self, seqs: Iterable[int]) -> None:
+        """Record ``seqs`` as applied, in whatever order they finished."""
+        with self._lock:
+            fresh = sorted(seq for seq in set(seqs) if seq in self._line_bytes and seq not in self._acked)
+            if not fresh:
+                return
+            self._dead_bytes += self._write_line({"ack": fresh})
+            for seq in fresh:
+                self._acked.add(seq)
+                self._dead_bytes += self._line_bytes[seq]
+            committed = self._committed
+            while self._pending and self._pending[0] in self._acked:
+                committed = self._pending.popleft()
+                self._acked.discard(committed)
+                del self._line_bytes[committed]
+            if not self._pending or self._dead_bytes >= COMPACT_BYTES:
+                self._compact()
+            if committed != self._committed:
+                self._committed = committed
+                self._write_marker()
+
+    def _write_line(self, data: Dict[str, Any]) -> int:
+        line = (json.dumps(data, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with open(self.path, "ab") as handle:
+            handle.write(line)
+            handle.flush()
+            os.fsync(handle.fileno())
+        return len(line)
+
+    def _compact(self) -> None:
+        # Keep only unacknowledged ops; ack lines go with the ops they cover.
+        kept = bytearray()
+        with open(self.path, "rb") as handle:
+            for raw in handle:
+                entry = _parse(raw)
+                if isinstance(entry, JournalEntry) and entry.seq in self._line_bytes and entry.seq not in self._acked:
+                    kept += raw
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as handle:
+            handle.write(kept)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp, self.path)
+        for seq in self._acked:
+            del self._line_bytes[seq]
+        self._pending = deque(seq for seq in self._pending if seq not in self._acked)
+        self._acked.clear()
+        self._dead_bytes = 0
+
+    def _scan(self) -> tuple[List[JournalEntry], Set[int]]:
+        entries: List[JournalEntry] = []
+        acked: Set[int] = set()
+        with open(self.path, "rb") as handle:
+            for raw in handle:
+                entry = _parse(raw)
+                if isinstance(entry, JournalEntry):
+                    entries.append(entry)
+                elif entry is not None:
+                    acked.update(entry)
+        return entries, acked
+
+    def _load(self) -> None:
+        entries, acked = self._scan()
+        live = 0
+        for entry in entries:
+            self._next_seq = max(self._next_seq, entry.seq + 1)
+            if entry.seq > self._committed and entry.seq not in acked:
+                self._pending.append(entry.seq)
+                self._line_bytes[entry.seq] = 0
+                live += 1
+        # Line sizes only feed the compaction threshold; on open, count the
+        # whole file as dead unless everything in it is still pending.
+        self._dead_bytes = self.path.stat().st_size if live < len(entries) or acked else 0
+
+    def _repair(self) -> None:
+        # A crash mid-append can leave a line without its newline; cut it so
+        # the next append starts on a fresh line.
+        if not self.path.exists():
+            self.path.touch()
+            return
+        with open(self.path, "rb+") as handle:
+            data = handle.read()
+            if data and not data.endswith(b"\n"):
+                handle.truncate(data.rfind(b"\n") + 1)
+
+    def _read_marker(self) -> int:
+        try:
+            return int(json.loads(self.marker_path.read_text(encoding="utf-8"))["committed"])
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError, ValueError):
+            return 0
+
+    def _write_marker(self) -> None:
+        tmp = self.marker_path.with_name(self.marker_path.name + ".tmp")
+        tmp.write_text(json.dumps({"committed": self._committed}), encoding="utf-8")
+        os.replace(tmp, self.marker_path)
+
+    def _migrate_json(self, legacy: Path) -> None:
+        try:
+            items = json.loads(legacy.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            items = []
+        for item in items:
+            self.append(item)
+        legacy.rename(legacy.with_name(legacy.name + ".migrated"))
+
+
+def _parse(raw: bytes):
+    """A ``JournalEntry``, the seqs of an ack line, or ``None`` for a torn line."""
+    try:
+        data = json.loads(raw)
+        if "ack" in data:
+            return [int(seq) for seq in data["ack"]]
+        return JournalEntry(seq=int(data["seq"]), op=data["op"])
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return None
+
+
+_journals: Dict[str, PendingJournal] = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(user_id: str) -> PendingJournal:
+    """The journal for ``user_id``, opened (and migrated) on first use."""
+    with _journals_lock:
+        journal = _journals.get(user_id)
+        if journal is None:
+            cfg = get_client_config()
+            journal = PendingJournal(
+                cfg.journal_path(user_id),
+                cfg.journal_marker_path(user_id),
+                legacy_queue=cfg.queue_path(user_id),
+            )
+            _journals[user_id] = journal
+        return journal
+
+
+__all__ = ["COMPACT_BYTES", "JournalEntry", "PendingJournal", "get_journal"]
@@ -1,7 +1,7 @@
 ﻿from __future__ import annotations
 
 from dataclasses import dataclass, field
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from typing import Iterable, List, Optional
 
 
@@ -127,13 +127,22 @@ class AuthResponse:
     access_token: str
     token_type: str
     user: User
+    refresh_token: Optional[str] = None
+    expires_at: Optional[datetime] = None
 
     @classmethod
     def from_dict(cls, data: dict) -> "AuthResponse":
+        expires_at = data.get("expires_at")
+        if expires_at:
+            expires_at = _parse_datetime(expires_at)
+        elif data.get("expires_in"):
+            expires_at = datetime.utcnow() + timedelta(seconds=int(data["expires_in"]))
         return cls(
             access_token=data.get("access_token", ""),
             token_type=data.get("token_type", "bearer"),
             user=User.from_dict(data.get("user", {})),
+            refresh_token=data.get("refresh_token"),
+            expires_at=expires_at,
         )
 
     def to_dict(self) -> dict:
@@ -141,6 +150,8 @@ class AuthResponse:
             "access_token": self.access_token,
             "token_type": self.token_type,
             "user": self.user.to_dict(),
+            "refresh_token": self.refresh_token,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
         }
 
 
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Sequence, Tuple
+
+from . import cache, config, store
+from .api import ApiClient
+from .state import AppState
+from .sync import enqueue_operation, flush_pending
+
+
+@dataclass
+class ReplayBenchResult:
+    workers: int
+    queued: int
+    requests: int
+    seconds: float
+    failed: int
+    server_max_in_flight: int
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.seconds if self.seconds else 0.0
+
+
+class _StandInServer(ThreadingHTTPServer):
+    """Answers ``/bets`` writes after ``latency`` seconds, recording arrival order."""
+
+    daemon_threads = True
+
+    def __init__(self, latency: float) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.log: List[Tuple[str, str, dict]] = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, each
+    # response would also wait for the client's delayed ACK.
+    disable_nagle_algorithm = True
+    server: _StandInServer
+
+    def log_message(self, *_args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        body = self._enter()
+        bet = {**body, "id": body.get("id") or str(uuid.uuid4())}
+        self._leave(201, bet)
+
+    def do_PATCH(self) -> None:
+        body = self._enter()
+        bet_id = self.path.rsplit("/", 1)[-1]
+        self._leave(200, {**_stub_bet(bet_id), **body})
+
+    def do_DELETE(self) -> None:
+        self._enter()
+        self._leave(204, None)
+
+    def _enter(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else {}
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+            self.server.log.append((self.command, self.path, body))
+        time.sleep(self.server.latency)
+        return body
+
+    def _leave(self, status: int, payload) -> None:
+        data = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        with self.server.lock:
+            self.server.in_flight -= 1
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _stub_bet(bet_id: str) -> dict:
+    now = datetime.utcnow().isoformat()
+    return {
+        "id": bet_id,
+        "user_id": "bench",
+        "event_date": date.today().isoformat(),
+        "type": "single",
+        "detail": "bench",
+        "stake": 10.0,
+        "odds": 2.0,
+        "cashout": None,
+        "outcome": "pendiente",
+        "legs": [],
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _fill_queue(user_id: str, bets: int, ops_per_bet: int) -> int:
+    # Interleave the bets, as edits made over a long offline stretch would
+    # be; each bet's edits coalesce into one PATCH.
+    for step in range(ops_per_bet):
+        data = {"outcome": "acertada"} if step % 2 == 0 else {"cashout": float(step)}
+        for index in range(bets):
+            enqueue_operation("update", None, {"bet_id": f"bench-{index}", "data": data}, user_id)
+    return bets * ops_per_bet
+
+
+def run_replay_bench(
+    bets: int = 200,
+    ops_per_bet: int = 3,
+    latency_ms: float = 50.0,
+    workers: Sequence[int] = (1, 8),
+) -> List[ReplayBenchResult]:
+    """Replay the same offline queue against a stand-in server, once per worker count.
+
+    The queue, journal and store live in a scratch cache directory; the
+    stand-in sleeps ``latency_ms`` per request to play the network round trip.
+    """
+    results: List[ReplayBenchResult] = []
+    saved_env = {name: os.environ.get(name) for name in ("INVICTOS_CACHE_DIR", "INVICTOS_API_URL")}
+    with tempfile.TemporaryDirectory(prefix="invictos-replay-") as tmp:
+        server = _StandInServer(latency_ms / 1000)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        os.environ["INVICTOS_CACHE_DIR"] = tmp
+        os.environ["INVICTOS_API_URL"] = server.base_url
+        config.get_client_config.cache_clear()
+        try:
+            for count in workers:
+                user_id = f"bench-{count}-{uuid.uuid4().hex[:8]}"
+                queued = _fill_queue(user_id, bets, ops_per_bet)
+                with server.lock:
+                    server.log.clear()
+                    server.max_in_flight = 0
+                client = ApiClient()
+                outcome = flush_pending(client, AppState(), user_id, workers=count)
+                results.append(
+                    ReplayBenchResult(
+                        workers=count,
+                        queued=queued,
+                        requests=len(server.log),
+                        seconds=outcome.seconds,
+                        failed=len(outcome.failed) + len(cache.load_pending_queue(user_id)),
+                        server_max_in_flight=server.max_in_flight,
+                    )
+                )
+                store.close_store(user_id)
+        finally:
+            server.shutdown()
+            server.server_close()
+            for name, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+            config.get_client_config.cache_clear()
+    return results
+
+
+__all__ = ["ReplayBenchResult", "run_replay_bench"]
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from .api import ApiClient
+
+
+@dataclass(slots=True)
+class SimulationBand:
+    step: int
+    p5: float
+    p25: float
+    p50: float
+    p75: float
+    p95: float
+    ruin: float
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SimulationBand":
+        return cls(
+            step=int(data.get("step", 0)),
+            p5=float(data.get("p5", 0.0)),
+            p25=float(data.get("p25", 0.0)),
+            p50=float(data.get("p50", 0.0)),
+            p75=float(data.get("p75", 0.0)),
+            p95=float(data.get("p95", 0.0)),
+            ruin=float(data.get("ruin", 0.0)),
+        )
+
+
+@dataclass(slots=True)
+class SimulationResult:
+    bankroll: float
+    paths: int
+    bets: int
+    risk_of_ruin: float
+    final: Dict[str, float] = field(default_factory=dict)
+    bands: List[SimulationBand] = field(default_factory=list)
+    history: Dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SimulationResult":
+        return cls(
+            bankroll=float(data.get("bankroll", 0.0)),
+            paths=int(data.get("paths", 0)),
+            bets=int(data.get("bets", 0)),
+            risk_of_ruin=float(data.get("risk_of_ruin", 0.0)),
+            final={key: float(value) for key, value in data.get("final", {}).items()},
+            bands=[SimulationBand.from_dict(item) for item in data.get("bands", [])],
+            history={key: float(value) for key, value in data.get("history", {}).items()},
+        )
+
+    @property
+    def median_final(self) -> float:
+        return self.final.get("p50", self.bankroll)
+
+
+def run_simulation(
+    api: ApiClient,
+    bankroll: float,
+    paths: int = 10_000,
+    bets: int = 1_000,
+    ruin_level: float = 0.0,
+    seed: Optional[int] = None,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> SimulationResult:
+    """Ask the backend for bankroll paths built from the user's settled bets.
+
+    ``on_progress`` (0..1) makes the call stream, which is worth it for long
+    horizons; without it the result arrives in one response.
+    """
+    params: dict = {"bankroll": bankroll, "paths": paths, "bets": bets, "ruin_level": ruin_level}
+    if seed is not None:
+        params["seed"] = seed
+    return SimulationResult.from_dict(api.simulate(params, on_progress=on_progress))
+
+
+__all__ = ["SimulationBand", "SimulationResult", "run_simulation"]
@@ -1,9 +1,11 @@
 ﻿from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import date, datetime
-from typing import Dict, Iterable, List, Optional
+from bisect import bisect_left, insort
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
+from .columnar import BetColumns, available as columnar_available
 from .models import Bet, User
 
 
@@ -23,13 +25,49 @@ class SummaryMetrics:
             return 0.0
         return (self.net / self.stake_total) * 100
 
+    def add(self, bet: Bet, sign: int = 1) -> None:
+        """Add ``bet``'s contribution, or take it back with ``sign=-1``."""
+        ret = bet.gross_return()
+        self.count += sign
+        self.stake_total += sign * bet.stake
+        self.return_total += sign * ret
+        self.net += sign * (ret - bet.stake)
+        if bet.outcome == "acertada":
+            self.wins += sign
+        elif bet.outcome == "fallida":
+            self.losses += sign
+        else:
+            self.pending += sign
+
 
 class AppState:
-    def __init__(self, bets: Optional[Iterable[Bet]] = None, user: Optional[User] = None) -> None:
+    """Bets of the signed-in user, indexed by day and month.
+
+    ``upsert``, ``remove`` and ``replace_all`` keep the indexes and the
+    per-day and per-month ``SummaryMetrics`` in step, so day and month
+    lookups cost the size of the answer and metrics cost nothing.
+    Change bets through them, never by assigning to ``bets`` or mutating a
+    stored ``Bet``: upsert a new copy (``dataclasses.replace``) instead.
+
+    With ``columnar`` (and NumPy installed) the bets are mirrored into a
+    ``BetColumns``, which rebuilds the metrics vectorized on ``replace_all``.
+    NumPy adds in a different order than a Python loop, so those sums can
+    differ from ``compute_metrics`` in the last few bits.
+    """
+
+    def __init__(
+        self, bets: Optional[Iterable[Bet]] = None, user: Optional[User] = None, columnar: bool = False
+    ) -> None:
         self.bets: Dict[str, Bet] = {}
+        self.columns: Optional[BetColumns] = BetColumns() if columnar and columnar_available() else None
+        self._by_date: Dict[date, Set[str]] = {}
+        self._by_month: Dict[str, Set[str]] = {}
+        # Ascending (event_date, created_at, id); ``as_list`` walks it backwards.
+        self._order: List[_OrderKey] = []
+        self._day_metrics: Dict[date, SummaryMetrics] = {}
+        self._month_metrics: Dict[str, SummaryMetrics] = {}
         if bets:
-            for bet in bets:
-                self.bets[bet.id] = bet
+            self.replace_all(bets)
         self.last_sync: Optional[datetime] = None
         self.user: Optional[User] = user
 
@@ -41,57 +79,149 @@ class AppState:
         self.user = user
 
     def upsert(self, bet: Bet) -> None:
+        current = self.bets.get(bet.id)
         self.bets[bet.id] = bet
+        if current is None:
+            self._index(bet)
+        else:
+            self._measure(current, -1)
+            if _order_key(current) != _order_key(bet):
+                self._unindex(current)
+                self._index(bet)
+        self._measure(bet, 1)
+        if self.columns is not None:
+            self.columns.upsert(bet)
 
     def remove(self, bet_id: str) -> None:
-        self.bets.pop(bet_id, None)
+        bet = self.bets.pop(bet_id, None)
+        if bet is not None:
+            self._measure(bet, -1)
+            self._unindex(bet)
+            if self.columns is not None:
+                self.columns.remove(bet_id)
+
+    def merge(self, bets: Iterable[Bet], last_sync: Optional[datetime] = None) -> List[Bet]:
+        """Apply remote changes, keeping whichever copy of each bet was written last.
+
+        Returns the bets that changed locally.
+        """
+        changed: List[Bet] = []
+        for bet in bets:
+            current = self.bets.get(bet.id)
+            if current is None or _as_utc(bet.updated_at) > _as_utc(current.updated_at):
+                self.upsert(bet)
+                changed.append(bet)
+        if last_sync is not None:
+            self.last_sync = last_sync
+        return changed
 
     def replace_all(self, bets: Iterable[Bet], last_sync: Optional[datetime] = None) -> None:
         self.bets = {bet.id: bet for bet in bets}
+        self._by_date = {}
+        self._by_month = {}
+        for bet in self.bets.values():
+            self._by_date.setdefault(bet.event_date, set()).add(bet.id)
+            self._by_month.setdefault(_month_key(bet.event_date), set()).add(bet.id)
+        self._order = sorted(_order_key(bet) for bet in self.bets.values())
+        if self.columns is not None:
+            self.columns.replace_all(self.bets.values())
+            self._day_metrics = self.columns.metrics_by_day()
+            self._month_metrics = self.columns.metrics_by_month()
+        else:
+            self._day_metrics = {}
+            self._month_metrics = {}
+            for bet in self.bets.values():
+                self._measure(bet, 1)
         self.last_sync = last_sync
 
     def as_list(self) -> List[Bet]:
-        return sorted(self.bets.values(), key=lambda b: (b.event_date, b.created_at), reverse=True)
+        return [self.bets[key[2]] for key in reversed(self._order)]
+
+    def latest_date(self) -> Optional[date]:
+        return self._order[-1][0] if self._order else None
 
     def by_date(self, target: date) -> List[Bet]:
-        return sorted(
-            (bet for bet in self.bets.values() if bet.event_date == target),
-            key=lambda b: b.created_at,
-            reverse=True,
-        )
+        if target not in self._by_date:
+            return []
+        return self._range(target, target + timedelta(days=1))
 
     def by_month(self, month_key: str) -> List[Bet]:
-        return sorted(
-            (bet for bet in self.bets.values() if bet.event_date.strftime("%Y-%m") == month_key),
-            key=lambda b: (b.event_date, b.created_at),
-            reverse=True,
-        )
+        if month_key not in self._by_month:
+            return []
+        year, month = (int(part) for part in month_key.split("-"))
+        start = date(year, month, 1)
+        end = date(year + month // 12, month % 12 + 1, 1)
+        return self._range(start, end)
 
     def months(self) -> List[str]:
-        return sorted({bet.event_date.strftime("%Y-%m") for bet in self.bets.values()}, reverse=True)
+        return sorted(self._by_month, reverse=True)
+
+    def _range(self, start: date, end: date) -> List[Bet]:
+        # Bets with start <= event_date < end, newest first, straight from the
+        # sorted order: a slice instead of a sort.
+        low = bisect_left(self._order, (start,))
+        high = bisect_left(self._order, (end,), low)
+        return [self.bets[key[2]] for key in reversed(self._order[low:high])]
+
+    def _index(self, bet: Bet) -> None:
+        self._by_date.setdefault(bet.event_date, set()).add(bet.id)
+        self._by_month.setdefault(_month_key(bet.event_date), set()).add(bet.id)
+        insort(self._order, _order_key(bet))
+
+    def _unindex(self, bet: Bet) -> None:
+        _discard(self._by_date, bet.event_date, bet.id)
+        _discard(self._by_month, _month_key(bet.event_date), bet.id)
+        key = _order_key(bet)
+        index = bisect_left(self._order, key)
+        if index < len(self._order) and self._order[index] == key:
+            del self._order[index]
+
+    def _measure(self, bet: Bet, sign: int) -> None:
+        for index, key in ((self._day_metrics, bet.event_date), (self._month_metrics, _month_key(bet.event_date))):
+            summary = index.get(key)
+            if summary is None:
+                summary = index[key] = SummaryMetrics()
+            summary.add(bet, sign)
+            if summary.count == 0:
+                # Drop emptied buckets rather than keep float residue from
+                # the subtractions.
+                del index[key]
 
     def compute_metrics(self, bets: Iterable[Bet]) -> SummaryMetrics:
         summary = SummaryMetrics()
         for bet in bets:
-            summary.count += 1
-            summary.stake_total += bet.stake
-            ret = bet.gross_return()
-            summary.return_total += ret
-            net = ret - bet.stake
-            summary.net += net
-            if bet.outcome == "acertada":
-                summary.wins += 1
-            elif bet.outcome == "fallida":
-                summary.losses += 1
-            else:
-                summary.pending += 1
+            summary.add(bet)
         return summary
 
     def daily_metrics(self, target: date) -> SummaryMetrics:
-        return self.compute_metrics(self.by_date(target))
+        return replace(self._day_metrics.get(target) or SummaryMetrics())
 
     def month_metrics(self, month_key: str) -> SummaryMetrics:
-        return self.compute_metrics(self.by_month(month_key))
+        return replace(self._month_metrics.get(month_key) or SummaryMetrics())
+
+
+_OrderKey = Tuple[date, datetime, str]
+
+
+def _order_key(bet: Bet) -> _OrderKey:
+    return bet.event_date, _as_utc(bet.created_at), bet.id
+
+
+def _month_key(value: date) -> str:
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+def _discard(index: Dict, key, bet_id: str) -> None:
+    ids = index.get(key)
+    if ids is not None:
+        ids.discard(bet_id)
+        if not ids:
+            del index[key]
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Server stamps are aware; edits made offline are stamped with naive UTC.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
 
 
 __all__ = ["AppState", "SummaryMetrics"]
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .config import get_client_config
+from .models import Bet
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bets (
+    id TEXT PRIMARY KEY,
+    event_date TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_bets_event_date ON bets (event_date);
+CREATE INDEX IF NOT EXISTS ix_bets_updated_at ON bets (updated_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_UPSERT = (
+    "INSERT INTO bets (id, event_date, updated_at, data) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(id) DO UPDATE SET event_date = excluded.event_date, "
+    "updated_at = excluded.updated_at, data = excluded.data"
+)
+
+
+class BetStore:
+    """One user's bets in a local SQLite file, one row per bet.
+
+    Edits touch a single row, so saving costs the same however long the
+    history is. A ``bets_cache.json`` left by older versions is imported on
+    first open and renamed to ``*.migrated``.
+    """
+
+    def __init__(self, path: Path, legacy_cache: Optional[Path] = None, legacy_sync_state: Optional[Path] = None) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        # Flet runs handlers on worker threads; the lock serializes access.
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        if legacy_cache is not None and legacy_cache.exists():
+            self._migrate_json(legacy_cache, legacy_sync_state)
+
+    def load_all(self) -> List[Bet]:
+        with self._lock:
+            rows = self._connection.execute("SELECT data FROM bets ORDER BY event_date DESC").fetchall()
+        return [Bet.from_dict(json.loads(data)) for (data,) in rows]
+
+    def upsert(self, bet: Bet) -> None:
+        self.upsert_many([bet])
+
+    def upsert_many(self, bets: Iterable[Bet]) -> None:
+        rows = [_row(bet) for bet in bets]
+        if not rows:
+            return
+        with self._lock, self._connection:
+            self._connection.executemany(_UPSERT, rows)
+
+    def delete(self, bet_id: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM bets WHERE id = ?", (bet_id,))
+
+    def replace_all(self, bets: Iterable[Bet]) -> None:
+        rows = [_row(bet) for bet in bets]
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM bets")
+            self._connection.executemany(_UPSERT, rows)
+
+    def get_last_sync(self) -> Optional[datetime]:
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM meta WHERE key = 'last_sync'").fetchone()
+        if not row or not row[0]:
+            return None
+        try:
+            return datetime.fromisoformat(row[0])
+        except ValueError:
+            return None
+
+    def set_last_sync(self, last_sync: Optional[datetime]) -> None:
+        value = last_sync.isoformat() if last_sync else None
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('last_sync', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (value,),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _migrate_json(self, legacy: Path, sync_state: Optional[Path]) -> None:
+        try:
+            raw = json.loads(legacy.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            raw = []
+        self.upsert_many(Bet.from_dict(item) for item in raw)
+        legacy.rename(legacy.with_name(legacy.name + ".migrated"))
+        if sync_state is not None and sync_state.exists():
+            try:
+                value = json.loads(sync_state.read_text(encoding="utf-8")).get("last_sync")
+                self.set_last_sync(datetime.fromisoformat(value) if value else None)
+            except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+                pass
+            sync_state.unlink()
+
+
+def _row(bet: Bet) -> tuple:
+    return (
+        bet.id,
+        bet.event_date.isoformat(),
+        bet.updated_at.isoformat(),
+        json.dumps(bet.to_dict(), ensure_ascii=False, separators=(",", ":")),
+    )
+
+
+_stores: Dict[str, BetStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(user_id: str) -> BetStore:
+    """The store for ``user_id``, opened (and migrated) on first use."""
+    with _stores_lock:
+        store = _stores.get(user_id)
+        if store is None:
+            cfg = get_client_config()
+            store = BetStore(
+                cfg.bets_store_path(user_id),
+                legacy_cache=cfg.bets_cache_path(user_id),
+                legacy_sync_state=cfg.sync_state_path(user_id),
+            )
+            _stores[user_id] = store
+        return store
+
+
+def close_store(user_id: str) -> None:
+    """Close and forget ``user_id``'s store so its files can be removed.
+
+    Windows will not delete an open database; the replay benchmark and the
+    tests call this before dropping their scratch cache directories.
+    """
+    with _stores_lock:
+        store = _stores.pop(user_id, None)
+    if store is not None:
+        store.close()
+
+
+__all__ = ["BetStore", "close_store", "get_store"]
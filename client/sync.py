@@ -1,13 +1,21 @@
 ﻿from __future__ import annotations
 
-from dataclasses import dataclass, asdict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 from . import cache
-from .api import ApiClient, ApiClientError, ApiConnectionError
+from .api import ApiClient, ApiClientError, ApiConnectionError, ApiRateLimitError
+from .journal import JournalEntry
 from .models import Bet
 
+# Bets replayed at once; requests share the ApiClient's connection pool
+# (10 connections by default), so keep this below it.
+REPLAY_WORKERS = 8
+
 
 @dataclass
 class PendingOperation:
@@ -39,35 +47,182 @@ def enqueue_operation(kind: str, bet: Bet | None, payload: Dict[str, Any], user_
     cache.append_pending_op(op.to_dict(), user_id)
 
 
-def flush_pending(client: ApiClient, state, user_id: str) -> None:
-    queue_raw = cache.load_pending_queue(user_id)
-    if not queue_raw:
-        return
-
-    pending = [PendingOperation.from_dict(item) for item in queue_raw]
-    applied: List[Dict[str, Any]] = []
-    try:
-        for op in pending:
-            if op.kind == "create":
-                bet = Bet.from_dict(op.payload)
-                created = client.create_bet(bet)
-                state.upsert(created)
-            elif op.kind == "update":
-                bet_id = op.payload.get("bet_id") or op.bet_id
-                patch = op.payload.get("data", {})
-                updated = client.update_bet(bet_id, patch)
-                state.upsert(updated)
-            elif op.kind == "delete":
-                bet_id = op.payload.get("bet_id") or op.bet_id
-                client.delete_bet(bet_id)
-                state.remove(bet_id)
-            applied.append(op.to_dict())
-    except (ApiClientError, ApiConnectionError):
-        remaining = [item for item in queue_raw if item not in applied]
-        cache.save_pending_queue(remaining, user_id)
-        return
-
-    cache.save_pending_queue([], user_id)
-
-
-__all__ = ["enqueue_operation", "flush_pending"]
+@dataclass
+class CoalescedOperation:
+    """One request standing for one or more queued ops on the same bet."""
+
+    op: PendingOperation
+    seqs: List[int] = field(default_factory=list)
+
+
+def coalesce_operations(entries: Iterable[JournalEntry]) -> Tuple[List[CoalescedOperation], List[int]]:
+    """Fold each bet's queued ops into as few requests as possible.
+
+    Per bet, in queue order: successive updates merge (later fields win),
+    updates fold into a pending create, a delete replaces the updates before
+    it, and a delete of a bet created offline cancels the whole chain. Each
+    result sits at its bet's first op, so a bet's ops keep their relative
+    order. Returns the requests and the seqs cancelled outright.
+    """
+    chains: Dict[str, CoalescedOperation] = {}
+    merged: List[CoalescedOperation] = []
+    dropped: List[int] = []
+    cancelled = set()
+    for entry in entries:
+        op = PendingOperation.from_dict(entry.op)
+        bet_id = _target(op)
+        current = chains.get(bet_id)
+        if current is None or current.op.kind == "delete":
+            # Nothing queued for this bet, or a new chain after a delete.
+            chains[bet_id] = CoalescedOperation(op, [entry.seq])
+            merged.append(chains[bet_id])
+            continue
+        current.seqs.append(entry.seq)
+        previous = current.op
+        if op.kind == "update":
+            data = op.payload.get("data", {})
+            if previous.kind == "create":
+                current.op = replace(previous, payload={**previous.payload, **data})
+            else:
+                patch = {**previous.payload.get("data", {}), **data}
+                current.op = replace(previous, payload={**previous.payload, "data": patch})
+        elif op.kind == "delete" and previous.kind == "create":
+            dropped.extend(current.seqs)
+            cancelled.add(id(current))
+            del chains[bet_id]
+        else:
+            current.op = op
+    return [item for item in merged if id(item) not in cancelled], dropped
+
+
+@dataclass
+class ReplayResult:
+    applied: int = 0
+    skipped: int = 0
+    failed: Dict[str, str] = field(default_factory=dict)
+    seconds: float = 0.0
+
+
+def flush_pending(client: ApiClient, state, user_id: str, workers: int = REPLAY_WORKERS) -> ReplayResult:
+    """Replay the offline queue, up to ``workers`` bets at a time.
+
+    Each bet's requests go one after another, in queue order; a bet whose
+    request fails keeps that request and the rest of its chain queued while
+    other bets carry on. Losing the connection or being told to back off
+    stops every chain. Each request is acknowledged in the journal as soon as
+    it succeeds.
+    """
+    result = ReplayResult()
+    entries = cache.load_pending_queue(user_id)
+    if not entries:
+        return result
+
+    started = time.perf_counter()
+    operations, dropped = coalesce_operations(entries)
+    cache.ack_pending_ops(dropped, user_id)
+    chains: Dict[str, List[CoalescedOperation]] = {}
+    for item in operations:
+        chains.setdefault(_target(item.op), []).append(item)
+
+    halt = threading.Event()
+    lock = threading.Lock()
+
+    def replay(bet_id: str, chain: List[CoalescedOperation]) -> None:
+        for index, item in enumerate(chain):
+            if halt.is_set():
+                with lock:
+                    result.skipped += len(chain) - index
+                return
+            try:
+                remote = _send(client, item.op)
+            except ApiClientError as error:
+                if isinstance(error, (ApiConnectionError, ApiRateLimitError)):
+                    halt.set()
+                with lock:
+                    result.failed[bet_id] = str(error)
+                    result.skipped += len(chain) - index - 1
+                return
+            with lock:
+                _apply_local(state, item.op, remote, user_id)
+                result.applied += 1
+            cache.ack_pending_ops(item.seqs, user_id)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="replay") as pool:
+        for future in [pool.submit(replay, bet_id, chain) for bet_id, chain in chains.items()]:
+            future.result()
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def pull_changes(client: ApiClient, state, user_id: str, full: bool = False) -> int:
+    """Apply ``/sync`` pages to ``state`` and the local store as they arrive.
+
+    A delta sync merges each page, keeping whichever copy of a bet was
+    written last, so the rows re-read by ``SYNC_OVERLAP`` are no-ops. A full
+    download (``full``, or no ``last_sync`` yet) stores each page and, after
+    the last one, swaps the state over and drops the bets the server no
+    longer has. ``last_sync`` only moves once the last page is applied, so
+    an interrupted pull is simply repeated. Returns the bets changed locally.
+    """
+    since = None if full else state.last_sync
+    fresh: Dict[str, Bet] = {}
+    changed = 0
+    last_sync: Optional[datetime] = None
+    for bets, stamp in client.fetch_changes(since):
+        if since is None:
+            fresh.update((bet.id, bet) for bet in bets)
+            cache.save_cached_changes(bets, user_id)
+        else:
+            applied = state.merge(bets)
+            cache.save_cached_changes(applied, user_id)
+            changed += len(applied)
+        last_sync = stamp or last_sync
+    if since is None:
+        gone: Set[str] = set(state.bets) - set(fresh)
+        for bet_id in gone:
+            cache.remove_cached_bet(bet_id, user_id)
+        state.replace_all(fresh.values())
+        changed = len(fresh)
+    state.last_sync = last_sync
+    cache.save_last_sync(last_sync, user_id)
+    return changed
+
+
+def _target(op: PendingOperation) -> str:
+    return op.payload.get("bet_id") or op.bet_id
+
+
+def _send(client: ApiClient, op: PendingOperation) -> Optional[Bet]:
+    if op.kind == "create":
+        return client.create_bet(Bet.from_dict(op.payload))
+    if op.kind == "update":
+        return client.update_bet(_target(op), op.payload.get("data", {}))
+    if op.kind == "delete":
+        client.delete_bet(_target(op))
+    return None
+
+
+def _apply_local(state, op: PendingOperation, remote: Optional[Bet], user_id: str) -> None:
+    if op.kind == "create" and remote is not None:
+        offline_id = op.payload.get("id") or op.bet_id
+        if remote.id != offline_id:
+            # The server assigned its own id; drop the offline copy.
+            state.remove(offline_id)
+            cache.remove_cached_bet(offline_id, user_id)
+    if remote is not None:
+        state.upsert(remote)
+        cache.save_cached_bet(remote, user_id)
+    elif op.kind == "delete":
+        state.remove(_target(op))
+        cache.remove_cached_bet(_target(op), user_id)
+
+
+__all__ = [
+    "CoalescedOperation",
+    "REPLAY_WORKERS",
+    "ReplayResult",
+    "coalesce_operations",
+    "enqueue_operation",
+    "flush_pending",
+    "pull_changes",
+]
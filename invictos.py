@@ -1,5 +1,6 @@
 ﻿from __future__ import annotations
 
+from datetime import date
 from pathlib import Path
 from typing import Optional
 
@@ -54,6 +55,199 @@ def seed(path: Optional[Path] = typer.Option(None, help="Ubicacion personalizada
     typer.echo("Datos de ejemplo cargados")
 
 
+@app.command()
+def archive(
+    days: Optional[int] = typer.Option(None, help="Archivar apuestas resueltas con mas de N dias (por defecto INVICTOS_ARCHIVE_DAYS)"),
+    before: Optional[str] = typer.Option(None, help="Fecha limite exacta (YYYY-MM-DD); tiene prioridad sobre --days"),
+    batch_size: int = typer.Option(2000, help="Apuestas movidas por transaccion"),
+) -> None:
+    """Mueve apuestas resueltas antiguas a la tabla de archivo."""
+
+    from datetime import timedelta
+
+    from backend.archive import archive_settled_bets
+
+    cutoff: Optional[date] = None
+    if before:
+        cutoff = date.fromisoformat(before)
+    elif days is not None:
+        cutoff = date.today() - timedelta(days=days)
+
+    report = archive_settled_bets(cutoff, batch_size=batch_size)
+    typer.echo(f"Apuestas archivadas (anteriores a {report.before.isoformat()}): {report.archived}")
+    typer.echo(f"Filas en tabla activa: {report.hot_rows_before} -> {report.hot_rows_after}")
+    if report.hot_bytes_before is not None and report.hot_bytes_after is not None:
+        typer.echo(f"Tamano tabla activa: {_format_bytes(report.hot_bytes_before)} -> {_format_bytes(report.hot_bytes_after)}")
+    if report.latency_before_ms is not None and report.latency_after_ms is not None:
+        typer.echo(f"Listado por fecha (usuario mas activo): {report.latency_before_ms:.1f} ms -> {report.latency_after_ms:.1f} ms")
+
+
+@app.command()
+def stress(
+    config: list[str] = typer.Option(["default", "wal"], help="Configuraciones de almacenamiento a comparar"),
+    workers: int = typer.Option(16, help="Hilos cliente escribiendo a la vez"),
+    users: int = typer.Option(4, help="Usuarios entre los que se reparten los hilos"),
+    ops: int = typer.Option(200, help="Operaciones por hilo"),
+    server_workers: int = typer.Option(2, help="Procesos uvicorn del backend"),
+    backup_interval: Optional[float] = typer.Option(
+        None, help="Segundos entre copias en caliente durante la carga (mide su costo en latencia)"
+    ),
+) -> None:
+    """Prueba de contencion de escrituras SQLite contra el backend real."""
+
+    from backend.stress import STORAGE_CONFIGS, run_stress
+
+    failed = False
+    for name in config:
+        if name not in STORAGE_CONFIGS:
+            raise typer.BadParameter(f"Configuracion desconocida: {name} (opciones: {', '.join(STORAGE_CONFIGS)})")
+        result = run_stress(
+            name,
+            workers=workers,
+            users=users,
+            ops_per_worker=ops,
+            server_workers=server_workers,
+            backup_interval=backup_interval,
+        )
+        failed = failed or not result.ok
+        typer.echo(f"[{result.config}] {result.ops} ops en {result.seconds:.1f}s -> {result.throughput:.0f} ops/s")
+        for op in sorted(result.latencies):
+            typer.echo(
+                f"  {op:<13} n={len(result.latencies[op]):<6} p50={result.percentile(op, 50):7.1f}ms "
+                f"p95={result.percentile(op, 95):7.1f}ms p99={result.percentile(op, 99):7.1f}ms "
+                f"max={result.percentile(op, 100):7.1f}ms"
+            )
+        typer.echo(
+            f"  errores HTTP={sum(result.status_errors.values())} {dict(result.status_errors)} "
+            f"'database is locked'={result.locked_errors} timeouts={result.timeouts} "
+            f"hilos colgados={result.hung_workers}"
+        )
+        typer.echo(
+            f"  updates perdidos={result.lost_updates} faltantes={result.missing_bets} "
+            f"resucitadas={result.resurrected_bets} compartidas inconsistentes={result.shared_mismatches} "
+            f"compartidas fuera de orden={result.shared_out_of_order}"
+        )
+        if backup_interval is not None:
+            typer.echo(
+                f"  copias en caliente={result.backups} reinicios={result.backup_restarts} "
+                f"fallidas por actividad={result.backup_failures} "
+                f"bloqueo por paso p99={result.backup_step_ms_p99:.1f}ms"
+            )
+    if failed:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def doctor(
+    analyze: bool = typer.Option(True, help="Ejecutar ANALYZE y PRAGMA optimize"),
+    vacuum_seconds: float = typer.Option(0.0, help="Presupuesto (segundos) de VACUUM incremental por base; 0 lo omite"),
+    convert_vacuum: bool = typer.Option(False, help="Pasar a auto_vacuum incremental con un VACUUM completo si hace falta"),
+) -> None:
+    """Revisa tamanos, fragmentacion y planes de consulta de la base SQLite."""
+
+    from backend.doctor import run_doctor
+
+    for report in run_doctor(analyze=analyze, vacuum_seconds=vacuum_seconds or None, convert_vacuum=convert_vacuum):
+        typer.echo(f"== {report.label} ({report.path or 'memoria'}) ==")
+        file_size = _format_bytes(report.file_bytes) if report.file_bytes is not None else "-"
+        wal_size = _format_bytes(report.wal_bytes) if report.wal_bytes is not None else "-"
+        typer.echo(
+            f"Archivo: {file_size}  WAL: {wal_size}  journal={report.journal_mode}  auto_vacuum={report.auto_vacuum}"
+        )
+        typer.echo(
+            f"Paginas: {report.page_count} x {report.page_size} B, libres {report.freelist_count} "
+            f"({report.freelist_ratio:.1%})"
+        )
+        typer.echo("Tablas e indices:")
+        for item in report.objects:
+            if item.kind == "table":
+                label = f"tabla, {item.rows} filas"
+            else:
+                label = f"indice de {item.table}"
+            typer.echo(f"  {item.name:<36} {_format_bytes(item.bytes):>10}  ({label})")
+        for name, covered_by in report.redundant_indexes:
+            typer.echo(f"Indice redundante: {name} (cubierto por {covered_by})")
+        if report.analyze_ms is not None:
+            typer.echo(f"ANALYZE: {report.analyze_ms:.1f} ms  PRAGMA optimize: {report.optimize_ms:.1f} ms")
+        typer.echo("Planes de consulta:")
+        for plan in report.plans:
+            flag = "SCAN" if plan.full_scans else ("SORT" if plan.temp_sorts else "ok")
+            typer.echo(f"  [{flag:<4}] {plan.name}: {' | '.join(plan.plan)}")
+        if report.vacuum is not None:
+            vacuum = report.vacuum
+            status = "completo" if vacuum.complete else "parcial"
+            typer.echo(
+                f"VACUUM ({vacuum.mode}): {vacuum.pages_freed} paginas liberadas en {vacuum.seconds:.2f} s ({status})"
+            )
+            if vacuum.note:
+                typer.echo(f"  {vacuum.note}")
+        typer.echo("")
+
+
+@app.command()
+def backup(
+    dest: Optional[Path] = typer.Option(None, help="Carpeta destino (por defecto INVICTOS_BACKUP_DIR)"),
+    compress: bool = typer.Option(False, help="Comprimir cada copia con gzip"),
+    verify: bool = typer.Option(True, help="Restaurar la copia en un temporal y revisar su integridad"),
+    pages: Optional[int] = typer.Option(None, help="Paginas copiadas por paso (por defecto INVICTOS_BACKUP_PAGES)"),
+    pause_ms: Optional[float] = typer.Option(None, help="Pausa entre pasos para ceder a escritores"),
+) -> None:
+    """Copia en caliente de la base SQLite (y shards) sin detener el backend."""
+
+    from backend.backup import BackupError, run_backup
+
+    try:
+        reports = run_backup(dest, compress=compress, verify=verify, pages_per_step=pages, pause_ms=pause_ms)
+    except BackupError as exc:
+        typer.echo(str(exc))
+        raise typer.Exit(code=1)
+    failed = False
+    for report in reports:
+        typer.echo(f"{report.source} -> {report.target} ({_format_bytes(report.bytes)})")
+        typer.echo(
+            f"  {report.pages} paginas en {report.steps} pasos, {report.seconds:.2f} s, reinicios={report.restarts}"
+            + (f" (pasos agrandados a {report.step_pages} paginas)" if report.escalations else "")
+            + (" (ultimo tramo en un solo paso, WAL)" if report.final_single_step else "")
+        )
+        typer.echo(
+            f"  bloqueo por paso: p50={report.step_ms_p50:.1f}ms p99={report.step_ms_p99:.1f}ms max={report.step_ms_max:.1f}ms"
+        )
+        if report.verified is not None:
+            failed = failed or not report.verified
+            rows = ", ".join(f"{table}={count}" for table, count in report.table_rows.items() if not table.startswith("bet_fts"))
+            typer.echo(f"  verificacion: {report.integrity} ({rows})")
+    if failed:
+        raise typer.Exit(code=1)
+
+
+@app.command("replay-bench")
+def replay_bench(
+    bets: int = typer.Option(200, help="Apuestas con ediciones offline en cola"),
+    ops_per_bet: int = typer.Option(3, help="Ediciones encoladas por apuesta"),
+    latency_ms: float = typer.Option(50.0, help="Latencia simulada por peticion (ms)"),
+    workers: list[int] = typer.Option([1, 8], help="Hilos de reenvio a comparar"),
+) -> None:
+    """Mide el reenvio de la cola offline contra un servidor simulado con latencia."""
+
+    from client.replay_bench import run_replay_bench
+
+    for result in run_replay_bench(bets=bets, ops_per_bet=ops_per_bet, latency_ms=latency_ms, workers=workers):
+        typer.echo(
+            f"[{result.workers} hilos] {result.queued} operaciones -> {result.requests} peticiones "
+            f"en {result.seconds:.2f}s ({result.throughput:.0f}/s), simultaneas max={result.server_max_in_flight}, "
+            f"fallidas={result.failed}"
+        )
+
+
+def _format_bytes(value: int) -> str:
+    size = float(value)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
 def main() -> None:
     app()
 
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import os
+import tempfile
+
+# Settings and engines are read once, at import time: point them at a
+# scratch database before any test imports ``backend``.
+_SCRATCH = tempfile.mkdtemp(prefix="invictos-tests-")
+os.environ["INVICTOS_DB_URL"] = f"sqlite:///{_SCRATCH}/invictos.db"
+os.environ.setdefault("INVICTOS_RATE_LIMIT", "0")
+os.environ.pop("INVICTOS_SHARD_DIR", None)
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    from backend.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_headers(client):
+    """Bearer headers for a freshly registered user."""
+    from uuid import uuid4
+
+    response = client.post("/auth/register", json={"email": f"{uuid4().hex}@example.com", "password": "secret123"})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def client_cache(tmp_path, monkeypatch):
+    """Point the desktop client's cache (store, journal, auth) at ``tmp_path``."""
+    from client import config, store
+
+    monkeypatch.setenv("INVICTOS_CACHE_DIR", str(tmp_path))
+    config.get_client_config.cache_clear()
+    yield tmp_path
+    for path in tmp_path.iterdir():
+        if path.is_dir():
+            store.close_store(path.name)
+    config.get_client_config.cache_clear()
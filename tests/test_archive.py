@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Set
+from uuid import UUID
+
+import pytest
+from sqlmodel import select
+
+from backend.archive import _move
+from backend.db import engine, session_scope
+from backend.models import Bet, BetArchive, BetSortKey, ParlayLeg, ParlayLegArchive
+
+
+def _create(client, headers, **fields) -> dict:
+    data = {"event_date": "2025-01-01", "detail": "apuesta", "stake": 10, "odds": 2, **fields}
+    response = client.post("/bets", json=data, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+def archive(ids: Iterable[str]) -> None:
+    """Move the given bets to the archive, as ``invictos archive`` does.
+
+    Unlike :func:`archive_settled_bets` this skips ``ANALYZE``, whose
+    statistics would leak into the query-plan tests sharing the database.
+    """
+    with engine.begin() as connection:
+        _move(connection, [UUID(bet_id) for bet_id in ids], Bet, BetArchive, ParlayLeg, ParlayLegArchive)
+
+
+def _tiers(ids) -> Dict[str, Set[str]]:
+    ids = [UUID(bet_id) for bet_id in ids]
+    with session_scope() as session:
+        return {
+            model.__tablename__: {str(bet_id) for bet_id in session.exec(select(model.id).where(model.id.in_(ids)))}
+            for model in (Bet, BetArchive)
+        }
+
+
+@pytest.fixture
+def mixed(client, auth_headers) -> List[dict]:
+    """Eight bets, every other one archived, with tied stakes across the tiers."""
+    bets = []
+    for index in range(8):
+        bets.append(
+            _create(
+                client,
+                auth_headers,
+                event_date=f"2024-12-{10 + index}",
+                detail=f"b{index}",
+                stake=(10, 20, 30)[index % 3],
+                odds=2 + index / 10,
+                outcome=("pendiente", "acertada", "fallida", "acertada")[index % 4],
+            )
+        )
+    archive(bet["id"] for bet in bets[1::2])
+    return bets
+
+
+def _expected(bets: List[dict], sort: BetSortKey, desc: bool) -> List[str]:
+    if sort == BetSortKey.EVENT_DATE:
+        key = lambda bet: (bet["event_date"], bet["created_at"], UUID(bet["id"]))  # noqa: E731
+    else:
+        key = lambda bet: (bet[sort.value], UUID(bet["id"]))  # noqa: E731
+    return [bet["id"] for bet in sorted(bets, key=key, reverse=desc)]
+
+
+@pytest.mark.parametrize("sort", list(BetSortKey))
+@pytest.mark.parametrize("desc", [True, False])
+def test_listing_merges_both_tiers_in_order(client, auth_headers, mixed, sort: BetSortKey, desc: bool) -> None:
+    response = client.get("/bets", params={"sort": sort.value, "desc": desc}, headers=auth_headers)
+    listed = response.json()
+    assert [bet["id"] for bet in listed] == _expected(listed, sort, desc)
+    assert sorted(bet["id"] for bet in listed) == sorted(bet["id"] for bet in mixed)
+
+
+def test_listing_interleaves_the_tiers(client, auth_headers, mixed) -> None:
+    listed = client.get("/bets", params={"sort": "stake", "desc": False}, headers=auth_headers).json()
+    archived = _tiers(bet["id"] for bet in mixed)["bet_archive"]
+    tiers = [bet["id"] in archived for bet in listed]
+    # Not simply one tier appended to the other.
+    assert tiers != sorted(tiers) and tiers != sorted(tiers, reverse=True)
+
+
+def test_scalar_patch_restores_an_archived_bet(client, auth_headers, mixed) -> None:
+    target = mixed[1]
+    response = client.patch(f"/bets/{target['id']}", json={"outcome": "pendiente"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["outcome"] == "pendiente"
+    assert response.json()["updated_at"] > target["updated_at"]
+    assert target["id"] in _tiers([target["id"]])["bet"]
+
+    listed = client.get("/bets", headers=auth_headers).json()
+    assert [bet["id"] for bet in listed].count(target["id"]) == 1
+    assert client.get(f"/bets/{target['id']}", headers=auth_headers).json()["outcome"] == "pendiente"
+
+
+def test_leg_patch_restores_an_archived_parlay_with_its_legs(client, auth_headers) -> None:
+    parlay = _create(
+        client,
+        auth_headers,
+        type="parlay",
+        outcome="acertada",
+        legs=[{"detail": "uno", "odds": 1.5}, {"detail": "dos", "odds": 1.8}],
+    )
+    archive([parlay["id"]])
+    assert parlay["id"] in _tiers([parlay["id"]])["bet_archive"]
+
+    kept, dropped = parlay["legs"]
+    legs = [{"id": kept["id"], "detail": "uno", "odds": 1.6}, {"detail": "tres", "odds": 2.1}]
+    response = client.patch(f"/bets/{parlay['id']}", json={"legs": legs}, headers=auth_headers)
+    assert response.status_code == 200
+    assert parlay["id"] in _tiers([parlay["id"]])["bet"]
+    returned = {leg["detail"]: leg for leg in response.json()["legs"]}
+    assert sorted(returned) == ["tres", "uno"]
+    assert returned["uno"]["id"] == kept["id"] and returned["uno"]["odds"] == 1.6
+    assert dropped["id"] not in {leg["id"] for leg in returned.values()}
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import threading
+from uuid import uuid4
+
+from client.api import ApiClient
+from client.models import AuthResponse
+
+
+def _login(client) -> str:
+    credentials = {"email": f"{uuid4().hex}@example.com", "password": "secret123"}
+    client.post("/auth/register", json=credentials).raise_for_status()
+    response = client.post("/auth/login", json=credentials)
+    response.raise_for_status()
+    return response.json()["refresh_token"]
+
+
+def _refresh(client, token: str):
+    return client.post("/auth/refresh", json={"refresh_token": token})
+
+
+def test_reusing_a_rotated_refresh_token_revokes_the_family(client) -> None:
+    first = _login(client)
+    second = _refresh(client, first).json()["refresh_token"]
+
+    replay = _refresh(client, first)
+    assert replay.status_code == 401
+    assert replay.json()["detail"] == "Token de refresco reutilizado"
+    # The replay took the token that was handed out legitimately with it.
+    assert _refresh(client, second).status_code == 401
+
+
+def test_reuse_leaves_other_sessions_alone(client) -> None:
+    stolen = _login(client)
+    other = _login(client)
+    _refresh(client, stolen).raise_for_status()
+    assert _refresh(client, stolen).status_code == 401
+    assert _refresh(client, other).status_code == 200
+
+
+def test_only_one_of_two_concurrent_refreshes_succeeds(client) -> None:
+    token = _login(client)
+    barrier = threading.Barrier(2)
+    responses = []
+
+    def _race() -> None:
+        barrier.wait()
+        responses.append(_refresh(client, token))
+
+    threads = [threading.Thread(target=_race) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(response.status_code for response in responses) == [200, 401]
+    # The loser is indistinguishable from a replay, so the winner's token goes too.
+    winner = next(response for response in responses if response.status_code == 200)
+    assert _refresh(client, winner.json()["refresh_token"]).status_code == 401
+
+
+def _auth_data(suffix: str) -> dict:
+    user = {"id": "u", "email": "u@example.com", "created_at": "2025-01-01T00:00:00"}
+    return {"access_token": f"access-{suffix}", "refresh_token": f"refresh-{suffix}", "user": user}
+
+
+def test_logout_during_a_refresh_does_not_restore_the_session(client_cache, monkeypatch) -> None:
+    api = ApiClient()
+    api.set_auth(AuthResponse.from_dict(_auth_data("1")))
+    saved = []
+    api.on_auth_refreshed = saved.append
+    in_flight = threading.Event()
+    release = threading.Event()
+    sent = []
+
+    def _request(method, path, **kwargs):
+        sent.append((path, kwargs["json"]["refresh_token"]))
+        if path == "/auth/refresh":
+            in_flight.set()
+            release.wait(5)
+            return _auth_data("2")
+        return None
+
+    monkeypatch.setattr(api, "_request", _request)
+    refresher = threading.Thread(target=api.refresh)
+    refresher.start()
+    assert in_flight.wait(5)
+    logout = threading.Thread(target=api.logout)
+    logout.start()
+    logout.join(0.2)
+    assert logout.is_alive()  # waits for the rotation instead of racing it
+
+    release.set()
+    refresher.join(5)
+    logout.join(5)
+    assert api._auth is None and "Authorization" not in api.session.headers
+    assert [auth.refresh_token for auth in saved] == ["refresh-2"]
+    # The logout revoked the rotated token, not the one the refresh spent.
+    assert sent == [("/auth/refresh", "refresh-1"), ("/auth/logout", "refresh-2")]
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from sqlmodel import Session, func, select
+
+from backend import backup, crud
+from backend.backup import BackupError, backup_database
+from backend.db import engine, init_db
+from backend.models import Bet, BetCreate, UserCreate
+
+
+def test_backup_of_the_live_database_verifies(tmp_path) -> None:
+    init_db()
+    with Session(engine) as session:
+        user_id = crud.create_user(session, UserCreate(email="backup@example.com", password="secret123"), "x").id
+        for index in range(5):
+            crud.create_bet(session, BetCreate(event_date=date(2025, 1, 1), detail=f"copia {index}", stake=10, odds=2), user_id)
+        bets = session.exec(select(func.count()).select_from(Bet)).one()
+
+    report = backup_database(backup._database_path(engine), tmp_path / "live.db", pages_per_step=2, pause_ms=0, compress=True)
+
+    assert report.verified and report.integrity == "ok"
+    assert report.target.endswith(".db.gz")
+    assert report.table_rows["bet"] == bets
+    assert not (tmp_path / "live.db.partial").exists()
+
+
+@pytest.fixture
+def busy_source(tmp_path, monkeypatch):
+    """A database that another connection writes to during every pause between steps."""
+    source = tmp_path / "busy.db"
+    connection = sqlite3.connect(source)
+    connection.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, payload TEXT)")
+    connection.executemany("INSERT INTO t (payload) VALUES (?)", (("x" * 500,) for _ in range(400)))
+    connection.commit()
+    writer = sqlite3.connect(source)
+
+    def _write_during_pause(_seconds: float) -> None:
+        writer.execute("INSERT INTO t (payload) VALUES ('y')")
+        writer.commit()
+
+    monkeypatch.setattr(backup, "time", SimpleNamespace(perf_counter=time.perf_counter, sleep=_write_during_pause))
+    yield source, connection
+    writer.close()
+    connection.close()
+
+
+def test_restarts_escalate_to_larger_bounded_steps(busy_source, tmp_path) -> None:
+    source, _ = busy_source
+    report = backup_database(source, tmp_path / "out.db", pages_per_step=1, max_step_pages=4096)
+
+    assert report.escalations > 0 and report.restarts > 0
+    assert report.step_pages >= report.pages and not report.final_single_step
+    assert report.verified
+    assert report.table_rows["t"] >= 400
+
+
+def test_rollback_journal_gives_up_instead_of_copying_in_one_step(busy_source, tmp_path) -> None:
+    source, _ = busy_source
+    with pytest.raises(BackupError):
+        backup_database(source, tmp_path / "out.db", pages_per_step=1, max_step_pages=4)
+    assert not (tmp_path / "out.db").exists()
+    assert not (tmp_path / "out.db.partial").exists()
+
+
+def test_wal_database_finishes_in_one_step(busy_source, tmp_path) -> None:
+    source, connection = busy_source
+    connection.execute("PRAGMA journal_mode=WAL")
+    report = backup_database(source, tmp_path / "out.db", pages_per_step=1, max_step_pages=4)
+
+    assert report.final_single_step and report.step_pages == 4
+    assert report.verified
+    assert report.table_rows["t"] >= 400
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timezone
+from typing import List
+from uuid import UUID
+
+import pytest
+from sqlmodel import select
+
+from backend import crud
+from backend.db import engine, init_db
+from backend.models import Bet, BetArchive, BetFilter, BetOutcome, BetSortKey, BetType
+
+USER_ID = UUID(int=1)
+
+FILTERS = {
+    "none": BetFilter(),
+    "outcome": BetFilter(outcome=BetOutcome.WIN),
+    "type": BetFilter(type=BetType.PARLAY),
+    "range": BetFilter(start=date(2024, 1, 1), end=date(2024, 12, 31)),
+    "odds": BetFilter(min_odds=1.5, max_odds=3.0),
+    "stake": BetFilter(min_stake=5, max_stake=50),
+    "cashout": BetFilter(has_cashout=True),
+}
+
+SORT_INDEXES = {
+    BetSortKey.EVENT_DATE: "user_date",
+    BetSortKey.CREATED_AT: "user_created",
+    BetSortKey.UPDATED_AT: "user_updated",
+    BetSortKey.STAKE: "user_stake",
+    BetSortKey.ODDS: "user_odds",
+}
+
+# Both tiers are listed and merged, so the archive must be as well indexed.
+MODELS = pytest.mark.parametrize("model", [Bet, BetArchive], ids=["hot", "archive"])
+
+
+@pytest.fixture(scope="module", autouse=True)
+def schema() -> None:
+    # A fresh database, without ANALYZE statistics: the plans must not
+    # depend on them.
+    init_db()
+
+
+def _plan(statement) -> List[str]:
+    with engine.connect() as connection:
+        sql = str(statement.compile(connection, compile_kwargs={"literal_binds": True}))
+        return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def _list_plan(model, filters: BetFilter) -> List[str]:
+    statement = crud._apply_filter(select(model).where(model.user_id == USER_ID), filters, model)
+    return _plan(crud._apply_sort(statement, filters, model))
+
+
+def _bet_step(model, plan: List[str]) -> str:
+    return next(step for step in plan if step.split()[1] == model.__tablename__)
+
+
+@MODELS
+@pytest.mark.parametrize("name", FILTERS)
+@pytest.mark.parametrize("sort", list(BetSortKey))
+@pytest.mark.parametrize("desc", [True, False])
+def test_every_combination_seeks_a_user_index_without_sorting(model, name: str, sort: BetSortKey, desc: bool) -> None:
+    table = model.__tablename__
+    filters = FILTERS[name].model_copy(update={"sort": sort, "desc": desc})
+    plan = _list_plan(model, filters)
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+    assert _bet_step(model, plan).startswith(f"SEARCH {table} USING INDEX ix_{table}_user_"), plan
+
+
+@MODELS
+@pytest.mark.parametrize("sort", list(BetSortKey))
+@pytest.mark.parametrize("desc", [True, False])
+def test_sort_uses_its_index(model, sort: BetSortKey, desc: bool) -> None:
+    table = model.__tablename__
+    plan = _list_plan(model, BetFilter(sort=sort, desc=desc))
+    assert _bet_step(model, plan) == f"SEARCH {table} USING INDEX ix_{table}_{SORT_INDEXES[sort]} (user_id=?)"
+
+
+@MODELS
+@pytest.mark.parametrize(
+    "filters, step",
+    [
+        (FILTERS["outcome"], "USING INDEX ix_{table}_user_outcome_date (user_id=? AND outcome=?)"),
+        (FILTERS["type"], "USING INDEX ix_{table}_user_type_date (user_id=? AND type=?)"),
+        (FILTERS["range"], "USING INDEX ix_{table}_user_date (user_id=? AND event_date>? AND event_date<?)"),
+    ],
+)
+def test_default_sort_filters_seek_their_index(model, filters: BetFilter, step: str) -> None:
+    table = model.__tablename__
+    assert _bet_step(model, _list_plan(model, filters)) == f"SEARCH {table} " + step.format(table=table)
+
+
+@MODELS
+@pytest.mark.parametrize("sort", list(BetSortKey))
+def test_sparse_fieldset_plan_matches(model, sort: BetSortKey) -> None:
+    table = model.__tablename__
+    filters = BetFilter(sort=sort)
+    keys = crud.sort_columns(filters)
+    statement = select(*crud._columns(model, ("id", "stake"), keys)).where(model.user_id == USER_ID)
+    plan = _plan(crud._apply_sort(crud._apply_filter(statement, filters, model), filters, model))
+    assert plan in (
+        [f"SEARCH {table} USING INDEX ix_{table}_{SORT_INDEXES[sort]} (user_id=?)"],
+        [f"SEARCH {table} USING COVERING INDEX ix_{table}_{SORT_INDEXES[sort]} (user_id=?)"],
+    )
+
+
+@MODELS
+def test_sync_page_reads_in_index_order(model) -> None:
+    table = model.__tablename__
+    now = datetime.now(timezone.utc)
+    columns = crud._columns(model, ("id", "stake"), ("updated_at", "id"))
+    statement = crud._sync_statement(select(*columns).where(model.user_id == USER_ID), model, now, (now, UUID(int=2)), 500)
+    plan = _plan(statement)
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+    assert _bet_step(model, plan).startswith(f"SEARCH {table} USING INDEX ix_{table}_user_updated (user_id=?"), plan
+
+
+def test_init_drops_indexes_the_models_no_longer_declare() -> None:
+    stale = {
+        "ix_bet_id": "bet (id)",
+        "ix_bet_user_id": "bet (user_id)",
+        "ix_bet_event_date": "bet (event_date)",
+        "ix_bet_updated_at": "bet (updated_at)",
+        "ix_bet_archive_user_id": "bet_archive (user_id)",
+    }
+    with engine.begin() as connection:
+        for name, target in stale.items():
+            connection.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+    init_db()
+    with engine.connect() as connection:
+        indexes = set(connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").scalars())
+    assert not indexes & set(stale)
+    assert {"ix_bet_user_date", "ix_bet_archive_user_odds", "ix_parlayleg_bet_id"} <= indexes
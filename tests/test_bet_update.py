@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from typing import List
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event
+
+from backend import crud
+from backend.db import engine
+from tests.test_archive import _create
+
+LEGS = [{"detail": "uno", "odds": 1.5}, {"detail": "dos", "odds": 1.8}, {"detail": "tres", "odds": 2.2}]
+
+
+@pytest.fixture
+def statements():
+    """SQL statements the bet engine runs while the test is inside the block."""
+    seen: List[str] = []
+
+    def _record(_conn, _cursor, statement, _params, _context, _many) -> None:
+        seen.append(statement.split(None, 1)[0].upper())
+
+    event.listen(engine, "before_cursor_execute", _record)
+    yield seen
+    event.remove(engine, "before_cursor_execute", _record)
+
+
+def test_scalar_patch_is_one_update_returning(client, auth_headers, statements) -> None:
+    bet = _create(client, auth_headers)
+    statements.clear()
+    response = client.patch(f"/bets/{bet['id']}", json={"stake": 25, "cashout": 40}, headers=auth_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["stake"], body["cashout"], body["legs"]) == (25, 40, [])
+    assert body["updated_at"] > bet["updated_at"]
+    # The user lookup for the token, then the bet write alone: no leg query
+    # for a single bet, no refresh after the commit.
+    assert statements.count("UPDATE") == 1
+    assert statements.count("SELECT") == 1
+
+
+def test_scalar_patch_of_a_parlay_returns_its_legs(client, auth_headers, monkeypatch) -> None:
+    parlay = _create(client, auth_headers, type="parlay", legs=LEGS)
+    called = []
+    monkeypatch.setattr(crud, "update_bet", lambda *args: called.append(args))
+
+    response = client.patch(
+        f"/bets/{parlay['id']}", json={"outcome": "acertada", "detail": "combinada"}, headers=auth_headers
+    )
+    assert response.status_code == 200 and not called
+    body = response.json()
+    assert (body["outcome"], body["detail"]) == ("acertada", "combinada")
+    assert body["legs"] == parlay["legs"]
+    assert client.get(f"/bets/{parlay['id']}", headers=auth_headers).json() == body
+
+
+def test_leg_patch_adds_removes_and_edits_in_place(client, auth_headers) -> None:
+    parlay = _create(client, auth_headers, type="parlay", legs=LEGS)
+    first, second, _third = parlay["legs"]
+    legs = [
+        {"id": first["id"], "detail": "uno", "odds": 1.5},  # unchanged
+        {"id": second["id"], "detail": "dos editada", "odds": 1.9},  # edited
+        {"detail": "cuatro", "odds": 3.0},  # new; "tres" is dropped
+    ]
+    response = client.patch(f"/bets/{parlay['id']}", json={"legs": legs, "stake": 15}, headers=auth_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["stake"] == 15
+    by_detail = {leg["detail"]: leg for leg in body["legs"]}
+    assert sorted(by_detail) == ["cuatro", "dos editada", "uno"]
+    assert by_detail["uno"] == first
+    assert by_detail["dos editada"]["id"] == second["id"] and by_detail["dos editada"]["odds"] == 1.9
+    assert by_detail["cuatro"]["id"] not in {leg["id"] for leg in parlay["legs"]}
+    assert client.get(f"/bets/{parlay['id']}", headers=auth_headers).json()["legs"] == body["legs"]
+
+
+def test_legs_on_a_single_bet_are_ignored(client, auth_headers) -> None:
+    bet = _create(client, auth_headers)
+    response = client.patch(f"/bets/{bet['id']}", json={"legs": LEGS}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["legs"] == []
+
+
+@pytest.mark.parametrize("payload", [{"stake": 12}, {"legs": LEGS}], ids=["scalar", "legs"])
+def test_patch_of_a_missing_bet_is_404(client, auth_headers, payload) -> None:
+    response = client.patch(f"/bets/{uuid4()}", json=payload, headers=auth_headers)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Apuesta no encontrada"
+
+
+@pytest.mark.parametrize("payload", [{"stake": 12}, {"legs": LEGS}], ids=["scalar", "legs"])
+def test_patch_of_another_users_bet_is_404(client, auth_headers, payload) -> None:
+    other = client.post("/auth/register", json={"email": f"{uuid4().hex}@example.com", "password": "secret123"})
+    owner = {"Authorization": f"Bearer {other.json()['access_token']}"}
+    foreign = _create(client, owner, type="parlay", legs=LEGS)
+    response = client.patch(f"/bets/{foreign['id']}", json=payload, headers=auth_headers)
+    assert response.status_code == 404
+    assert client.get(f"/bets/{foreign['id']}", headers=owner).json() == foreign
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from typing import Dict, List
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import func
+from sqlmodel import select
+
+from backend.db import session_scope
+from backend.models import ParlayLeg, ParlayLegArchive
+from tests.test_archive import _create, _tiers, archive
+
+LEGS = [{"detail": "uno", "odds": 1.5}, {"detail": "dos", "odds": 1.8}]
+
+# name: (event_date, type, outcome, archived)
+BETS = {
+    "s1": ("2025-01-05", "single", "pendiente", False),
+    "s2": ("2025-02-10", "single", "acertada", True),
+    "s3": ("2024-12-31", "single", "fallida", False),
+    "p1": ("2025-01-20", "parlay", "fallida", True),
+    "p2": ("2025-02-15", "parlay", "pendiente", False),
+}
+
+
+@pytest.fixture
+def bets(client, auth_headers) -> Dict[str, dict]:
+    created = {}
+    for name, (event_date, bet_type, outcome, _archived) in BETS.items():
+        legs = LEGS if bet_type == "parlay" else []
+        created[name] = _create(
+            client, auth_headers, detail=name, event_date=event_date, type=bet_type, outcome=outcome, legs=legs
+        )
+    archive(created[name]["id"] for name, spec in BETS.items() if spec[3])
+    return created
+
+
+def _names(bets: Dict[str, dict], ids: List[str]) -> List[str]:
+    by_id = {bet["id"]: name for name, bet in bets.items()}
+    return sorted(by_id[bet_id] for bet_id in ids)
+
+
+def _leg_rows(bet_ids: List[str]) -> int:
+    ids = [UUID(bet_id) for bet_id in bet_ids]
+    with session_scope() as session:
+        return sum(
+            session.exec(select(func.count()).select_from(model).where(model.bet_id.in_(ids))).one()
+            for model in (ParlayLeg, ParlayLegArchive)
+        )
+
+
+WHERE = [
+    pytest.param({"type": "parlay"}, ["p1", "p2"], id="type"),
+    pytest.param({"start": "2025-01-01", "end": "2025-01-31"}, ["p1", "s1"], id="range"),
+    pytest.param({"outcome": "fallida", "type": "single"}, ["s3"], id="outcome+type"),
+    pytest.param({"start": "2025-02-01", "outcome": "acertada"}, ["s2"], id="start+outcome"),
+    pytest.param({"ids": ["s1", "s2", "p2"], "outcome": "pendiente"}, ["p2", "s1"], id="ids+outcome"),
+]
+
+
+def _where(bets: Dict[str, dict], where: dict) -> dict:
+    if "ids" in where:
+        return {**where, "ids": [bets[name]["id"] for name in where["ids"]]}
+    return where
+
+
+@pytest.mark.parametrize("where, expected", WHERE)
+def test_bulk_update_touches_exactly_the_matching_bets(client, auth_headers, bets, where, expected) -> None:
+    payload = {"where": _where(bets, where), "cashout": 5}
+    response = client.post("/bets/bulk-update", json=payload, headers=auth_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["affected"] == len(expected) and _names(bets, body["ids"]) == expected
+
+    for name, bet in bets.items():
+        current = client.get(f"/bets/{bet['id']}", headers=auth_headers).json()
+        if name in expected:
+            assert current["cashout"] == 5 and current["updated_at"] > bet["updated_at"]
+        else:
+            assert current == bet
+
+
+def test_bulk_update_restores_archived_matches_first(client, auth_headers, bets) -> None:
+    where = {"start": "2025-01-01"}
+    response = client.post("/bets/bulk-update", json={"where": where, "outcome": "pendiente"}, headers=auth_headers)
+    assert _names(bets, response.json()["ids"]) == ["p1", "p2", "s1", "s2"]
+    tiers = _tiers(bet["id"] for bet in bets.values())
+    # The archive holds settled bets only: s2 and p1 are back in the hot table, legs and all.
+    assert tiers["bet_archive"] == set()
+    assert tiers["bet"] == {bet["id"] for bet in bets.values()}
+    restored = client.get(f"/bets/{bets['p1']['id']}", headers=auth_headers).json()
+    assert restored["outcome"] == "pendiente" and restored["legs"] == bets["p1"]["legs"]
+    with session_scope() as session:
+        hot_legs = session.exec(select(ParlayLeg.id).where(ParlayLeg.bet_id == UUID(bets["p1"]["id"]))).all()
+    assert len(hot_legs) == 2
+
+
+@pytest.mark.parametrize("where, expected", WHERE)
+def test_bulk_delete_removes_the_matching_bets_and_their_legs(client, auth_headers, bets, where, expected) -> None:
+    response = client.post("/bets/bulk-delete", json=_where(bets, where), headers=auth_headers)
+    assert response.status_code == 200
+    assert _names(bets, response.json()["ids"]) == expected
+
+    deleted = [bets[name]["id"] for name in expected]
+    assert _leg_rows(deleted) == 0
+    for name, bet in bets.items():
+        status = client.get(f"/bets/{bet['id']}", headers=auth_headers).status_code
+        assert status == (404 if name in expected else 200)
+    kept = [bet["id"] for name, bet in bets.items() if name not in expected and BETS[name][1] == "parlay"]
+    assert _leg_rows(kept) == 2 * len(kept)
+
+
+def test_bulk_operations_stay_within_the_account(client, auth_headers, bets) -> None:
+    other = client.post("/auth/register", json={"email": f"{uuid4().hex}@example.com", "password": "secret123"})
+    other_headers = {"Authorization": f"Bearer {other.json()['access_token']}"}
+    where = {"ids": [bet["id"] for bet in bets.values()]}
+    assert client.post("/bets/bulk-delete", json=where, headers=other_headers).json() == {"affected": 0, "ids": []}
+    assert client.get(f"/bets/{bets['s1']['id']}", headers=auth_headers).status_code == 200
+
+
+@pytest.mark.parametrize(
+    "path, payload",
+    [
+        ("/bets/bulk-update", {"where": {}, "outcome": "acertada"}),
+        ("/bets/bulk-delete", {}),
+    ],
+    ids=["update", "delete"],
+)
+def test_empty_where_is_rejected(client, auth_headers, bets, path: str, payload: dict) -> None:
+    response = client.post(path, json=payload, headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Indica al menos un criterio"
+    assert len(client.get("/bets", headers=auth_headers).json()) == len(bets)
+
+
+def test_bulk_update_needs_something_to_set(client, auth_headers, bets) -> None:
+    response = client.post("/bets/bulk-update", json={"where": {"type": "single"}}, headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Nada que actualizar"
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import pytest
+
+from client.journal import JournalEntry
+from client.sync import PendingOperation, coalesce_operations
+
+CREATE = ("create", {"id": "x", "detail": "nueva", "stake": 10})
+UPDATE_OUTCOME = ("update", {"bet_id": "x", "data": {"outcome": "acertada"}})
+UPDATE_STAKE = ("update", {"bet_id": "x", "data": {"stake": 20}})
+DELETE = ("delete", {"bet_id": "x"})
+
+
+def _entries(ops):
+    return [
+        JournalEntry(seq, PendingOperation(kind, payload.get("bet_id") or payload["id"], payload, "").to_dict())
+        for seq, (kind, payload) in enumerate(ops, start=1)
+    ]
+
+
+@pytest.mark.parametrize(
+    "ops, expected, dropped",
+    [
+        pytest.param(
+            [CREATE, UPDATE_OUTCOME, UPDATE_STAKE],
+            [("create", {"id": "x", "detail": "nueva", "stake": 20, "outcome": "acertada"}, [1, 2, 3])],
+            [],
+            id="create+update->create",
+        ),
+        pytest.param(
+            [UPDATE_OUTCOME, UPDATE_STAKE],
+            [("update", {"bet_id": "x", "data": {"outcome": "acertada", "stake": 20}}, [1, 2])],
+            [],
+            id="update+update->update",
+        ),
+        pytest.param(
+            [UPDATE_OUTCOME, DELETE],
+            [("delete", {"bet_id": "x"}, [1, 2])],
+            [],
+            id="update+delete->delete",
+        ),
+        pytest.param([CREATE, UPDATE_OUTCOME, DELETE], [], [1, 2, 3], id="create+delete->dropped"),
+        pytest.param(
+            [DELETE, CREATE, UPDATE_STAKE],
+            [
+                ("delete", {"bet_id": "x"}, [1]),
+                ("create", {"id": "x", "detail": "nueva", "stake": 20}, [2, 3]),
+            ],
+            [],
+            id="delete+create->both",
+        ),
+    ],
+)
+def test_coalesce(ops, expected, dropped) -> None:
+    merged, cancelled = coalesce_operations(_entries(ops))
+    assert [(item.op.kind, item.op.payload, item.seqs) for item in merged] == expected
+    assert cancelled == dropped
+
+
+def test_bets_keep_their_own_chains_in_queue_order() -> None:
+    other = ("update", {"bet_id": "y", "data": {"detail": "otra"}})
+    merged, _ = coalesce_operations(_entries([UPDATE_OUTCOME, other, UPDATE_STAKE]))
+    assert [(item.op.payload["bet_id"], item.seqs) for item in merged] == [("x", [1, 3]), ("y", [2])]
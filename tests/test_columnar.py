@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import random
+from datetime import date, timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from client.columnar import BetColumns  # noqa: E402
+from client.state import AppState  # noqa: E402
+from tests.test_state import START, _assert_metrics, _edit, _month, _random_bet, _random_history  # noqa: E402
+
+
+def _assert_rows_match(columns: BetColumns, bets: dict) -> None:
+    assert sorted(columns.ids) == sorted(bets)
+    assert all(columns.ids[row] == bet_id for bet_id, row in columns.rows.items())
+    expected = np.array([bets[bet_id].gross_return() for bet_id in columns.ids])
+    np.testing.assert_allclose(columns.gross_returns(), expected)
+    np.testing.assert_array_equal(columns.column("stake"), [bets[bet_id].stake for bet_id in columns.ids])
+    np.testing.assert_array_equal(
+        columns.column("day"), [bets[bet_id].event_date.toordinal() for bet_id in columns.ids]
+    )
+
+
+def test_columns_follow_upserts_and_swap_removes() -> None:
+    rng = random.Random(7)
+    columns = BetColumns()
+    bets = {}
+    for index in range(3000):  # grows past the initial capacity
+        if bets and rng.random() < 0.35:
+            bet_id = rng.choice(sorted(bets))
+            columns.remove(bet_id)
+            del bets[bet_id]
+        else:
+            if bets and rng.random() < 0.3:
+                bet = _edit(rng, bets[rng.choice(sorted(bets))])
+            else:
+                bet = _random_bet(rng, f"c{index:05d}")
+            columns.upsert(bet)
+            bets[bet.id] = bet
+    columns.remove("missing")
+    _assert_rows_match(columns, bets)
+
+    everything = list(bets.values())
+    _assert_metrics(columns.metrics(), everything)
+    start, end = START + timedelta(days=10), START + timedelta(days=40)
+    _assert_metrics(
+        columns.metrics(start, end, "parlay"),
+        [bet for bet in everything if start <= bet.event_date < end and bet.type == "parlay"],
+    )
+    _assert_metrics(columns.metrics(bet_type="teaser"), [])
+    for day, summary in columns.metrics_by_day().items():
+        _assert_metrics(summary, [bet for bet in everything if bet.event_date == day])
+    months = columns.metrics_by_month()
+    assert set(months) == {_month(bet.event_date) for bet in everything}
+    for month, summary in months.items():
+        _assert_metrics(summary, [bet for bet in everything if _month(bet.event_date) == month])
+
+
+@pytest.mark.parametrize("seed", range(2))
+def test_columnar_state_agrees_with_the_plain_state(seed: int) -> None:
+    for step, (plain, model) in enumerate(_random_history(seed, steps=1500)):
+        if step == 0:
+            columnar = AppState(columnar=True)
+            assert columnar.columns is not None
+        # Rebuild now and then: replace_all is where the vectorized metrics come in.
+        if step % 50 == 0:
+            columnar.replace_all(plain.bets.values())
+        else:
+            for bet_id in set(columnar.bets) - set(model):
+                columnar.remove(bet_id)
+            for bet in model.values():
+                if columnar.bets.get(bet.id) is not bet:
+                    columnar.upsert(bet)
+        if step % 10:
+            continue
+        _assert_rows_match(columnar.columns, model)
+        bets = list(model.values())
+        for day in {bet.event_date for bet in bets} | {date(2000, 1, 1)}:
+            _assert_metrics(columnar.daily_metrics(day), [bet for bet in bets if bet.event_date == day])
+        for month in {_month(bet.event_date) for bet in bets}:
+            _assert_metrics(columnar.month_metrics(month), [bet for bet in bets if _month(bet.event_date) == month])
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import pytest
+
+from backend.stress import run_stress
+
+
+@pytest.mark.parametrize("config", ["default", "wal", "sharded-wal"])
+def test_concurrent_writers_lose_nothing(config: str) -> None:
+    """A small ``invictos stress`` run: two server processes, eight writer threads."""
+    result = run_stress(config=config, workers=8, users=2, ops_per_worker=30, shared_bets=2, server_workers=2)
+
+    assert result.hung_workers == 0
+    assert result.timeouts == 0
+    assert result.locked_errors == 0
+    assert not result.status_errors, dict(result.status_errors)
+    assert result.lost_updates == 0
+    assert result.missing_bets == 0
+    assert result.resurrected_bets == 0
+    assert result.shared_mismatches == 0
+    assert result.ops >= 8 * 30
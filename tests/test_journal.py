@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from client import journal as journal_module
+from client.journal import PendingJournal
+
+
+def _open(tmp_path) -> PendingJournal:
+    return PendingJournal(tmp_path / "pending.jsonl", tmp_path / "pending.marker")
+
+
+def _ops(journal: PendingJournal) -> list:
+    return [entry.op["n"] for entry in journal.pending()]
+
+
+def test_reopen_after_a_torn_write_keeps_complete_ops(tmp_path) -> None:
+    journal = _open(tmp_path)
+    for n in range(3):
+        journal.append({"n": n})
+    with open(journal.path, "ab") as handle:
+        handle.write(b'{"seq":4,"op":{"n":')  # crash mid-append
+
+    reopened = _open(tmp_path)
+    assert _ops(reopened) == [0, 1, 2]
+    seq = reopened.append({"n": 3})
+    assert seq == 4
+    assert _ops(_open(tmp_path)) == [0, 1, 2, 3]
+
+
+def test_acknowledged_ops_stay_gone_across_reopen(tmp_path) -> None:
+    journal = _open(tmp_path)
+    seqs = [journal.append({"n": n}) for n in range(5)]
+    # Out of order: 1 and 3 finish before 0 does.
+    journal.acknowledge([seqs[1], seqs[3]])
+    assert _ops(_open(tmp_path)) == [0, 2, 4]
+
+    journal.acknowledge([seqs[0]])
+    reopened = _open(tmp_path)
+    assert _ops(reopened) == [2, 4]
+    assert reopened.append({"n": 5}) == seqs[-1] + 1
+
+
+def test_compaction_keeps_unacknowledged_ops(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(journal_module, "COMPACT_BYTES", 200)
+    journal = _open(tmp_path)
+    seqs = [journal.append({"n": n, "pad": "x" * 40}) for n in range(10)]
+    before = journal.path.stat().st_size
+
+    journal.acknowledge(seqs[1:8])
+    assert journal.path.stat().st_size < before  # rewritten without the acked lines
+    assert _ops(journal) == [0, 8, 9]
+    assert _ops(_open(tmp_path)) == [0, 8, 9]
+
+    journal.acknowledge([seqs[0], seqs[8], seqs[9]])
+    assert journal.path.stat().st_size == 0
+    assert _ops(_open(tmp_path)) == []
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from backend.main import app
+
+
+def _resolve(spec: dict, ref: str):
+    node = spec
+    for part in ref.lstrip("#/").split("/"):
+        node = node[part]
+    return node
+
+
+def _refs(node):
+    if isinstance(node, dict):
+        if "$ref" in node:
+            yield node["$ref"]
+        for value in node.values():
+            yield from _refs(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _refs(value)
+
+
+def test_list_bets_documents_both_shapes() -> None:
+    spec = app.openapi()
+    schema = spec["paths"]["/bets"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    full, sparse = schema["oneOf"]
+    assert full["items"] == {"$ref": "#/components/schemas/BetRead"}
+    assert sparse["items"]["required"] == ["id"]
+    for ref in _refs(schema):
+        assert _resolve(spec, ref)
+
+
+def test_sync_documents_both_shapes() -> None:
+    spec = app.openapi()
+    schema = spec["paths"]["/sync"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    full, sparse = schema["oneOf"]
+    assert full["properties"]["items"]["items"] == {"$ref": "#/components/schemas/BetRead"}
+    assert sparse["properties"]["items"]["items"]["required"] == ["id"]
+    assert set(full["properties"]) == set(sparse["properties"]) == {"last_sync", "items", "next_cursor", "has_more"}
+    for ref in _refs(schema):
+        assert _resolve(spec, ref)
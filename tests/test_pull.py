@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from client import cache
+from client.api import SYNC_OVERLAP, ApiClient, ApiConnectionError
+from client.state import AppState
+from client.sync import pull_changes
+from tests.test_replay import _bet
+
+T0 = datetime(2025, 3, 1, 12, tzinfo=timezone.utc)
+LAST_SYNC = T0 + timedelta(minutes=10)
+NEXT_SYNC = T0 + timedelta(minutes=20)
+
+
+def _stamped(bet_id: str, minutes: float, **changes):
+    return _bet(bet_id, updated_at=(T0 + timedelta(minutes=minutes)).isoformat(), **changes)
+
+
+class PagedApi(ApiClient):
+    """An ApiClient whose ``/sync`` answers with canned pages."""
+
+    def __init__(self, pages, fail_on_page=None) -> None:
+        super().__init__()
+        self.pages = pages
+        self.fail_on_page = fail_on_page
+        self.calls = []
+
+    def sync(self, since, limit=None, cursor=None) -> dict:
+        index = int(cursor or 0)
+        self.calls.append((since, cursor))
+        if index == self.fail_on_page:
+            raise ApiConnectionError("sin red")
+        more = index + 1 < len(self.pages)
+        return {
+            "items": [bet.to_dict() for bet in self.pages[index]],
+            "last_sync": NEXT_SYNC.isoformat(),
+            "next_cursor": str(index + 1) if more else None,
+            "has_more": more,
+        }
+
+
+@pytest.fixture
+def local(client_cache):
+    user_id = "pull-user"
+    bets = [
+        _stamped("a", 0, detail="a vieja"),
+        _stamped("b", 9, detail="b editada aca"),  # edited here after the server's copy
+        _stamped("d", 8),
+    ]
+    state = AppState(bets)
+    state.last_sync = LAST_SYNC
+    cache.save_cached_bets(bets, user_id)
+    cache.save_last_sync(LAST_SYNC, user_id)
+    return user_id, state
+
+
+def test_delta_pages_merge_last_writer_wins(local) -> None:
+    user_id, state = local
+    api = PagedApi(
+        [
+            [_stamped("a", 12, detail="a del server"), _stamped("b", 7, detail="b del server")],
+            # The overlap re-reads d unchanged; c is new.
+            [_stamped("d", 8), _stamped("c", 11)],
+        ]
+    )
+
+    assert pull_changes(api, state, user_id) == 2
+    assert api.calls == [(LAST_SYNC - SYNC_OVERLAP, None), (LAST_SYNC - SYNC_OVERLAP, "1")]
+    assert {bet_id: bet.detail for bet_id, bet in state.bets.items()} == {
+        "a": "a del server",
+        "b": "b editada aca",
+        "c": "c",
+        "d": "d",
+    }
+    assert state.last_sync == NEXT_SYNC
+    stored = {bet.id: bet.detail for bet in cache.load_cached_bets(user_id)}
+    assert stored == {bet_id: bet.detail for bet_id, bet in state.bets.items()}
+    assert cache.load_last_sync(user_id) == NEXT_SYNC
+
+
+def test_interrupted_pull_keeps_applied_pages_but_not_the_stamp(local) -> None:
+    user_id, state = local
+    api = PagedApi([[_stamped("a", 12, detail="a del server")], [_stamped("c", 11)]], fail_on_page=1)
+
+    with pytest.raises(ApiConnectionError):
+        pull_changes(api, state, user_id)
+    assert state.bets["a"].detail == "a del server"
+    assert "c" not in state.bets
+    assert state.last_sync == LAST_SYNC
+    assert cache.load_last_sync(user_id) == LAST_SYNC
+
+
+def test_full_download_drops_bets_the_server_no_longer_has(local) -> None:
+    user_id, state = local
+    api = PagedApi([[_stamped("a", 12, detail="a del server")], [_stamped("c", 11)]])
+
+    assert pull_changes(api, state, user_id, full=True) == 2
+    assert api.calls[0] == (None, None)
+    assert sorted(state.bets) == ["a", "c"]
+    assert sorted(bet.id for bet in cache.load_cached_bets(user_id)) == ["a", "c"]
+    assert cache.load_last_sync(user_id) == NEXT_SYNC
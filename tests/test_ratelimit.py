@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import anyio
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from backend import db, ratelimit
+from backend.main import app
+from backend.ratelimit import READ, BucketSpec, TokenBucketLimiter
+
+ORIGIN = "http://localhost:3000"
+
+
+def test_refused_request_is_not_charged_to_other_buckets() -> None:
+    limiter = TokenBucketLimiter({READ: BucketSpec(rate=0.001, burst=2)})
+    assert limiter.acquire(READ, "ip:a") == 0
+    assert limiter.acquire(READ, "ip:a") == 0
+    # The IP bucket is empty: the user's bucket must keep both its tokens.
+    assert limiter.acquire_all(READ, [("user:1", 1.0), ("ip:a", 1.0)]) > 0
+    assert limiter.acquire_all(READ, [("user:1", 1.0), ("ip:a", 1.0)]) > 0
+    assert limiter.acquire(READ, "user:1") == 0
+    assert limiter.acquire(READ, "user:1") == 0
+    assert limiter.acquire(READ, "user:1") > 0
+
+
+@pytest.fixture
+def limited(monkeypatch):
+    monkeypatch.setattr(ratelimit.settings, "rate_limit_enabled", True)
+    monkeypatch.setattr(ratelimit.settings, "rate_limit_ip_multiplier", 1.0)
+    monkeypatch.setattr(ratelimit, "limiter", TokenBucketLimiter({READ: BucketSpec(rate=0.001, burst=1)}))
+    with TestClient(app) as client:
+        yield client
+
+
+def test_rejections_carry_cors_headers(limited: TestClient) -> None:
+    first = limited.get("/bets", headers={"Origin": ORIGIN})
+    assert first.status_code != 429
+    assert first.headers["access-control-allow-origin"] == ORIGIN
+
+    refused = limited.get("/bets", headers={"Origin": ORIGIN})
+    assert refused.status_code == 429
+    assert refused.headers["access-control-allow-origin"] == ORIGIN
+    assert int(refused.headers["retry-after"]) >= 1
+
+
+def test_shed_responses_carry_cors_headers(limited: TestClient, monkeypatch) -> None:
+    monkeypatch.setattr(ratelimit, "current_pressure", lambda: 1.0)
+    refused = limited.get("/bets", headers={"Origin": ORIGIN})
+    assert refused.status_code == 503
+    assert refused.headers["access-control-allow-origin"] == ORIGIN
+
+
+def _pressure() -> float:
+    async def _read() -> float:
+        return ratelimit.current_pressure()
+
+    return anyio.run(_read)
+
+
+def test_pressure_counts_shard_pools(tmp_path, monkeypatch) -> None:
+    path = tmp_path / "user-shard.db"
+    shard = create_engine(f"sqlite:///{path}", poolclass=QueuePool, pool_size=2, max_overflow=0)
+    monkeypatch.setitem(db._shard_engines, path, shard)
+    assert _pressure() < 0.5
+    with shard.connect():
+        assert _pressure() == 0.5
+        with shard.connect():
+            assert _pressure() == 1.0
+    shard.dispose()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import threading
+from datetime import date
+from uuid import uuid4
+
+from client import cache
+from client.api import ApiClientError
+from client.models import Bet
+from client.state import AppState
+from client.sync import enqueue_operation, flush_pending
+
+
+def _bet(bet_id: str, **changes) -> Bet:
+    data = {
+        "id": bet_id,
+        "user_id": "u",
+        "event_date": date(2025, 1, 1).isoformat(),
+        "detail": bet_id,
+        "stake": 10,
+        "odds": 2,
+        "outcome": "pendiente",
+    }
+    return Bet.from_dict({**data, **changes})
+
+
+class FakeApi:
+    """Stands in for ApiClient, failing the ``(kind, bet_id)`` requests in ``failing``."""
+
+    def __init__(self, failing=()) -> None:
+        self.failing = set(failing)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def _record(self, call: tuple) -> None:
+        with self.lock:
+            self.calls.append(call)
+        if call[:2] in self.failing:
+            raise ApiClientError(f"rechazada {call[1]}")
+
+    def create_bet(self, bet: Bet) -> Bet:
+        self._record(("create", bet.id, bet.detail))
+        return bet
+
+    def update_bet(self, bet_id: str, data: dict) -> Bet:
+        self._record(("update", bet_id, data))
+        return _bet(bet_id, **data)
+
+    def delete_bet(self, bet_id: str) -> None:
+        self._record(("delete", bet_id))
+
+
+def test_flush_acknowledges_exactly_the_requests_that_succeeded(client_cache) -> None:
+    user_id = uuid4().hex
+    queue = [
+        # "a": three edits, one request.
+        ("update", {"bet_id": "a", "data": {"outcome": "acertada"}}),
+        ("update", {"bet_id": "a", "data": {"cashout": 15.0}}),
+        ("update", {"bet_id": "a", "data": {"detail": "a editada"}}),
+        # "b": deleted, then created again and edited: a chain of two requests.
+        ("update", {"bet_id": "b", "data": {"outcome": "fallida"}}),
+        ("delete", {"bet_id": "b"}),
+        ("create", _bet("b").to_dict()),
+        ("update", {"bet_id": "b", "data": {"detail": "b nueva"}}),
+        # "c": the same shape, but the server rejects the create.
+        ("delete", {"bet_id": "c"}),
+        ("create", _bet("c").to_dict()),
+        ("update", {"bet_id": "c", "data": {"detail": "c nueva"}}),
+        # "e": the delete is rejected, so the create behind it is never sent.
+        ("delete", {"bet_id": "e"}),
+        ("create", _bet("e").to_dict()),
+        # "d": created and deleted offline, never sent.
+        ("create", _bet("d").to_dict()),
+        ("delete", {"bet_id": "d"}),
+    ]
+    for kind, payload in queue:
+        bet = Bet.from_dict(payload) if kind == "create" else None
+        enqueue_operation(kind, bet, payload, user_id)
+    seqs = [entry.seq for entry in cache.load_pending_queue(user_id)]
+
+    api = FakeApi(failing={("create", "c"), ("delete", "e")})
+    state = AppState([_bet("a"), _bet("b"), _bet("c"), _bet("e")])
+    result = flush_pending(api, state, user_id, workers=3)
+
+    assert result.applied == 4  # a's update, b's delete and create, c's delete
+    assert set(result.failed) == {"c", "e"}
+    assert result.skipped == 1
+    # c's delete went through; its create, with the update folded in, stays
+    # queued, and so does all of e.
+    assert [entry.seq for entry in cache.load_pending_queue(user_id)] == seqs[8:12]
+
+    by_bet = {}
+    for call in api.calls:
+        by_bet.setdefault(call[1], []).append(call)
+    assert by_bet["a"] == [("update", "a", {"outcome": "acertada", "cashout": 15.0, "detail": "a editada"})]
+    assert by_bet["b"] == [("delete", "b"), ("create", "b", "b nueva")]
+    assert by_bet["c"] == [("delete", "c"), ("create", "c", "c nueva")]
+    assert by_bet["e"] == [("delete", "e")]
+    assert "d" not in by_bet
+
+    assert state.bets["a"].detail == "a editada" and state.bets["b"].detail == "b nueva"
+    assert "c" not in state.bets
+
+    # The next flush replays only what is left.
+    api.failing.clear()
+    api.calls.clear()
+    assert flush_pending(api, state, user_id).applied == 3
+    assert sorted(api.calls) == [("create", "c", "c nueva"), ("create", "e", "e"), ("delete", "e")]
+    assert cache.load_pending_queue(user_id) == []
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from datetime import date
+
+import requests
+from sqlmodel import Session
+
+from backend import crud
+from backend.db import engine, init_db
+from backend.models import BetCreate, BetUpdate, UserCreate
+from backend.response_cache import ResponseCache, data_version
+from backend.stress import _start_server
+
+
+def test_entries_follow_writes_made_by_another_process() -> None:
+    init_db()
+    with Session(engine) as session:
+        user_id = crud.create_user(session, UserCreate(email="cache-a@example.com", password="secret123"), "x").id
+        bet = crud.create_bet(session, BetCreate(event_date=date(2025, 1, 1), detail="uno", stake=10, odds=2), user_id)
+        bet_id = bet.id
+
+    # Each ResponseCache stands in for one worker's process-local cache.
+    other_worker = ResponseCache(1 << 20)
+    computed = []
+
+    def read() -> bytes:
+        with Session(engine) as session:
+            version = data_version(session.connection(), user_id)
+
+            def compute() -> bytes:
+                computed.append(version)
+                return crud.get_bet(session, bet_id).detail.encode()
+
+            return other_worker.get_or_compute(user_id, ("bets",), compute, version)
+
+    assert read() == b"uno"
+    assert read() == b"uno"
+    assert len(computed) == 1
+
+    # crud invalidates the module-level cache only; other_worker never hears of it.
+    with Session(engine) as session:
+        crud.update_bet(session, crud.get_bet(session, bet_id), BetUpdate(detail="dos"))
+    assert read() == b"dos"
+    assert len(computed) == 2
+
+
+def test_a_write_through_one_worker_is_seen_by_the_others(tmp_path) -> None:
+    with open(tmp_path / "server.log", "wb") as log_file:
+        process, base_url = _start_server(tmp_path / "cache.db", {}, 2, log_file)
+        try:
+            token = requests.post(
+                f"{base_url}/auth/register",
+                json={"email": "cache-b@example.com", "password": "secret123"},
+                timeout=10,
+            ).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            bet = requests.post(
+                f"{base_url}/bets",
+                json={"event_date": "2025-01-01", "detail": "uno", "stake": 10, "odds": 2},
+                headers=headers,
+                timeout=10,
+            ).json()
+
+            def details() -> list:
+                # A fresh connection per request lets the kernel hand it to either worker.
+                response = requests.get(f"{base_url}/bets", headers={**headers, "Connection": "close"}, timeout=10)
+                return [row["detail"] for row in response.json()]
+
+            for _ in range(20):
+                assert details() == ["uno"]
+            response = requests.patch(f"{base_url}/bets/{bet['id']}", json={"detail": "dos"}, headers=headers, timeout=10)
+            response.raise_for_status()
+            assert [details() for _ in range(20)] == [["dos"]] * 20
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
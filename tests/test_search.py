@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+from uuid import UUID
+
+import pytest
+from sqlmodel import Session
+
+from backend import crud
+from backend.archive import _archive_engine, restore_bet
+from backend.db import engine, init_db
+from backend.models import BetCreate, BetOutcome, BetType, ParlayLegBase, UserCreate
+from backend.search import ensure_search_index
+
+
+@pytest.fixture(scope="module")
+def users():
+    init_db()
+    with Session(engine) as session:
+        owner = crud.create_user(session, UserCreate(email="search-owner@example.com", password="secret123"), "x")
+        other = crud.create_user(session, UserCreate(email="search-other@example.com", password="secret123"), "x")
+        return owner.id, other.id
+
+
+def _bet(session: Session, user_id: UUID, detail: str, days_ago: int = 1, legs=()) -> UUID:
+    payload = BetCreate(
+        event_date=date.today() - timedelta(days=days_ago),
+        type=BetType.PARLAY if legs else BetType.SINGLE,
+        detail=detail,
+        stake=10,
+        odds=2,
+        outcome=BetOutcome.WIN,
+        legs=[ParlayLegBase(detail=leg, odds=1.5) for leg in legs],
+    )
+    return crud.create_bet(session, payload, user_id).id
+
+
+def _search(user_id: UUID, query: str):
+    with Session(engine) as session:
+        return [(bet.id, bet.user_id) for bet in crud.search_bets(session, user_id, query, 50)]
+
+
+def test_search_stays_scoped_across_vacuum_and_archiving(users) -> None:
+    owner, other = users
+    with Session(engine) as session:
+        # Interleaved writes, then deletes, leave rowid gaps that VACUUM may close.
+        filler = [_bet(session, other, f"relleno {index} boca") for index in range(20)]
+        mine = _bet(session, owner, "Boca gana", legs=("Boca ambos marcan", "Boca mas de 1.5"))
+        old = _bet(session, owner, "Boca empata", days_ago=800)
+        theirs = _bet(session, other, "Boca pierde")
+        for bet_id in filler:
+            crud.delete_bet(session, crud.get_bet(session, bet_id))
+        session.commit()
+
+    assert {bet_id for bet_id, _ in _search(owner, "boca")} == {mine, old}
+    assert {bet_id for bet_id, _ in _search(owner, "ambos")} == {mine}
+
+    _archive_engine(engine, date.today() - timedelta(days=365), 100)
+    with engine.connect() as connection:
+        connection.exec_driver_sql("VACUUM")
+
+    assert {bet_id for bet_id, _ in _search(owner, "boca")} == {mine, old}
+    assert all(user_id == owner for _, user_id in _search(owner, "boca"))
+    assert {bet_id for bet_id, _ in _search(other, "boca")} == {theirs}
+
+    with Session(engine) as session:
+        assert restore_bet(session, old, owner)
+        session.commit()
+    assert {bet_id for bet_id, _ in _search(owner, "empata")} == {old}
+
+
+def test_old_rowid_keyed_index_is_rebuilt(users) -> None:
+    owner, _ = users
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE bet_fts")
+        connection.exec_driver_sql("CREATE VIRTUAL TABLE bet_fts USING fts5(user_id, detail, legs)")
+        ensure_search_index(connection)
+    assert _search(owner, "gana")
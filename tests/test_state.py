@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import random
+from dataclasses import replace
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+import pytest
+
+from client.models import Bet
+from client.state import AppState
+
+START = date(2024, 11, 20)
+OUTCOMES = ("acertada", "fallida", "pendiente")
+
+
+def _random_bet(rng: random.Random, bet_id: str) -> Bet:
+    return Bet(
+        id=bet_id,
+        user_id="u",
+        event_date=START + timedelta(days=rng.randrange(90)),
+        type=rng.choice(("single", "parlay")),
+        detail=bet_id,
+        stake=rng.choice((5.0, 10.0, 12.5, 20.0)),
+        odds=rng.choice((1.5, 1.85, 2.0, 3.1)),
+        cashout=rng.choice((None, None, 0.0, 17.3)),
+        outcome=rng.choice(OUTCOMES),
+        # Few distinct stamps, so (event_date, created_at) ties fall back to the id.
+        created_at=datetime(2025, 1, 1) + timedelta(minutes=rng.randrange(5)),
+        updated_at=datetime(2025, 1, 1) + timedelta(seconds=rng.randrange(10_000)),
+    )
+
+
+def _edit(rng: random.Random, bet: Bet) -> Bet:
+    field = rng.choice(("event_date", "outcome", "cashout", "stake", "created_at"))
+    if field == "event_date":
+        return replace(bet, event_date=START + timedelta(days=rng.randrange(90)))
+    if field == "outcome":
+        return replace(bet, outcome=rng.choice(OUTCOMES))
+    if field == "cashout":
+        return replace(bet, cashout=rng.choice((None, 3.5, 40.0)))
+    if field == "stake":
+        return replace(bet, stake=rng.choice((1.0, 7.25, 50.0)))
+    return replace(bet, created_at=bet.created_at + timedelta(minutes=rng.choice((-1, 1))))
+
+
+def _random_history(seed: int, steps: int = 3000):
+    """Drive an AppState with random upsert/remove/replace_all/merge calls.
+
+    Yields the state and a plain dict of what it should hold after each call.
+    """
+    rng = random.Random(seed)
+    state = AppState()
+    model: Dict[str, Bet] = {}
+    next_id = 0
+    for _ in range(steps):
+        roll = rng.random()
+        if roll < 0.45 or not model:
+            if model and rng.random() < 0.5:
+                bet = _edit(rng, model[rng.choice(sorted(model))])
+            else:
+                bet = _random_bet(rng, f"b{next_id:05d}")
+                next_id += 1
+            state.upsert(bet)
+            model[bet.id] = bet
+        elif roll < 0.7:
+            bet_id = rng.choice(sorted(model))
+            state.remove(bet_id)
+            del model[bet_id]
+        elif roll < 0.98:
+            batch: List[Bet] = []
+            for bet_id in rng.sample(sorted(model), min(len(model), 5)):
+                batch.append(replace(_edit(rng, model[bet_id]), updated_at=_random_bet(rng, bet_id).updated_at))
+            batch.append(_random_bet(rng, f"b{next_id:05d}"))
+            next_id += 1
+            state.merge(batch)
+            for bet in batch:
+                current = model.get(bet.id)
+                if current is None or bet.updated_at > current.updated_at:
+                    model[bet.id] = bet
+        else:
+            bets = [_random_bet(rng, f"b{next_id + index:05d}") for index in range(rng.randrange(40))]
+            next_id += len(bets)
+            state.replace_all(bets)
+            model = {bet.id: bet for bet in bets}
+        yield state, model
+
+
+def _newest_first(bets) -> List[Bet]:
+    return sorted(bets, key=lambda bet: (bet.event_date, bet.created_at, bet.id), reverse=True)
+
+
+def _month(value: date) -> str:
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_indexes_match_a_brute_force_recompute(seed: int) -> None:
+    for step, (state, model) in enumerate(_random_history(seed)):
+        if step % 7:
+            continue
+        everything = _newest_first(model.values())
+        assert state.as_list() == everything
+        assert state.latest_date() == (everything[0].event_date if everything else None)
+        assert state.months() == sorted({_month(bet.event_date) for bet in everything}, reverse=True)
+        for day in {bet.event_date for bet in everything} | {START - timedelta(days=1)}:
+            assert state.by_date(day) == [bet for bet in everything if bet.event_date == day]
+        for month in state.months():
+            assert state.by_month(month) == [bet for bet in everything if _month(bet.event_date) == month]
+
+
+def _assert_metrics(actual, bets) -> None:
+    expected = AppState().compute_metrics(bets)
+    assert (actual.count, actual.wins, actual.losses, actual.pending) == (
+        expected.count,
+        expected.wins,
+        expected.losses,
+        expected.pending,
+    )
+    # Kept incrementally, the sums carry the rounding of every add and take-back.
+    for name in ("stake_total", "return_total", "net"):
+        assert getattr(actual, name) == pytest.approx(getattr(expected, name), abs=1e-6)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_metrics_match_a_brute_force_recompute(seed: int) -> None:
+    for step, (state, model) in enumerate(_random_history(seed)):
+        if step % 7:
+            continue
+        bets = list(model.values())
+        for day in {bet.event_date for bet in bets} | {START - timedelta(days=1)}:
+            _assert_metrics(state.daily_metrics(day), [bet for bet in bets if bet.event_date == day])
+        for month in {_month(bet.event_date) for bet in bets} | {"2023-01"}:
+            _assert_metrics(state.month_metrics(month), [bet for bet in bets if _month(bet.event_date) == month])
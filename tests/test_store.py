@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import json
+from datetime import date, datetime
+
+from client import cache, store
+from client.config import get_client_config
+from tests.test_replay import _bet
+
+
+def test_legacy_json_cache_is_migrated_once_and_reloads(client_cache) -> None:
+    cfg = get_client_config()
+    user_id = "legacy-user"
+    bets = [_bet("a", event_date="2025-01-02"), _bet("b", event_date="2025-01-05", outcome="acertada")]
+    legacy = cfg.bets_cache_path(user_id)
+    legacy.write_text(json.dumps([bet.to_dict() for bet in bets]), encoding="utf-8")
+    cfg.sync_state_path(user_id).write_text(json.dumps({"last_sync": "2025-01-06T10:00:00"}), encoding="utf-8")
+
+    assert [bet.id for bet in cache.load_cached_bets(user_id)] == ["b", "a"]
+    assert cache.load_last_sync(user_id) == datetime(2025, 1, 6, 10)
+    assert not legacy.exists() and legacy.with_name(legacy.name + ".migrated").exists()
+    assert not cfg.sync_state_path(user_id).exists()
+
+    # Reopen from disk: the data now comes from the SQLite store alone.
+    store.close_store(user_id)
+    assert cache.load_cached_bets(user_id) == bets[::-1]
+    assert cache.load_last_sync(user_id) == datetime(2025, 1, 6, 10)
+
+
+def test_single_bet_saves_and_deletes_persist(client_cache) -> None:
+    user_id = "store-user"
+    cache.save_cached_bets([_bet("a"), _bet("b")], user_id)
+    edited = _bet("a", detail="editada", event_date="2025-02-01")
+    cache.save_cached_bet(edited, user_id)
+    cache.save_cached_bet(_bet("c", event_date="2024-12-31"), user_id)
+    cache.remove_cached_bet("b", user_id)
+    cache.remove_cached_bet("missing", user_id)
+
+    store.close_store(user_id)
+    loaded = cache.load_cached_bets(user_id)
+    assert [(bet.id, bet.detail, bet.event_date) for bet in loaded] == [
+        ("a", "editada", date(2025, 2, 1)),
+        ("c", "c", date(2024, 12, 31)),
+    ]
+    assert loaded[0] == edited
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import base64
+from datetime import datetime, timezone
+from typing import List
+from uuid import UUID
+
+import pytest
+from sqlalchemy import update
+from sqlmodel import select
+
+from backend import crud
+from backend.db import session_scope
+from backend.main import _encode_cursor
+from backend.models import Bet, BetArchive
+from tests.test_archive import archive
+
+STAMP = datetime(2025, 2, 1, 12, tzinfo=timezone.utc)
+
+
+def _bet(client, headers, detail: str) -> dict:
+    response = client.post(
+        "/bets", json={"event_date": "2025-01-01", "detail": detail, "stake": 10, "odds": 2}, headers=headers
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def test_last_sync_is_taken_before_the_query(client, auth_headers, monkeypatch) -> None:
+    _bet(client, auth_headers, "antes")
+    queried = []
+    for name in ("sync_since", "sync_fields"):
+        original = getattr(crud, name)
+
+        def _timed(*args, _original=original, **kwargs):
+            queried.append(crud.utcnow())
+            return _original(*args, **kwargs)
+
+        monkeypatch.setattr(crud, name, _timed)
+
+    for params in ({}, {"fields": "stake"}):
+        body = client.get("/sync", params=params, headers=auth_headers).json()
+        assert datetime.fromisoformat(body["last_sync"]) <= queried.pop()
+        assert len(body["items"]) == 1
+
+
+def _same_stamp_across_tiers(client, headers, count: int = 6) -> List[str]:
+    """``count`` bets sharing one ``updated_at``, every other one archived.
+
+    Returns their ids in ``(updated_at, id)`` order, i.e. sorted by id.
+    """
+    ids = []
+    for index in range(count):
+        response = client.post(
+            "/bets",
+            json={"event_date": "2025-01-01", "detail": f"b{index}", "stake": 10, "odds": 2, "outcome": "acertada"},
+            headers=headers,
+        )
+        response.raise_for_status()
+        ids.append(UUID(response.json()["id"]))
+    archive(str(bet_id) for bet_id in ids[1::2])
+    with session_scope() as session:
+        for model in (Bet, BetArchive):
+            session.exec(update(model).where(model.id.in_(ids)).values(updated_at=STAMP))
+    return [str(bet_id) for bet_id in sorted(ids)]
+
+
+def _pages(client, headers, **params) -> List[dict]:
+    pages, cursor = [], None
+    while True:
+        response = client.get("/sync", params={**params, "cursor": cursor}, headers=headers)
+        response.raise_for_status()
+        pages.append(response.json())
+        cursor = pages[-1]["next_cursor"]
+        if not pages[-1]["has_more"]:
+            return pages
+
+
+@pytest.mark.parametrize("params", [{}, {"fields": "stake"}], ids=["full", "sparse"])
+def test_pages_split_ties_across_both_tiers_exactly_once(client, auth_headers, params) -> None:
+    expected = _same_stamp_across_tiers(client, auth_headers)
+    pages = _pages(client, auth_headers, limit=4, **params)
+    assert [len(page["items"]) for page in pages] == [4, 2]
+    assert [item["id"] for page in pages for item in page["items"]] == expected
+    assert pages[-1]["next_cursor"] is None
+
+
+def test_cursor_on_one_tier_resumes_on_the_other(client, auth_headers) -> None:
+    expected = _same_stamp_across_tiers(client, auth_headers)
+    with session_scope() as session:
+        statement = select(BetArchive.id).where(BetArchive.id.in_([UUID(bet_id) for bet_id in expected]))
+        archived = {str(bet_id) for bet_id in session.exec(statement).all()}
+    # Half of the ids sit in each tier, so some neighbours straddle the two.
+    assert any((left in archived) != (right in archived) for left, right in zip(expected, expected[1:]))
+    for bet_id, following in zip(expected, expected[1:]):
+        cursor = _encode_cursor(STAMP, UUID(bet_id))
+        body = client.get("/sync", params={"limit": 1, "cursor": cursor}, headers=auth_headers).json()
+        assert [item["id"] for item in body["items"]] == [following]
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "%%%",
+        base64.urlsafe_b64encode(b"sin separador").decode(),
+        base64.urlsafe_b64encode(b"2025-01-01T00:00:00|no-es-un-uuid").decode(),
+        base64.urlsafe_b64encode(b"ayer|" + UUID(int=1).hex.encode()).decode(),
+        base64.urlsafe_b64encode("ñ|x".encode("latin-1")).decode(),
+    ],
+)
+def test_malformed_cursor_is_rejected(client, auth_headers, cursor: str) -> None:
+    response = client.get("/sync", params={"limit": 1, "cursor": cursor}, headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Parámetro 'cursor' inválido"
+
+
+def test_cursor_past_every_change_is_an_empty_last_page(client, auth_headers) -> None:
+    _same_stamp_across_tiers(client, auth_headers)
+    cursor = _encode_cursor(STAMP, UUID(int=2**128 - 1))
+    body = client.get("/sync", params={"limit": 2, "cursor": cursor}, headers=auth_headers).json()
+    assert body["items"] == [] and body["has_more"] is False and body["next_cursor"] is None